@@ -3,14 +3,13 @@ from constants import SCOPES, skip_sheets
 from google_auth import get_sheet_service
 from sheet_utils import get_spreadsheet_id, create_border_request, get_sheet_metadata
 from retry_utils import execute_with_retries
+from sheets_plan import PLAN_MODE, pause
 import time
 from datetime import datetime
 
 # Rate limiting configuration
-REQUESTS_PER_SHEET_ESTIMATE = 8  # Estimated API calls per sheet (higher for merge operations)
 MAX_REQUESTS_PER_MINUTE = 60  # Google Sheets API limit
 SAFETY_MARGIN = 0.9  # Use 90% of the limit to be safe
-COOLDOWN_SECONDS = max(1, int((REQUESTS_PER_SHEET_ESTIMATE * 60) / (MAX_REQUESTS_PER_MINUTE * SAFETY_MARGIN)))
 SHOW_COUNTDOWN = True  # Set to False to disable countdown display
 
 # Dynamic rate limiting tracker
@@ -48,6 +47,22 @@ class RateLimiter:
 
 rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE)
 
+def planned_requests(sheet_meta):
+    """API calls processing a sheet makes, counted from its merges: the E/F reads plus at most one batchUpdate"""
+    reads = 0
+    for merge in sheet_meta.get('merges', []):
+        if merge['startRowIndex'] < 11:
+            continue
+        if merge['startColumnIndex'] == 4 and merge['endColumnIndex'] == 5:
+            reads += 2
+        elif merge['startColumnIndex'] == 5 and merge['endColumnIndex'] == 6:
+            reads += 1
+    return reads + 1
+
+def cooldown_seconds(requests):
+    """Pause that spreads `requests` calls under the per-minute limit"""
+    return max(1, int((requests * 60) / (MAX_REQUESTS_PER_MINUTE * SAFETY_MARGIN)))
+
 def format_time_remaining(seconds):
     """Format seconds into a readable time string"""
     mins, secs = divmod(int(seconds), 60)
@@ -64,7 +79,8 @@ def cooldown_with_progress(seconds, sheet_name=None, reason="rate limits"):
         sheet_name: Optional name of the next sheet to process
         reason: Reason for cooldown
     """
-    if seconds < 1:
+    # Plan mode only counts calls; the report works out the waiting
+    if seconds < 1 or PLAN_MODE:
         return
         
     if not SHOW_COUNTDOWN:
@@ -130,8 +146,14 @@ def main():
         print(f"📊 Total sheets in spreadsheet: {len(sheet_names)}")
         print(f"⏭️  Skipping sheets: {', '.join(skip_sheets) if skip_sheets else 'None'}")
         print(f"✅ Sheets to process: {total_sheets}")
-        print(f"⚙️  Estimated requests per sheet: {REQUESTS_PER_SHEET_ESTIMATE}")
-        print(f"⚙️  Base cooldown: {COOLDOWN_SECONDS}s (dynamically adjusted)")
+        # Each sheet's calls are known up front from the merges in the metadata
+        requests_per_sheet = {
+            s['properties']['title']: planned_requests(s) for s in sheets
+            if s['properties']['title'] in sheets_to_process
+        }
+        planned_total = sum(requests_per_sheet.values())
+        print(f"⚙️  Planned requests: {planned_total} (up to {max(requests_per_sheet.values(), default=0)} per sheet)")
+        print(f"⚙️  Base cooldown: {cooldown_seconds(planned_total / max(1, total_sheets))}s (dynamically adjusted)")
         print("\n" + "-" * 70 + "\n")
         
         successful = 0
@@ -309,16 +331,16 @@ def main():
                     next_sheet = sheets_to_process[idx] if idx < len(sheets_to_process) else None
                     
                     # Check if we're approaching rate limit
-                    projected_rate = rate_limiter.get_current_rate() + REQUESTS_PER_SHEET_ESTIMATE
+                    projected_rate = rate_limiter.get_current_rate() + requests_per_sheet[next_sheet]
                     if projected_rate > rate_limiter.max_requests * 0.8:  # 80% threshold
                         wait_time = rate_limiter.get_required_wait()
                         if wait_time > 0:
                             cooldown_with_progress(wait_time, next_sheet, "rate limit prevention")
                         else:
-                            cooldown_with_progress(COOLDOWN_SECONDS, next_sheet, "safety buffer")
+                            cooldown_with_progress(cooldown_seconds(requests_per_sheet[next_sheet]), next_sheet, "safety buffer")
                     else:
                         # Just a brief pause for processing
-                        time.sleep(1)
+                        pause(1)
                     print()
                     
             except Exception as sheet_error:
@@ -333,7 +355,7 @@ def main():
                     rate_limiter.request_times = []  # Reset tracker
                 elif idx < total_sheets:
                     # Regular cooldown for other errors
-                    cooldown_with_progress(COOLDOWN_SECONDS, None, "error recovery")
+                    cooldown_with_progress(cooldown_seconds(requests_per_sheet[name]), None, "error recovery")
                 print()
         
         # Summary
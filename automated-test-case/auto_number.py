@@ -7,15 +7,15 @@ from sheet_utils import (
     get_sheet_metadata,
 )
 from retry_utils import execute_with_retries
+from sheets_plan import PLAN_MODE, pause
+from sheets_metrics import calls_made
 import sys
 import time
 from datetime import datetime
 
 # Rate limiting configuration
-REQUESTS_PER_SHEET_ESTIMATE = 5  # Estimated API calls per sheet (adjust based on observation)
 MAX_REQUESTS_PER_MINUTE = 60  # Google Sheets API limit
 SAFETY_MARGIN = 0.9  # Use 90% of the limit to be safe
-COOLDOWN_SECONDS = max(1, int((REQUESTS_PER_SHEET_ESTIMATE * 60) / (MAX_REQUESTS_PER_MINUTE * SAFETY_MARGIN)))
 SHOW_COUNTDOWN = True  # Set to False to disable countdown display
 
 # Dynamic rate limiting tracker
@@ -53,6 +53,10 @@ class RateLimiter:
 
 rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE)
 
+def cooldown_seconds(requests):
+    """Pause that spreads `requests` calls under the per-minute limit"""
+    return max(1, int((requests * 60) / (MAX_REQUESTS_PER_MINUTE * SAFETY_MARGIN)))
+
 def format_time_remaining(seconds):
     """Format seconds into a readable time string"""
     mins, secs = divmod(int(seconds), 60)
@@ -69,7 +73,8 @@ def cooldown_with_progress(seconds, sheet_name=None, reason="rate limits"):
         sheet_name: Optional name of the next sheet to process
         reason: Reason for cooldown
     """
-    if seconds < 1:
+    # Plan mode only counts calls; the report works out the waiting
+    if seconds < 1 or PLAN_MODE:
         return
         
     if not SHOW_COUNTDOWN:
@@ -135,12 +140,12 @@ def main():
         print(f"📊 Total sheets in spreadsheet: {len(sheet_names)}")
         print(f"⏭️  Skipping sheets: {', '.join(skip_sheets) if skip_sheets else 'None'}")
         print(f"✅ Sheets to process: {total_sheets}")
-        print(f"⚙️  Estimated requests per sheet: {REQUESTS_PER_SHEET_ESTIMATE}")
-        print(f"⚙️  Base cooldown: {COOLDOWN_SECONDS}s (dynamically adjusted)")
+        print("⚙️  Requests per sheet: counted by the transport as sheets are processed")
         print("\n" + "-" * 70 + "\n")
         
         successful = 0
         failed = 0
+        sheet_calls_total = 0
         start_time = time.time()
         
         for idx, name in enumerate(sheets_to_process, 1):
@@ -157,10 +162,14 @@ def main():
             print(f"🔄 [{idx}/{total_sheets}] Processing: '{name}' (rate: {current_rate} req/min)")
             
             try:
+                calls_at_start = calls_made()
                 process_sheet(service, spreadsheet_id, sheets, name)
-                rate_limiter.add_request(REQUESTS_PER_SHEET_ESTIMATE)  # Track estimated requests
+                sheet_calls = calls_made() - calls_at_start
+                rate_limiter.add_request(sheet_calls)  # Track the requests actually sent, retries included
                 
                 successful += 1
+                sheet_calls_total += sheet_calls
+                requests_per_sheet = sheet_calls_total / successful
                 sheet_duration = time.time() - sheet_start_time
                 print(f"   ⏱️  Completed in {sheet_duration:.1f}s")
                 
@@ -169,16 +178,16 @@ def main():
                     next_sheet = sheets_to_process[idx] if idx < len(sheets_to_process) else None
                     
                     # Check if we're approaching rate limit
-                    projected_rate = rate_limiter.get_current_rate() + REQUESTS_PER_SHEET_ESTIMATE
+                    projected_rate = rate_limiter.get_current_rate() + requests_per_sheet
                     if projected_rate > rate_limiter.max_requests * 0.8:  # 80% threshold
                         wait_time = rate_limiter.get_required_wait()
                         if wait_time > 0:
                             cooldown_with_progress(wait_time, next_sheet, "rate limit prevention")
                         else:
-                            cooldown_with_progress(COOLDOWN_SECONDS, next_sheet, "safety buffer")
+                            cooldown_with_progress(cooldown_seconds(requests_per_sheet), next_sheet, "safety buffer")
                     else:
                         # Just a brief pause for processing
-                        time.sleep(1)
+                        pause(1)
                     print()
                     
             except Exception as sheet_error:
@@ -193,7 +202,7 @@ def main():
                     rate_limiter.request_times = []  # Reset tracker
                 elif idx < total_sheets:
                     # Regular cooldown for other errors
-                    cooldown_with_progress(COOLDOWN_SECONDS, None, "error recovery")
+                    cooldown_with_progress(cooldown_seconds(sheet_calls_total / max(1, successful)), None, "error recovery")
                 print()
         
         # Summary
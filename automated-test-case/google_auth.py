@@ -1,7 +1,15 @@
+import os
+import sys
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
 from constants import SCOPES
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sheets_plan import plan_service
+from sheets_metrics import authorized_http
 
 def get_sheet_service(credentials_info):
     creds = Credentials.from_service_account_info(credentials_info, scopes=SCOPES)
-    return build('sheets', 'v4', credentials=creds)
+    if os.getenv('SHEETS_CLIENT') == 'async':
+        from sheets_client import build_service
+        return plan_service(build_service(creds))
+    return plan_service(build('sheets', 'v4', http=authorized_http(creds)))
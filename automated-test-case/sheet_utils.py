@@ -1,7 +1,10 @@
+import os
 import re
-import time
+import sys
 from retry_utils import execute_with_retries, update_values_with_retry
 from time_utils import get_current_times
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sheets_plan import pause
 
 def get_spreadsheet_id(url):
     match = re.search(r'/d/([a-zA-Z0-9-_]+)', url)
@@ -18,7 +21,7 @@ def process_sheet(service, spreadsheet_id, sheets, name):
     merges = sheet_meta.get('merges', [])
 
     range_ = f"'{name}'!E12:F"
-    time.sleep(1)
+    pause(1)
     result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_).execute()
     rows = result.get('values', [])
     start_row = 12
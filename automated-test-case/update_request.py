@@ -4,6 +4,9 @@ from googleapiclient.discovery import build
 from google.oauth2.service_account import Credentials
 from sheet_utils import get_spreadsheet_id  # Assuming you have this function
 import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from sheets_plan import plan_service
+from sheets_metrics import authorized_http
 
 from config import sheet_data, credentials_info  # Your update data and credentials
 
@@ -12,7 +15,7 @@ SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
 def get_sheet_service(credentials_info):
     creds = Credentials.from_service_account_info(credentials_info, scopes=SCOPES)
-    service = build('sheets', 'v4', credentials=creds)
+    service = plan_service(build('sheets', 'v4', http=authorized_http(creds)))
     return service
 
 def main():
@@ -0,0 +1,104 @@
+"""
+Run one repo script against the Sheets simulator: bench_entry.py <script> [args...]
+
+Only this wrapper process is redirected, the scripts themselves are run
+unmodified:
+
+- service account credentials become fake bearer tokens named after the
+  account's client_email (no token calls), so the simulator can keep a
+  quota per account
+- googleapiclient services and sheets_client point at BENCH_API_ENDPOINT
+- requests.post (update_toc's web app ping) is answered locally
+- with BENCH_TIME_SCALE=N, time.time/monotonic/sleep and asyncio.sleep run
+  N times faster, matching a simulator started with time_scale=N, so
+  cooldowns and quota waits keep their simulated length
+"""
+import os
+import sys
+import time
+import runpy
+import asyncio
+
+ENDPOINT = os.environ['BENCH_API_ENDPOINT']
+TIME_SCALE = float(os.getenv('BENCH_TIME_SCALE', '1'))
+
+
+def _redirect_google_clients():
+    from google.auth.credentials import AnonymousCredentials
+    from google.oauth2 import service_account
+    import googleapiclient.discovery
+
+    class BenchCredentials(AnonymousCredentials):
+        def __init__(self, user):
+            super().__init__()
+            self.user = user
+
+        def apply(self, headers, token=None):
+            headers['authorization'] = f"Bearer {self.user}"
+
+        def before_request(self, request, method, url, headers):
+            self.apply(headers)
+
+    def bench_credentials(cls, info, **kwargs):
+        return BenchCredentials(info.get('client_email', 'bench'))
+
+    service_account.Credentials.from_service_account_info = classmethod(bench_credentials)
+
+    real_build = googleapiclient.discovery.build
+
+    def build(service_name, version, *args, **kwargs):
+        if service_name == 'sheets':
+            kwargs['client_options'] = {'api_endpoint': ENDPOINT}
+            kwargs.setdefault('static_discovery', True)
+        return real_build(service_name, version, *args, **kwargs)
+
+    googleapiclient.discovery.build = build
+    os.environ['SHEETS_API_BASE_URL'] = ENDPOINT
+
+
+def _stub_web_app():
+    import requests
+
+    class Response:
+        status_code = 200
+        text = 'ok'
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {}
+
+    requests.post = lambda *args, **kwargs: Response()
+
+
+def _scale_clocks(scale):
+    real_time, real_monotonic, real_sleep = time.time, time.monotonic, time.sleep
+    time_origin, monotonic_origin = real_time(), real_monotonic()
+    real_async_sleep = asyncio.sleep
+
+    time.time = lambda: time_origin + (real_time() - time_origin) * scale
+    time.monotonic = lambda: monotonic_origin + (real_monotonic() - monotonic_origin) * scale
+    time.sleep = lambda seconds: real_sleep(max(0, seconds) / scale)
+
+    async def sleep(delay, result=None):
+        return await real_async_sleep(max(0, delay) / scale, result)
+
+    asyncio.sleep = sleep
+
+
+def main():
+    script = os.path.abspath(sys.argv[1])
+    sys.argv = [script] + sys.argv[2:]
+    sys.path[0] = os.path.dirname(script)
+
+    _redirect_google_clients()
+    _stub_web_app()
+    if TIME_SCALE != 1:
+        _scale_clocks(TIME_SCALE)
+
+    runpy.run_path(script, run_name='__main__')
+
+
+if __name__ == '__main__':
+    main()
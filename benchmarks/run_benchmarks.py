@@ -0,0 +1,148 @@
+"""
+End-to-end benchmarks of the Sheets scripts against the local simulator.
+
+    python benchmarks/run_benchmarks.py                        # every script, small size
+    python benchmarks/run_benchmarks.py --sizes small,medium --only fetch-issues,update_toc
+    python benchmarks/run_benchmarks.py --client async --time-scale 30
+
+Every (script, size) run gets fresh books in a new SheetsSimulator and runs
+the unmodified script in a subprocess through bench_entry.py. The report
+lists the simulated wall time, the API calls the simulator served (reads,
+writes, 429s) and the bytes sent. Script output and the results JSON go
+to --out.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sheets_simulator import SheetsSimulator, READ_METHODS
+from scenarios import REPO_ROOT, SIZES, SCENARIOS
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_one(name, size, args):
+    simulator = SheetsSimulator(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        reads_per_minute=args.quota,
+        writes_per_minute=args.quota,
+        time_scale=args.time_scale,
+    )
+    scenario = SCENARIOS[name](simulator, SIZES[size])
+    endpoint = simulator.serve()
+
+    env = dict(os.environ)
+    env.update(scenario['env'])
+    env.update({
+        'BENCH_API_ENDPOINT': endpoint,
+        'BENCH_TIME_SCALE': str(args.time_scale),
+        'SHEETS_METRICS_DIR': os.path.join(args.out, 'metrics'),
+        'TEAM_CDS_SYNC_JOURNAL_ENABLED': 'false',
+        'TEAM_CDS_RESUME': 'false',
+        # Every run starts without crawl history, so runs are comparable
+        'TEAM_CDS_CRAWL_HISTORY_DIR': tempfile.mkdtemp(prefix='bench-history-'),
+        'SNAPSHOT_PROBE': 'none',
+        'PYTHONUNBUFFERED': '1',
+    })
+    if args.client:
+        env['SHEETS_CLIENT'] = args.client
+    if args.accounts > 1:
+        # Team CDS scripts that pool credentials spread their requests over these
+        env['TEAM_CDS_SERVICE_ACCOUNT_JSON'] = json.dumps([
+            {'client_email': f"bench-{index}@bench.iam.gserviceaccount.com"} for index in range(args.accounts)
+        ])
+
+    log_path = os.path.join(args.out, f"{name}-{size}.log")
+    started = time.monotonic()
+    with open(log_path, 'w') as log:
+        try:
+            process = subprocess.run(
+                [sys.executable, os.path.join(BENCH_DIR, 'bench_entry.py'), os.path.join(REPO_ROOT, scenario['script'])],
+                cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT, timeout=args.timeout
+            )
+            exit_code = process.returncode
+        except subprocess.TimeoutExpired:
+            exit_code = 'timeout'
+    elapsed = time.monotonic() - started
+    simulator.shutdown()
+
+    stats = simulator.stats
+    calls = {key: value for key, value in stats.items() if '.' in key}
+    return {
+        'benchmark': name,
+        'size': size,
+        'exit_code': exit_code,
+        'wall_seconds': round(elapsed * args.time_scale, 1),
+        'real_seconds': round(elapsed, 1),
+        'requests': stats['requests'],
+        'reads': sum(count for call, count in calls.items() if call in READ_METHODS),
+        'writes': sum(count for call, count in calls.items() if call not in READ_METHODS),
+        'throttled': stats['429'],
+        'errors': sum(count for key, count in stats.items() if key.isdigit() and key != '429'),
+        'bytes_sent': stats['bytes_in'],
+        'bytes_received': stats['bytes_out'],
+        'calls': calls,
+        'log': log_path,
+    }
+
+
+def print_table(results):
+    print("\n" + "=" * 100)
+    print("📊 SHEETS BENCHMARKS (simulated time)")
+    print("=" * 100)
+    print(f"{'benchmark':<18}{'size':<8}{'exit':>6}{'wall s':>10}{'requests':>10}{'reads':>8}{'writes':>8}"
+          f"{'429s':>7}{'errors':>8}{'sent KB':>9}{'recv KB':>9}")
+    for r in results:
+        print(f"{r['benchmark']:<18}{r['size']:<8}{str(r['exit_code']):>6}{r['wall_seconds']:>10.1f}"
+              f"{r['requests']:>10}{r['reads']:>8}{r['writes']:>8}{r['throttled']:>7}{r['errors']:>8}"
+              f"{r['bytes_sent'] / 1024:>9.1f}{r['bytes_received'] / 1024:>9.1f}")
+    print("=" * 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', default=','.join(SCENARIOS), help='comma-separated benchmarks')
+    parser.add_argument('--sizes', default='small', help=f"comma-separated sizes ({', '.join(SIZES)})")
+    parser.add_argument('--client', choices=['googleapiclient', 'async'], help='SHEETS_CLIENT for team-cds scripts')
+    parser.add_argument('--latency-ms', type=float, default=80)
+    parser.add_argument('--jitter-ms', type=float, default=40)
+    parser.add_argument('--quota', type=int, default=60, help='read and write requests per minute per account')
+    parser.add_argument('--accounts', type=int, default=1, help='service accounts given to team-cds scripts')
+    parser.add_argument('--time-scale', type=float, default=20, help='simulated seconds per real second')
+    parser.add_argument('--timeout', type=float, default=1800, help='real seconds per run')
+    parser.add_argument('--out', default=os.path.join(BENCH_DIR, 'results'))
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    results = []
+    for name in args.only.split(','):
+        if name not in SCENARIOS:
+            parser.error(f"unknown benchmark '{name}'")
+        for size in args.sizes.split(','):
+            if size not in SIZES:
+                parser.error(f"unknown size '{size}'")
+            print(f"🏃 {name} ({size})...", flush=True)
+            result = run_one(name, size, args)
+            print(f"   {'✅' if result['exit_code'] == 0 else '❌'} {result['wall_seconds']}s simulated, "
+                  f"{result['requests']} requests, {result['throttled']} throttled (log: {result['log']})")
+            results.append(result)
+
+    print_table(results)
+    path = os.path.join(args.out, f"benchmarks-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"💾 Results saved to {path}")
+    if any(r['exit_code'] != 0 for r in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Spreadsheet fixtures for the end-to-end benchmarks.
+
+Each scenario fills a SheetsSimulator with the books one script reads at a
+given size factor and returns the script to run plus the environment it
+needs. Data is generated from a fixed seed, so every run of the same size
+sees the same books.
+"""
+import os
+import json
+import random
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SIZES = {'small': 1, 'medium': 4, 'large': 12}
+
+MILESTONES = [f"Sprint {i}" for i in range(1, 13)] + ['QA TEAM']
+AUTHORS = [f"dev.{i}" for i in range(12)]
+LABELS = ['needs test case', 'bug', 'needs test scenario', 'Doing', 'To Do', 'QA Review', 'frontend', 'backend']
+CATEGORIES = ['Functional', 'Regression', 'Smoke', 'Integration']
+DOC_TABS = ['HELP', 'ToC', 'Issues', 'Roster']
+
+
+def _url(spreadsheet_id):
+    return f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}/edit"
+
+
+def _issue_rows(rnd, count):
+    """ALL ISSUES rows from column C: ..., author at 3, labels at 5, milestone at 6, date at 8"""
+    rows = []
+    for i in range(count):
+        rows.append([
+            'project', str(10000 + i), f"Issue {i}", rnd.choice(AUTHORS), 'assignee',
+            ', '.join(rnd.sample(LABELS, 2)), rnd.choice(MILESTONES), 'opened',
+            f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", 'link', 'meta', 'HQZEN',
+            'o', 'p', 'q', 'r', 's', 't',
+        ])
+    return rows
+
+
+def _team_cds(simulator, rnd, tenants, source_rows, doc_urls=None):
+    """UTILS, the SHEET_SYNC_SID source and `tenants` Team CDS books"""
+    header = [[], [], []]
+    simulator.add_spreadsheet('BENCH-SOURCE', {
+        'ALL ISSUES': header + [['', ''] + row for row in _issue_rows(rnd, source_rows)],
+        'ALL MRs': header + [
+            ['', '', 'project', str(i), f"MR {i}", 'a', 'b', 'c', 'd', rnd.choice(MILESTONES), 'e']
+            for i in range(source_rows // 2)
+        ],
+    })
+
+    tenant_ids = [f"BENCH-TEAM-{t}" for t in range(tenants)]
+    simulator.add_spreadsheet('BENCH-UTILS', {'UTILS': [[]] + [['', sid] for sid in tenant_ids]})
+
+    for t, sid in enumerate(tenant_ids):
+        milestones = [[]] * 3 + [[''] * 6 + [m] for m in rnd.sample(MILESTONES, 3)]
+        dashboard = [[]] * 33 + [[''] * 16 + [a] for a in rnd.sample(AUTHORS, 3)]
+        tc_review = [['Title'] + [''] * 7 + ['URL']]
+        for url in (doc_urls or {}).get(t, []):
+            tc_review.append(['Review'] + [''] * 7 + [url])
+        simulator.add_spreadsheet(sid, {
+            'G-Milestones': milestones,
+            'G-Issues': [],
+            'G-MR': [],
+            'NTC': [],
+            'G-TC': [],
+            'Dashboard': dashboard,
+            'TC Review': tc_review,
+        })
+
+    return {
+        'LEADS_CDS_SID': 'BENCH-UTILS',
+        'SHEET_SYNC_SID': 'BENCH-SOURCE',
+        'TEAM_CDS_SERVICE_ACCOUNT_JSON': '{}',
+    }
+
+
+def _test_case_tab(rnd, index, steps):
+    """A test case tab: metadata in column C, numbered steps in E12:F with merged F cells"""
+    rows = [[] for _ in range(11)]
+    rows[3] = ['', '', f"TC-{index:04d} Scenario {index}"]
+    rows[4] = ['', '', rnd.choice(CATEGORIES)]
+    for row in (5, 6, 12, 13, 14, 17, 18, 19, 20):
+        while len(rows) <= row:
+            rows.append([])
+        rows[row] = ['', '', f"value {row + 1}"]
+
+    merges = []
+    row = 11
+    for step in range(steps):
+        span = rnd.choice([1, 1, 2, 3])
+        while len(rows) < row + span:
+            rows.append([])
+        cells = rows[row] + [''] * max(0, 6 - len(rows[row]))
+        cells[4] = ''
+        cells[5] = f"Step {step + 1}"
+        rows[row] = cells
+        if span > 1:
+            merges.append({'startRowIndex': row, 'endRowIndex': row + span, 'startColumnIndex': 5, 'endColumnIndex': 6})
+            # Some E merges already match, some are missing, some are stale
+            if rnd.random() < 0.5:
+                merges.append({'startRowIndex': row, 'endRowIndex': row + span, 'startColumnIndex': 4, 'endColumnIndex': 5})
+        elif rnd.random() < 0.1:
+            merges.append({'startRowIndex': row, 'endRowIndex': row + 2, 'startColumnIndex': 4, 'endColumnIndex': 5})
+        row += span
+    return rows, merges
+
+
+def _test_case_doc(simulator, rnd, spreadsheet_id, tabs, steps):
+    spreadsheet = simulator.add_spreadsheet(spreadsheet_id, {name: [] for name in DOC_TABS})
+    spreadsheet.sheet_by_title('ToC').rows = [['Test Case', 'Category']]
+    for index in range(tabs):
+        rows, merges = _test_case_tab(rnd, index, steps)
+        sheet = spreadsheet.add_sheet(f"TC {index:04d}", rows)
+        sheet.merges = [dict(merge, sheetId=sheet.sheet_id) for merge in merges]
+    return spreadsheet
+
+
+def fetch_issues(simulator, factor):
+    rnd = random.Random(factor)
+    env = _team_cds(simulator, rnd, tenants=2 * factor, source_rows=1000 * factor)
+    return {'script': 'team-cds/fetch-issues.py', 'env': env}
+
+
+def update_tc_counts(simulator, factor):
+    rnd = random.Random(factor)
+    tenants = 1 + factor // 4
+    doc_urls = {}
+    for t in range(tenants):
+        doc_urls[t] = []
+        for d in range(10 * factor):
+            doc_id = f"BENCH-DOC-{t}-{d}"
+            _test_case_doc(simulator, rnd, doc_id, tabs=rnd.randint(3, 12), steps=3)
+            doc_urls[t].append(_url(doc_id))
+        # Like real TC Review tabs: some documents are linked from several
+        # rows, and from other teams' sheets
+        shared = doc_urls[0][:2 * factor]
+        doc_urls[t].extend(rnd.sample(doc_urls[t], 2 * factor) + (shared if t else []))
+    env = _team_cds(simulator, rnd, tenants=tenants, source_rows=10, doc_urls=doc_urls)
+    return {'script': 'team-cds/update_tc_counts.py', 'env': env}
+
+
+def update_tc_review(simulator, factor):
+    rnd = random.Random(factor)
+    tenants = 2 * factor
+    env = _team_cds(simulator, rnd, tenants=tenants, source_rows=200 * factor)
+    issues = simulator.spreadsheets['BENCH-SOURCE'].sheet_by_title('ALL ISSUES').rows[3:]
+
+    # A typical day: most rows were reconciled by an earlier run, a few
+    # issues changed label since, and some rows are new plain links
+    for t in range(tenants):
+        rows = [['Title'] + [''] * 9]
+        for issue in rnd.sample(issues, 30 * factor):
+            iid, labels = issue[3], [label.strip() for label in issue[7].split(',')]
+            url = f"https://forge.bposeats.com/group/hqzen.com/-/issues/{iid}"
+            label = next((label for label in ('To Do', 'Doing') if label in labels), '')
+            roll = rnd.random()
+            if roll < 0.8:
+                link = f'=HYPERLINK("{url}", "#{iid}")'
+                label = 'Changes Requested' if label and roll < 0.08 else label
+            else:
+                link, label = url, ''
+            rows.append(['Review'] + [''] * 6 + [link, '', label])
+        simulator.spreadsheets[f"BENCH-TEAM-{t}"].sheet_by_title('TC Review').rows = rows
+    return {'script': 'team-cds/update_tc_review.py', 'env': env}
+
+
+def _automated_test_case(script):
+    def scenario(simulator, factor):
+        rnd = random.Random(factor)
+        _test_case_doc(simulator, rnd, 'BENCH-TC-DOC', tabs=10 * factor, steps=12)
+        return {
+            'script': script,
+            'env': {
+                'SHEET_DATA': json.dumps({'spreadsheetUrl': _url('BENCH-TC-DOC')}),
+                'TEST_CASE_SERVICE_ACCOUNT_JSON': '{}',
+            },
+        }
+    return scenario
+
+
+SCENARIOS = {
+    'fetch-issues': fetch_issues,
+    'update_tc_counts': update_tc_counts,
+    'update_tc_review': update_tc_review,
+    'auto_number': _automated_test_case('automated-test-case/auto_number.py'),
+    'auto_formatting': _automated_test_case('automated-test-case/auto_formatting.py'),
+    'update_toc': _automated_test_case('automated-test-case/update_toc.py'),
+}
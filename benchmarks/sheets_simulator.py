@@ -0,0 +1,693 @@
+"""
+In-memory Sheets API v4 simulator for local measurement.
+
+Implements the endpoints this repo uses over HTTP/1.1 (keep-alive, gzip):
+
+- spreadsheets.values: get, batchGet, update, batchUpdate, append, clear, batchClear
+- spreadsheets.get (field masks, `ranges`, includeGridData)
+- spreadsheets.batchUpdate: updateCells (values/notes), mergeCells,
+  unmergeCells, setDataValidation, addSheet, deleteSheet,
+  updateSheetProperties, plus formatting requests accepted as no-ops
+
+Every response is delayed by a configurable latency, and the per-user
+quotas are enforced like the real API: more than `reads_per_minute` read
+or `writes_per_minute` write requests in a sliding minute from one user
+(Authorization header) get a 429 RESOURCE_EXHAUSTED. `time_scale` speeds
+up the simulated clock (latency and quota windows shrink by that factor)
+for use with bench_entry's scaled clocks, so quota-bound runs finish
+quickly while keeping their shape.
+"""
+import re
+import json
+import gzip
+import time
+import random
+import threading
+from collections import Counter, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+
+DEFAULT_ROWS = 1000
+DEFAULT_COLUMNS = 26
+
+# Formatting requests that change nothing this simulator models
+NO_OP_REQUESTS = {
+    'updateBorders', 'repeatCell', 'updateDimensionProperties', 'autoResizeDimensions',
+    'addConditionalFormatRule', 'deleteConditionalFormatRule', 'updateConditionalFormatRule',
+    'setBasicFilter', 'clearBasicFilter', 'addProtectedRange', 'updateSpreadsheetProperties',
+}
+READ_METHODS = {'values.get', 'values.batchGet', 'spreadsheets.get'}
+
+
+class ApiError(Exception):
+    def __init__(self, code, message, status):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+
+    def body(self):
+        return {'error': {'code': self.code, 'message': str(self), 'status': self.status}}
+
+
+def column_index(letters):
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - ord('A') + 1)
+    return index - 1
+
+
+def column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+_CELL = re.compile(r'^([A-Za-z]*)(\d*)$')
+_CELLS = re.compile(r'^[A-Za-z]*\d*(:[A-Za-z]*\d*)?$')
+
+
+def parse_fields(mask):
+    """Field mask "a.b(c,d),e" -> {'a': {'b': {'c': None, 'd': None}}, 'e': None}"""
+    pos = 0
+
+    def name():
+        nonlocal pos
+        start = pos
+        while pos < len(mask) and (mask[pos].isalnum() or mask[pos] in '_*'):
+            pos += 1
+        return mask[start:pos]
+
+    def merge(tree, key, sub):
+        if key in tree and tree[key] is None:
+            return
+        if sub is None or key not in tree:
+            tree[key] = sub
+        else:
+            for sub_key, value in sub.items():
+                merge(tree[key], sub_key, value)
+
+    def path(tree):
+        nonlocal pos
+        key = name()
+        if pos < len(mask) and mask[pos] == '.':
+            pos += 1
+            sub = {}
+            path(sub)
+            merge(tree, key, sub)
+        elif pos < len(mask) and mask[pos] == '(':
+            pos += 1
+            sub = group()
+            pos += 1  # ')'
+            merge(tree, key, sub)
+        else:
+            merge(tree, key, None)
+
+    def group():
+        nonlocal pos
+        tree = {}
+        while pos < len(mask) and mask[pos] != ')':
+            path(tree)
+            if pos < len(mask) and mask[pos] == ',':
+                pos += 1
+        return tree
+
+    return group()
+
+
+def apply_fields(value, tree):
+    if tree is None or '*' in tree:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: apply_fields(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+def _typed(value, input_option):
+    """A written cell as Sheets would store it"""
+    if not isinstance(value, str) or input_option != 'USER_ENTERED':
+        return value
+    if re.fullmatch(r'-?\d+', value):
+        return int(value)
+    if re.fullmatch(r'-?\d+\.\d+', value):
+        return float(value)
+    return value
+
+
+def _formatted(value):
+    if isinstance(value, str):
+        match = re.match(r'^=HYPERLINK\("[^"]*",\s*"([^"]*)"\)$', value)
+        if match:
+            return match.group(1)
+        return value
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _render(value, option):
+    if option == 'FORMULA':
+        return value
+    if option == 'UNFORMATTED_VALUE':
+        if isinstance(value, str) and value.startswith('='):
+            return _formatted(value)
+        return value
+    return _formatted(value)
+
+
+class Sheet:
+    def __init__(self, sheet_id, title, index, rows=None):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.index = index
+        self.rows = [list(row) for row in (rows or [])]
+        self.notes = {}
+        self.validations = {}
+        self.merges = []
+        self.row_count = max(DEFAULT_ROWS, len(self.rows))
+        self.column_count = max([DEFAULT_COLUMNS] + [len(row) for row in self.rows])
+
+    def cell(self, row, column):
+        if row < len(self.rows) and column < len(self.rows[row]):
+            return self.rows[row][column]
+        return ''
+
+    def set_cell(self, row, column, value):
+        while len(self.rows) <= row:
+            self.rows.append([])
+        cells = self.rows[row]
+        if value in ('', None):
+            if column < len(cells):
+                cells[column] = ''
+            return
+        while len(cells) <= column:
+            cells.append('')
+        cells[column] = value
+        self.row_count = max(self.row_count, row + 1)
+        self.column_count = max(self.column_count, column + 1)
+
+    def extent(self):
+        """(rows, columns) actually holding values"""
+        last_row = 0
+        last_column = 0
+        for index, row in enumerate(self.rows):
+            used = [i for i, value in enumerate(row) if value not in ('', None)]
+            if used:
+                last_row = index + 1
+                last_column = max(last_column, used[-1] + 1)
+        return last_row, last_column
+
+    def properties(self):
+        return {
+            'sheetId': self.sheet_id,
+            'title': self.title,
+            'index': self.index,
+            'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.row_count, 'columnCount': self.column_count},
+        }
+
+
+class Spreadsheet:
+    def __init__(self, spreadsheet_id, title=None):
+        self.spreadsheet_id = spreadsheet_id
+        self.title = title or spreadsheet_id
+        self.sheets = []
+        self._next_sheet_id = 0
+
+    def add_sheet(self, title, rows=None, sheet_id=None):
+        if sheet_id is None:
+            sheet_id = self._next_sheet_id
+        self._next_sheet_id = max(self._next_sheet_id, sheet_id) + 1
+        sheet = Sheet(sheet_id, title, len(self.sheets), rows)
+        self.sheets.append(sheet)
+        return sheet
+
+    def sheet_by_title(self, title):
+        for sheet in self.sheets:
+            if sheet.title == title:
+                return sheet
+        return None
+
+    def sheet_by_id(self, sheet_id):
+        for sheet in self.sheets:
+            if sheet.sheet_id == sheet_id:
+                return sheet
+        raise ApiError(400, f"Invalid requests: No grid with id: {sheet_id}", 'INVALID_ARGUMENT')
+
+    def resolve(self, a1):
+        """A1 range -> (sheet, first row, first column, end row or None, end column or None)"""
+        title, separator, cells = a1.rpartition('!')
+        if not separator:
+            # "Sheet1" is a whole sheet; "A1:B2" is a range on the first sheet
+            if self.sheet_by_title(a1) is not None or not _CELLS.match(a1):
+                title, cells = a1, ''
+            else:
+                title = self.sheets[0].title if self.sheets else ''
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+        sheet = self.sheet_by_title(title)
+        if sheet is None or not _CELLS.match(cells):
+            raise ApiError(400, f"Unable to parse range: {a1}", 'INVALID_ARGUMENT')
+        if not cells:
+            return sheet, 0, 0, None, None
+
+        start, _, end = cells.partition(':')
+        start_col, start_row = _CELL.match(start).groups()
+        first_row = int(start_row) - 1 if start_row else 0
+        first_col = column_index(start_col) if start_col else 0
+        if not end:
+            # A single cell
+            return sheet, first_row, first_col, first_row + 1, first_col + 1
+        end_col, end_row = _CELL.match(end).groups()
+        return (
+            sheet, first_row, first_col,
+            int(end_row) if end_row else None,
+            column_index(end_col) + 1 if end_col else None,
+        )
+
+
+def _a1(sheet, first_row, first_col, end_row, end_col):
+    title = "'" + sheet.title.replace("'", "''") + "'"
+    end_row = end_row if end_row is not None else sheet.row_count
+    end_col = end_col if end_col is not None else sheet.column_count
+    return f"{title}!{column_letter(first_col)}{first_row + 1}:{column_letter(end_col - 1)}{end_row}"
+
+
+def _overlaps(a, b):
+    return (a['startRowIndex'] < b['endRowIndex'] and b['startRowIndex'] < a['endRowIndex'] and
+            a['startColumnIndex'] < b['endColumnIndex'] and b['startColumnIndex'] < a['endColumnIndex'])
+
+
+class SheetsSimulator:
+    def __init__(self, latency_ms=80, jitter_ms=40, latency_per_kb_ms=0.5,
+                 reads_per_minute=60, writes_per_minute=60, time_scale=1.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.latency_per_kb_ms = latency_per_kb_ms
+        self.limits = {'read': reads_per_minute, 'write': writes_per_minute}
+        self.time_scale = time_scale
+        self.spreadsheets = {}
+        self.stats = Counter()
+        self._windows = {}  # (kind, user) -> request times
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._server = None
+
+    # ---- data setup -------------------------------------------------
+
+    def add_spreadsheet(self, spreadsheet_id, tabs, title=None):
+        """tabs: {title: rows}; returns the Spreadsheet for further setup (merges, notes)"""
+        spreadsheet = Spreadsheet(spreadsheet_id, title)
+        for tab_title, rows in tabs.items():
+            spreadsheet.add_sheet(tab_title, rows)
+        self.spreadsheets[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    def _spreadsheet(self, spreadsheet_id):
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise ApiError(404, 'Requested entity was not found.', 'NOT_FOUND')
+        return spreadsheet
+
+    # ---- clock and quota ---------------------------------------------
+
+    def now(self):
+        """Simulated seconds (time_scale times faster than real time)"""
+        return time.monotonic() * self.time_scale
+
+    def _admit(self, kind, user=''):
+        with self._lock:
+            now = self.now()
+            window = self._windows.setdefault((kind, user), deque())
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= self.limits[kind]:
+                label = 'Read' if kind == 'read' else 'Write'
+                raise ApiError(
+                    429,
+                    f"Quota exceeded for quota metric '{label} requests' and limit "
+                    f"'{label} requests per minute per user' of service 'sheets.googleapis.com'",
+                    'RESOURCE_EXHAUSTED'
+                )
+            window.append(now)
+
+    def _delay(self, response_bytes):
+        latency = self.latency_ms + self._random.uniform(0, self.jitter_ms)
+        latency += self.latency_per_kb_ms * response_bytes / 1024
+        time.sleep(latency / 1000 / self.time_scale)
+
+    # ---- values ------------------------------------------------------
+
+    def _read_values(self, spreadsheet, a1, render):
+        sheet, first_row, first_col, end_row, end_col = spreadsheet.resolve(a1)
+        data_rows, data_cols = sheet.extent()
+        last_row = min(end_row if end_row is not None else data_rows, data_rows)
+        last_col = min(end_col if end_col is not None else data_cols, data_cols)
+
+        values = []
+        for row in range(first_row, last_row):
+            cells = [_render(sheet.cell(row, col), render) for col in range(first_col, last_col)]
+            while cells and cells[-1] in ('', None):
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+
+        result = {'range': _a1(sheet, first_row, first_col, end_row, end_col), 'majorDimension': 'ROWS'}
+        if values:
+            result['values'] = values
+        return result
+
+    def _write_values(self, spreadsheet, a1, values, input_option):
+        if input_option not in ('RAW', 'USER_ENTERED'):
+            raise ApiError(400, "Invalid valueInputOption", 'INVALID_ARGUMENT')
+        sheet, first_row, first_col, end_row, end_col = spreadsheet.resolve(a1)
+        rows = len(values)
+        cols = max((len(row) for row in values), default=0)
+        if (end_row is not None and first_row + rows > end_row) or (end_col is not None and first_col + cols > end_col):
+            raise ApiError(400, f"Requested writing within range [{a1}], but tried writing to a larger area",
+                           'INVALID_ARGUMENT')
+        cells = 0
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                sheet.set_cell(first_row + r, first_col + c, _typed(value, input_option))
+                cells += 1
+        return {
+            'spreadsheetId': spreadsheet.spreadsheet_id,
+            'updatedRange': _a1(sheet, first_row, first_col, first_row + max(rows, 1), first_col + max(cols, 1)),
+            'updatedRows': rows,
+            'updatedColumns': cols,
+            'updatedCells': cells,
+        }
+
+    def _clear_values(self, spreadsheet, a1):
+        sheet, first_row, first_col, end_row, end_col = spreadsheet.resolve(a1)
+        data_rows, data_cols = sheet.extent()
+        for row in range(first_row, min(end_row if end_row is not None else data_rows, data_rows)):
+            for col in range(first_col, min(end_col if end_col is not None else data_cols, data_cols)):
+                sheet.set_cell(row, col, '')
+        return _a1(sheet, first_row, first_col, end_row, end_col)
+
+    def _append_values(self, spreadsheet, a1, values, input_option):
+        sheet, first_row, first_col, _, _ = spreadsheet.resolve(a1)
+        row = max(first_row, sheet.extent()[0])
+        target = f"'{sheet.title}'!{column_letter(first_col)}{row + 1}"
+        return {'spreadsheetId': spreadsheet.spreadsheet_id, 'updates': self._write_values(spreadsheet, target, values, input_option)}
+
+    # ---- spreadsheets ------------------------------------------------
+
+    def _grid_data(self, sheet, first_row, first_col, end_row, end_col):
+        data_rows, data_cols = sheet.extent()
+        last_row = min(end_row if end_row is not None else data_rows, max(data_rows, first_row))
+        last_col = min(end_col if end_col is not None else data_cols, max(data_cols, first_col))
+        row_data = []
+        for row in range(first_row, last_row):
+            cells = []
+            for col in range(first_col, last_col):
+                value = sheet.cell(row, col)
+                cell = {}
+                if value not in ('', None):
+                    if isinstance(value, str) and value.startswith('='):
+                        cell['userEnteredValue'] = {'formulaValue': value}
+                    elif isinstance(value, bool):
+                        cell['userEnteredValue'] = {'boolValue': value}
+                    elif isinstance(value, (int, float)):
+                        cell['userEnteredValue'] = {'numberValue': value}
+                    else:
+                        cell['userEnteredValue'] = {'stringValue': value}
+                    cell['effectiveValue'] = (
+                        {'stringValue': _formatted(value)} if 'formulaValue' in cell['userEnteredValue']
+                        else cell['userEnteredValue']
+                    )
+                    cell['formattedValue'] = _formatted(value)
+                if (row, col) in sheet.notes:
+                    cell['note'] = sheet.notes[(row, col)]
+                if (row, col) in sheet.validations:
+                    cell['dataValidation'] = sheet.validations[(row, col)]
+                cells.append(cell)
+            while cells and not cells[-1]:
+                cells.pop()
+            row_data.append({'values': cells} if cells else {})
+        return {'startRow': first_row, 'startColumn': first_col, 'rowData': row_data}
+
+    def _get_spreadsheet(self, spreadsheet, ranges, include_grid_data):
+        selected = {}
+        for a1 in ranges:
+            sheet, *bounds = spreadsheet.resolve(a1)
+            selected.setdefault(sheet.sheet_id, []).append(bounds)
+
+        sheets = []
+        for sheet in spreadsheet.sheets:
+            if ranges and sheet.sheet_id not in selected:
+                continue
+            entry = {'properties': sheet.properties()}
+            if sheet.merges:
+                entry['merges'] = [dict(merge) for merge in sheet.merges]
+            if include_grid_data:
+                bounds_list = selected.get(sheet.sheet_id) or [(0, 0, None, None)]
+                entry['data'] = [self._grid_data(sheet, *bounds) for bounds in bounds_list]
+            sheets.append(entry)
+
+        return {
+            'spreadsheetId': spreadsheet.spreadsheet_id,
+            'properties': {'title': spreadsheet.title, 'locale': 'en_US', 'timeZone': 'Asia/Manila'},
+            'sheets': sheets,
+            'spreadsheetUrl': f"https://docs.google.com/spreadsheets/d/{spreadsheet.spreadsheet_id}/edit",
+        }
+
+    def _apply_request(self, spreadsheet, request):
+        kind, params = next(iter(request.items()))
+
+        if kind in NO_OP_REQUESTS:
+            return {}
+
+        if kind == 'updateCells':
+            grid = params.get('range') or {}
+            start = params.get('start') or {}
+            sheet = spreadsheet.sheet_by_id(grid.get('sheetId', start.get('sheetId', 0)))
+            first_row = grid.get('startRowIndex', start.get('rowIndex', 0))
+            first_col = grid.get('startColumnIndex', start.get('columnIndex', 0))
+            fields = params.get('fields', '')
+            wanted = set(field.strip() for field in fields.split(','))
+            for r, row in enumerate(params.get('rows', [])):
+                for c, cell in enumerate(row.get('values', [])):
+                    position = (first_row + r, first_col + c)
+                    if 'note' in wanted or '*' in wanted:
+                        if cell.get('note'):
+                            sheet.notes[position] = cell['note']
+                        else:
+                            sheet.notes.pop(position, None)
+                    if 'userEnteredValue' in wanted or '*' in wanted:
+                        entered = cell.get('userEnteredValue') or {}
+                        value = next(iter(entered.values()), '')
+                        sheet.set_cell(position[0], position[1], value)
+            return {}
+
+        if kind == 'mergeCells':
+            grid = params['range']
+            sheet = spreadsheet.sheet_by_id(grid.get('sheetId', 0))
+            grid = dict(grid, sheetId=sheet.sheet_id)
+            sheet.merges = [merge for merge in sheet.merges if not _overlaps(merge, grid)]
+            if params.get('mergeType', 'MERGE_ALL') == 'MERGE_ALL':
+                sheet.merges.append(grid)
+            else:
+                # MERGE_ROWS / MERGE_COLUMNS: one merge per row or column
+                for row in range(grid['startRowIndex'], grid['endRowIndex']):
+                    if params['mergeType'] == 'MERGE_ROWS':
+                        sheet.merges.append(dict(grid, startRowIndex=row, endRowIndex=row + 1))
+                if params['mergeType'] == 'MERGE_COLUMNS':
+                    for col in range(grid['startColumnIndex'], grid['endColumnIndex']):
+                        sheet.merges.append(dict(grid, startColumnIndex=col, endColumnIndex=col + 1))
+            return {}
+
+        if kind == 'unmergeCells':
+            grid = params['range']
+            sheet = spreadsheet.sheet_by_id(grid.get('sheetId', 0))
+            sheet.merges = [merge for merge in sheet.merges if not _overlaps(merge, dict(grid, sheetId=sheet.sheet_id))]
+            return {}
+
+        if kind == 'setDataValidation':
+            grid = params['range']
+            sheet = spreadsheet.sheet_by_id(grid.get('sheetId', 0))
+            end_row = grid.get('endRowIndex', sheet.row_count)
+            end_col = grid.get('endColumnIndex', sheet.column_count)
+            for row in range(grid.get('startRowIndex', 0), end_row):
+                for col in range(grid.get('startColumnIndex', 0), end_col):
+                    if params.get('rule'):
+                        sheet.validations[(row, col)] = params['rule']
+                    else:
+                        sheet.validations.pop((row, col), None)
+            return {}
+
+        if kind == 'addSheet':
+            properties = params.get('properties', {})
+            title = properties.get('title') or f"Sheet{len(spreadsheet.sheets) + 1}"
+            if spreadsheet.sheet_by_title(title):
+                raise ApiError(400, f'Invalid requests[0].addSheet: A sheet with the name "{title}" already exists.',
+                               'INVALID_ARGUMENT')
+            sheet = spreadsheet.add_sheet(title, sheet_id=properties.get('sheetId'))
+            return {'addSheet': {'properties': sheet.properties()}}
+
+        if kind == 'deleteSheet':
+            sheet = spreadsheet.sheet_by_id(params['sheetId'])
+            spreadsheet.sheets.remove(sheet)
+            for index, remaining in enumerate(spreadsheet.sheets):
+                remaining.index = index
+            return {}
+
+        if kind == 'updateSheetProperties':
+            properties = params['properties']
+            sheet = spreadsheet.sheet_by_id(properties.get('sheetId', 0))
+            if 'title' in properties:
+                sheet.title = properties['title']
+            return {}
+
+        raise ApiError(400, f"Invalid JSON payload: unsupported request '{kind}'", 'INVALID_ARGUMENT')
+
+    # ---- dispatch ----------------------------------------------------
+
+    def handle(self, method, path, query, body, user=''):
+        """One API request -> (status, response object)"""
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)(.*)$', path)
+        if not match:
+            raise ApiError(404, f"Not found: {path}", 'NOT_FOUND')
+        spreadsheet_id, rest = unquote(match.group(1)), match.group(2)
+        option = lambda name, default=None: (query.get(name) or [default])[0]
+
+        if rest.startswith('/values/'):
+            a1, _, verb = rest[len('/values/'):].partition(':')
+            a1 = unquote(a1)
+            name = f"values.{verb}" if verb else ('values.get' if method == 'GET' else 'values.update')
+        elif rest.startswith('/values:'):
+            name, a1 = f"values.{rest[len('/values:'):]}", None
+        elif rest.startswith(':'):
+            name, a1 = f"spreadsheets.{rest[1:]}", None
+        else:
+            name, a1 = 'spreadsheets.get', None
+
+        self._admit('read' if name in READ_METHODS else 'write', user)
+        self.stats[name] += 1
+
+        with self._lock:
+            spreadsheet = self._spreadsheet(spreadsheet_id)
+            render = option('valueRenderOption', 'FORMATTED_VALUE')
+
+            if name == 'values.get':
+                result = self._read_values(spreadsheet, a1, render)
+            elif name == 'values.batchGet':
+                result = {
+                    'spreadsheetId': spreadsheet_id,
+                    'valueRanges': [self._read_values(spreadsheet, r, render) for r in query.get('ranges', [])],
+                }
+            elif name == 'values.update':
+                result = self._write_values(spreadsheet, a1, body.get('values', []), option('valueInputOption'))
+            elif name == 'values.append':
+                result = self._append_values(spreadsheet, a1, body.get('values', []), option('valueInputOption'))
+            elif name == 'values.clear':
+                result = {'spreadsheetId': spreadsheet_id, 'clearedRange': self._clear_values(spreadsheet, a1)}
+            elif name == 'values.batchUpdate':
+                responses = [
+                    self._write_values(spreadsheet, data['range'], data.get('values', []), body.get('valueInputOption'))
+                    for data in body.get('data', [])
+                ]
+                result = {
+                    'spreadsheetId': spreadsheet_id,
+                    'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+                    'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+                    'responses': responses,
+                }
+            elif name == 'values.batchClear':
+                result = {
+                    'spreadsheetId': spreadsheet_id,
+                    'clearedRanges': [self._clear_values(spreadsheet, r) for r in body.get('ranges', [])],
+                }
+            elif name == 'spreadsheets.get':
+                include = option('includeGridData', 'false').lower() == 'true'
+                result = self._get_spreadsheet(spreadsheet, query.get('ranges', []), include)
+            elif name == 'spreadsheets.batchUpdate':
+                replies = [self._apply_request(spreadsheet, request) for request in body.get('requests', [])]
+                result = {'spreadsheetId': spreadsheet_id, 'replies': replies}
+            else:
+                raise ApiError(404, f"Method not found: {name}", 'NOT_FOUND')
+
+        if 'fields' in query:
+            result = apply_fields(result, parse_fields(query['fields'][0]))
+        return 200, result
+
+    # ---- HTTP --------------------------------------------------------
+
+    def serve(self, host='127.0.0.1', port=0):
+        """Start serving on a daemon thread; returns the base URL"""
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body go out in separate writes; don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, obj, extra_headers=None):
+                payload = json.dumps(obj).encode('utf-8')
+                simulator._delay(len(payload))
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                for header, value in (extra_headers or {}).items():
+                    self.send_header(header, value)
+                if 'gzip' in self.headers.get('Accept-Encoding', '') and len(payload) > 1024:
+                    payload = gzip.compress(payload)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with simulator._lock:
+                    simulator.stats['bytes_out'] += len(payload)
+
+            def _dispatch(self, method):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                with simulator._lock:
+                    simulator.stats['requests'] += 1
+                    simulator.stats['bytes_in'] += len(raw)
+                try:
+                    body = json.loads(raw) if raw else {}
+                    # Quotas are per user, i.e. per bearer token
+                    user = self.headers.get('Authorization', '')
+                    status, result = simulator.handle(method, parts.path, parse_qs(parts.query), body, user)
+                    self._respond(status, result)
+                except ApiError as e:
+                    with simulator._lock:
+                        simulator.stats[str(e.code)] += 1
+                    self._respond(e.code, e.body())
+                except (ValueError, KeyError, TypeError) as e:
+                    with simulator._lock:
+                        simulator.stats['400'] += 1
+                    self._respond(400, ApiError(400, f"Invalid request: {e}", 'INVALID_ARGUMENT').body())
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='sheets-simulator', daemon=True).start()
+        return f"http://{host}:{self._server.server_port}"
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
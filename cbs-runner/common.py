@@ -2,6 +2,7 @@ import os
 import json
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from snapshot_cache import configure_probe
 
 
 def authenticate():
@@ -10,6 +11,8 @@ def authenticate():
         credentials_info,
         scopes=['https://www.googleapis.com/auth/spreadsheets']
     )
+    # Lets cached source snapshots be checked for changes (SNAPSHOT_PROBE)
+    configure_probe(credentials)
     return credentials
 
 
@@ -42,8 +45,9 @@ def get_selected_milestones(sheets, sheet_id, g_milestones):
 # Task Reminders functions
 # =========================
 
-import datetime
 from constants import UTILS_SHEET_ID, CDS_MASTER_ROSTER
+# Re-exported for the reminder scripts; parsing lives in the shared date_utils
+from date_utils import days_since
 
 def get_sheet_ids(sheets):
     result = sheets.spreadsheets().values().get(
@@ -74,32 +78,3 @@ def get_assignee_email_map(sheets):
     except Exception as e:
         print(f"❌ Failed to load assignee-email mapping: {e}")
         return {}
-
-# def days_since(date_str):
-#     try:
-#         return (datetime.datetime.now() - datetime.datetime.strptime(date_str, "%m/%d/%Y")).days
-#     except ValueError:
-#         try:
-#             return (datetime.datetime.now() - datetime.datetime.strptime(date_str, "%a, %b %d, %Y")).days
-#         except Exception as e:
-#             print(f"⚠️ Could not parse date '{date_str}': {e}")
-#             return None
-
-def days_since(date_str):
-    try:
-        # Normalize unicode (replace narrow no-break space with normal space)
-        date_str = date_str.replace("\u202f", " ").strip()
-        
-        # Try format with full datetime and time
-        try:
-            parsed = datetime.datetime.strptime(date_str, "%a, %b %d, %Y, %I:%M:%S %p")
-        except ValueError:
-            try:
-                parsed = datetime.datetime.strptime(date_str, "%a, %b %d, %Y")
-            except ValueError:
-                parsed = datetime.datetime.strptime(date_str, "%m/%d/%Y")
-        
-        return (datetime.datetime.now() - parsed).days
-    except Exception as e:
-        print(f"⚠️ Could not parse date '{date_str}': {e}")
-        return None
@@ -11,6 +11,10 @@ if parent_dir not in sys.path:
 
 from googleapiclient.discovery import build
 from common import authenticate
+from date_utils import parse_column
+from snapshot_cache import load_values
+from sheets_plan import plan_service
+from sheets_metrics import authorized_http
 from constants import (
     SHEET_SYNC_SID,
     CBS_ID
@@ -21,12 +25,7 @@ def get_all_mr_with_formulas(sheets):
     print(f"📋 Getting MRs with formulas from {SHEET_SYNC_SID} - ALL MRs!C4:S")
     
     # First, get all values (display text)
-    values_result = sheets.spreadsheets().values().get(
-        spreadsheetId=SHEET_SYNC_SID,
-        range="ALL MRs!C4:S"
-    ).execute()
-    
-    values = values_result.get('values', [])
+    values = load_values(sheets, SHEET_SYNC_SID, "ALL MRs!C4:S")
     if not values:
         print("⚠️ No data found in range ALL MRs!C4:S")
         return []
@@ -35,13 +34,7 @@ def get_all_mr_with_formulas(sheets):
     
     # Then, get formulas for column E specifically
     print(f"📋 Getting formulas for column E (hyperlinks)...")
-    formulas_result = sheets.spreadsheets().values().get(
-        spreadsheetId=SHEET_SYNC_SID,
-        range="ALL MRs!E4:E",
-        valueRenderOption='FORMULA'
-    ).execute()
-    
-    formulas = formulas_result.get('values', [])
+    formulas = load_values(sheets, SHEET_SYNC_SID, "ALL MRs!E4:E", value_render_option='FORMULA')
     
     # Merge the data: replace column E values with formulas if they exist
     rows = []
@@ -115,60 +108,26 @@ def pad_row_to_s(row):
     full_length = 17
     return row + [''] * (full_length - len(row))
 
-def parse_date_safely(date_str):
-    """Safely parse date string and return datetime object or None"""
-    if not date_str or not isinstance(date_str, str):
-        return None
-    
-    date_str = date_str.strip()
-    if not date_str:
-        return None
-    
-    # Try common date formats
-    date_formats = [
-        '%Y-%m-%d %H:%M:%S',  # 2024-01-15 10:30:00
-        '%Y-%m-%d',           # 2024-01-15
-        '%m/%d/%Y %H:%M:%S',  # 01/15/2024 10:30:00
-        '%m/%d/%Y',           # 01/15/2024
-        '%d/%m/%Y %H:%M:%S',  # 15/01/2024 10:30:00
-        '%d/%m/%Y',           # 15/01/2024
-        '%Y-%m-%dT%H:%M:%S',  # ISO format without timezone
-        '%Y-%m-%dT%H:%M:%SZ', # ISO format with Z
-    ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    
-    return None
-
 def sort_mrs_by_date(mrs):
     """Sort MRs by creation date (column K/index 8) - most recent first"""
     print(f"📅 Sorting {len(mrs)} MRs by creation date...")
     
-    def get_sort_key(row):
-        # Column K is index 8 (C=0, D=1, E=2, F=3, G=4, H=5, I=6, J=7, K=8)
-        created_date_str = row[8] if len(row) > 8 else ''
-        parsed_date = parse_date_safely(created_date_str)
-        
-        # Return parsed date if available, otherwise use epoch (very old date)
-        if parsed_date:
-            return parsed_date
-        else:
-            return datetime(1970, 1, 1)  # Epoch time for unparseable dates
-    
     try:
+        # Column K is index 8 (C=0, D=1, E=2, F=3, G=4, H=5, I=6, J=7, K=8).
+        # Each date is parsed once; unparseable dates sort to the bottom (epoch).
+        created_dates = parse_column([row[8] if len(row) > 8 else '' for row in mrs])
+        epoch = datetime(1970, 1, 1)
+        
         # Sort in descending order (most recent first)
-        sorted_mrs = sorted(mrs, key=get_sort_key, reverse=True)
+        order = sorted(range(len(mrs)), key=lambda i: created_dates[i] or epoch, reverse=True)
+        sorted_mrs = [mrs[i] for i in order]
         
         # Debug: show first few dates
         print("📅 First 3 sorted dates:")
-        for i, row in enumerate(sorted_mrs[:3]):
+        for i, row_id in enumerate(order[:3]):
+            row = mrs[row_id]
             date_str = row[8] if len(row) > 8 else 'N/A'
-            parsed = parse_date_safely(date_str)
-            print(f"  {i+1}. {date_str} -> {parsed}")
+            print(f"  {i+1}. {date_str} -> {created_dates[row_id]}")
         
         print(f"✅ Successfully sorted {len(sorted_mrs)} MRs by date")
         return sorted_mrs
@@ -209,7 +168,7 @@ def main():
         print("=" * 60)
         
         credentials = authenticate()
-        sheets = build('sheets', 'v4', credentials=credentials)
+        sheets = plan_service(build('sheets', 'v4', http=authorized_http(credentials)))
         
         # Get all MRs from source (SHEET_SYNC_SID) with formulas preserved
         mr_data = get_all_mr_with_formulas(sheets)
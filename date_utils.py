@@ -0,0 +1,128 @@
+"""
+Shared date parsing for the sheet sync scripts.
+
+Cells are matched against a regex for each format's shape before strptime is
+called, so a cell that cannot be a given format never costs a ValueError.
+Parsed strings are memoized, and parse_column() detects a column's shape
+from its first parseable cell and tries that shape first for the rest.
+"""
+import re
+import datetime
+from functools import lru_cache
+
+_D = r'\d{1,2}'
+
+# (shape, formats in priority order). Formats that share a shape, like US and
+# day-first dates, are tried in the same order the old per-script helpers
+# used, so the first format that parses still wins.
+DATE_FORMATS = [
+    (re.compile(rf'\d{{4}}-{_D}-{_D}\s+{_D}:{_D}:{_D}'), ['%Y-%m-%d %H:%M:%S']),
+    (re.compile(rf'\d{{4}}-{_D}-{_D}'), ['%Y-%m-%d']),
+    (re.compile(rf'{_D}/{_D}/\d{{4}}\s+{_D}:{_D}:{_D}'), ['%m/%d/%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S']),
+    (re.compile(rf'{_D}/{_D}/\d{{4}}'), ['%m/%d/%Y', '%d/%m/%Y']),
+    (re.compile(rf'\d{{4}}-{_D}-{_D}T{_D}:{_D}:{_D}', re.IGNORECASE), ['%Y-%m-%dT%H:%M:%S']),
+    (re.compile(rf'\d{{4}}-{_D}-{_D}T{_D}:{_D}:{_D}Z', re.IGNORECASE), ['%Y-%m-%dT%H:%M:%SZ']),
+]
+
+# Assigned dates in the reminder sheets, e.g. "Mon, Jan 15, 2024, 10:30:00 AM"
+REMINDER_FORMATS = [
+    (re.compile(rf'[A-Za-z]+,\s+[A-Za-z]+\s+{_D},\s+\d{{4}},\s+{_D}:{_D}:{_D}\s+[AaPp][Mm]'),
+     ['%a, %b %d, %Y, %I:%M:%S %p']),
+    (re.compile(rf'[A-Za-z]+,\s+[A-Za-z]+\s+{_D},\s+\d{{4}}'), ['%a, %b %d, %Y']),
+    (re.compile(rf'{_D}/{_D}/\d{{4}}'), ['%m/%d/%Y']),
+]
+
+PARSE_CACHE_SIZE = 65536
+
+
+def _parse_shape(value, formats):
+    for fmt in formats:
+        try:
+            return datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse(value, shapes, preferred=None):
+    """(parsed datetime or None, index of the shape that matched or None)"""
+    if preferred is not None:
+        shape, formats = shapes[preferred]
+        if shape.fullmatch(value):
+            parsed = _parse_shape(value, formats)
+            if parsed:
+                return parsed, preferred
+
+    for index, (shape, formats) in enumerate(shapes):
+        if index != preferred and shape.fullmatch(value):
+            parsed = _parse_shape(value, formats)
+            if parsed:
+                return parsed, index
+    return None, None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_cached(value):
+    return _parse(value, DATE_FORMATS)
+
+
+def parse_date(value):
+    """Parse a sheet date cell into a datetime, or None when blank/unparseable"""
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    if not value:
+        return None
+    return _parse_cached(value)[0]
+
+
+def parse_column(values):
+    """
+    Parse a whole column of date cells at once.
+
+    The shape of the first parseable cell is tried first for every other
+    cell, repeated strings are parsed once, and unparseable cells are
+    reported in a single summary line. Returns a list aligned with `values`.
+    """
+    preferred = None
+    seen = {}
+    parsed_column = []
+    failed = []
+
+    for value in values:
+        text = value.strip() if isinstance(value, str) else ''
+        if not text:
+            parsed_column.append(None)
+            continue
+
+        if text not in seen:
+            parsed, shape = _parse(text, DATE_FORMATS, preferred)
+            if parsed and preferred is None:
+                preferred = shape
+            elif not parsed:
+                failed.append(text)
+            seen[text] = parsed
+        parsed_column.append(seen[text])
+
+    if failed:
+        print(f"⚠️ Could not parse {len(failed)} dates (e.g. '{failed[0]}')")
+    return parsed_column
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_reminder_date(value):
+    return _parse(value, REMINDER_FORMATS)[0]
+
+
+def days_since(date_str):
+    """Whole days between a reminder-sheet date and now, or None when it cannot be parsed"""
+    try:
+        # Normalize unicode (replace narrow no-break space with normal space)
+        date_str = date_str.replace("\u202f", " ").strip()
+        parsed = _parse_reminder_date(date_str)
+        if parsed is None:
+            raise ValueError(f"time data '{date_str}' does not match any known format")
+        return (datetime.datetime.now() - parsed).days
+    except Exception as e:
+        print(f"⚠️ Could not parse date '{date_str}': {e}")
+        return None
@@ -0,0 +1,365 @@
+"""
+asyncio Sheets API v4 client with a pooled keep-alive connection layer.
+
+AsyncSheetsClient exposes the calls the scripts use (values get/batchGet/
+update/batchUpdate/append/clear/batchClear, spreadsheets get/batchUpdate) as
+coroutines. SheetsService wraps it in the googleapiclient call chain, e.g.
+service.spreadsheets().values().get(spreadsheetId=..., range=...).execute(),
+so existing helpers work unchanged while requests from many threads share one
+event loop and one connection pool.
+
+SHEETS_API_BASE_URL points the client somewhere else (e.g. a local HTTP
+stand-in); plain http:// URLs are supported for that purpose.
+"""
+import os
+import ssl
+import json
+import gzip
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from urllib.parse import urlsplit, urlencode, quote
+
+import httplib2
+import google_auth_httplib2
+from googleapiclient.errors import HttpError
+
+from sheets_metrics import record_call, THROTTLE_STATUSES
+
+SHEETS_API_BASE_URL = os.getenv('SHEETS_API_BASE_URL', 'https://sheets.googleapis.com')
+MAX_CONNECTIONS = int(os.getenv('SHEETS_API_MAX_CONNECTIONS', 10))
+REQUEST_TIMEOUT = float(os.getenv('SHEETS_API_TIMEOUT', 120))
+NUM_RETRIES = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Thread that asked for the current request, so the call log credits it
+# (rather than the event loop thread) with the call
+_caller_thread = contextvars.ContextVar('caller_thread', default=None)
+
+
+class ConnectionPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most `size` in use at once"""
+
+    def __init__(self, base_url, size=MAX_CONNECTIONS):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.use_ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.use_ssl else 80)
+        self.host_header = parts.netloc
+        self.size = size
+        self._idle = []
+        self._slots = None
+        self._ssl_context = ssl.create_default_context() if self.use_ssl else None
+
+    async def _open(self):
+        return await asyncio.open_connection(
+            self.host, self.port,
+            ssl=self._ssl_context,
+            server_hostname=self.host if self.use_ssl else None
+        )
+
+    async def request(self, method, target, headers, body=b''):
+        """Send one request; returns (status, reason, headers, body)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+
+        async with self._slots:
+            while self._idle:
+                reader, writer = self._idle.pop()
+                try:
+                    return await self._exchange(reader, writer, method, target, headers, body)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # The server closed an idle keep-alive connection; try the next one
+                    writer.close()
+
+            reader, writer = await self._open()
+            return await self._exchange(reader, writer, method, target, headers, body)
+
+    async def _exchange(self, reader, writer, method, target, headers, body):
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host_header}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {len(body)}")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+
+        try:
+            await writer.drain()
+            status, reason, response_headers, content, reusable = await asyncio.wait_for(
+                self._read_response(reader), REQUEST_TIMEOUT
+            )
+        except BaseException:
+            writer.close()
+            raise
+
+        if reusable:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        return status, reason, response_headers, content
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('connection closed before response')
+        _, status, reason = (status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) + [''])[:3]
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        reusable = headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Skip optional trailers up to the terminating blank line
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            content = b''.join(chunks)
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        else:
+            content = await reader.read()
+            reusable = False
+
+        if headers.get('content-encoding', '').lower() == 'gzip':
+            content = gzip.decompress(content)
+        return int(status), reason, headers, content, reusable
+
+    def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+
+class AsyncSheetsClient:
+    """Sheets API v4 calls as coroutines over a shared ConnectionPool"""
+
+    def __init__(self, credentials=None, base_url=SHEETS_API_BASE_URL,
+                 max_connections=MAX_CONNECTIONS, num_retries=NUM_RETRIES):
+        self.credentials = credentials
+        self.base_url = base_url.rstrip('/')
+        self.pool = ConnectionPool(self.base_url, max_connections)
+        self.num_retries = num_retries
+        self._auth_lock = None
+
+    async def _auth_headers(self):
+        headers = {}
+        if self.credentials is None:
+            return headers
+
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        async with self._auth_lock:
+            if not self.credentials.valid:
+                # Token refresh is a blocking call; keep it off the event loop
+                request = google_auth_httplib2.Request(httplib2.Http())
+                await asyncio.get_running_loop().run_in_executor(None, self.credentials.refresh, request)
+        self.credentials.apply(headers)
+        return headers
+
+    async def call(self, method, path, params=None, body=None):
+        """Send one API request with retries on 429/5xx; returns the decoded JSON"""
+        query = {
+            key: (str(value).lower() if isinstance(value, bool) else value)
+            for key, value in (params or {}).items() if value is not None
+        }
+        target = urlsplit(self.base_url).path + path
+        if query:
+            target += '?' + urlencode(query, doseq=True)
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+
+        # Recorded once per call, with the time spent on the wire (not in backoff)
+        status = 0
+        content = b''
+        elapsed = 0.0
+        attempt = 0
+        throttled = 0
+        retry_after = None
+        try:
+            for attempt in range(self.num_retries + 1):
+                headers = await self._auth_headers()
+                headers['Accept'] = 'application/json'
+                headers['Accept-Encoding'] = 'gzip'
+                if body is not None:
+                    headers['Content-Type'] = 'application/json'
+
+                started = time.time()
+                status, reason, response_headers, content = await self.pool.request(method, target, headers, payload)
+                elapsed += time.time() - started
+
+                if status < 300:
+                    return json.loads(content) if content else {}
+
+                header = response_headers.get('retry-after', '')
+                if status in THROTTLE_STATUSES:
+                    throttled += 1
+                    retry_after = float(header) if header.isdigit() else retry_after
+
+                if status in RETRY_STATUSES and attempt < self.num_retries:
+                    delay = float(header) if header.isdigit() else random.random() * 2 ** attempt
+                    print(f"⚠️ Sheets API {status} on {method} {path}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+                    continue
+
+                # Same error type googleapiclient raises, so existing handlers keep working
+                resp = httplib2.Response(dict(response_headers, status=status))
+                resp.reason = reason
+                raise HttpError(resp, content, uri=self.base_url + target)
+        finally:
+            record_call(method, self.base_url + target, status, elapsed,
+                        len(payload) * (attempt + 1), len(content or b''),
+                        retries=attempt, thread_id=_caller_thread.get(),
+                        throttled=throttled, retry_after=retry_after)
+
+    def _spreadsheet_path(self, spreadsheet_id, suffix=''):
+        return f"/v4/spreadsheets/{quote(spreadsheet_id, safe='')}{suffix}"
+
+    def _values_path(self, spreadsheet_id, range_name, suffix=''):
+        return self._spreadsheet_path(spreadsheet_id, f"/values/{quote(range_name, safe='')}{suffix}")
+
+    async def values_get(self, spreadsheetId, range, **params):
+        return await self.call('GET', self._values_path(spreadsheetId, range), params)
+
+    async def values_batch_get(self, spreadsheetId, ranges, **params):
+        params['ranges'] = list(ranges)
+        return await self.call('GET', self._spreadsheet_path(spreadsheetId, '/values:batchGet'), params)
+
+    async def values_update(self, spreadsheetId, range, body, **params):
+        return await self.call('PUT', self._values_path(spreadsheetId, range), params, body)
+
+    async def values_append(self, spreadsheetId, range, body, **params):
+        return await self.call('POST', self._values_path(spreadsheetId, range, ':append'), params, body)
+
+    async def values_batch_update(self, spreadsheetId, body, **params):
+        return await self.call('POST', self._spreadsheet_path(spreadsheetId, '/values:batchUpdate'), params, body)
+
+    async def values_clear(self, spreadsheetId, range, body=None, **params):
+        return await self.call('POST', self._values_path(spreadsheetId, range, ':clear'), params, body or {})
+
+    async def values_batch_clear(self, spreadsheetId, body, **params):
+        return await self.call('POST', self._spreadsheet_path(spreadsheetId, '/values:batchClear'), params, body)
+
+    async def spreadsheets_get(self, spreadsheetId, **params):
+        return await self.call('GET', self._spreadsheet_path(spreadsheetId), params)
+
+    async def spreadsheets_batch_update(self, spreadsheetId, body, **params):
+        return await self.call('POST', self._spreadsheet_path(spreadsheetId, ':batchUpdate'), params, body)
+
+
+class SheetsRequest:
+    """A pending call; execute() blocks the calling thread, execute_async() is awaitable"""
+
+    def __init__(self, service, method, name, kwargs):
+        self.service = service
+        self.method = method
+        self.name = name
+        self.kwargs = kwargs
+
+    def _coroutine(self, caller=None):
+        async def run():
+            _caller_thread.set(caller)
+            return await getattr(self.service.client, self.name)(**self.kwargs)
+        return run()
+
+    def execute(self, http=None, num_retries=None):
+        if self.service.before_execute:
+            self.service.before_execute(self.method)
+        return self.service.run(self._coroutine(threading.get_ident()))
+
+    async def execute_async(self):
+        # Rate-limited like execute(); before_execute blocks, so it waits off the loop
+        if self.service.before_execute:
+            await asyncio.get_running_loop().run_in_executor(None, self.service.before_execute, self.method)
+        # Always runs on the service's loop (which owns the pool), whichever loop awaits it
+        future = asyncio.run_coroutine_threadsafe(self._coroutine(), self.service._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+
+class _ValuesResource:
+    _calls = {
+        'get': ('GET', 'values_get'),
+        'batchGet': ('GET', 'values_batch_get'),
+        'update': ('PUT', 'values_update'),
+        'append': ('POST', 'values_append'),
+        'batchUpdate': ('POST', 'values_batch_update'),
+        'clear': ('POST', 'values_clear'),
+        'batchClear': ('POST', 'values_batch_clear'),
+    }
+
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name):
+        if name not in self._calls:
+            raise AttributeError(name)
+        method, coroutine_name = self._calls[name]
+        return lambda **kwargs: SheetsRequest(self._service, method, coroutine_name, kwargs)
+
+
+class _SpreadsheetsResource:
+    def __init__(self, service):
+        self._service = service
+
+    def values(self):
+        return _ValuesResource(self._service)
+
+    def get(self, **kwargs):
+        return SheetsRequest(self._service, 'GET', 'spreadsheets_get', kwargs)
+
+    def batchUpdate(self, **kwargs):
+        return SheetsRequest(self._service, 'POST', 'spreadsheets_batch_update', kwargs)
+
+
+class SheetsService:
+    """
+    Drop-in stand-in for build('sheets', 'v4', ...) backed by AsyncSheetsClient.
+
+    The event loop runs on a daemon thread; execute() from any thread submits
+    the request to it and waits, so many threads can have requests in flight
+    over the same pooled connections. `before_execute(method)` runs in the
+    calling thread first (e.g. to take a rate-limit token); execute_async()
+    runs it in the awaiting loop's executor.
+    """
+
+    def __init__(self, client, before_execute=None):
+        self.client = client
+        self.before_execute = before_execute
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def _ensure_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='sheets-client', daemon=True).start()
+        return self._loop
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    def spreadsheets(self):
+        return _SpreadsheetsResource(self)
+
+    def close(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self.client.pool.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+def build_service(credentials=None, base_url=SHEETS_API_BASE_URL,
+                  max_connections=MAX_CONNECTIONS, before_execute=None):
+    """SheetsService over a fresh AsyncSheetsClient"""
+    client = AsyncSheetsClient(credentials, base_url=base_url, max_connections=max_connections)
+    return SheetsService(client, before_execute=before_execute)
@@ -0,0 +1,326 @@
+"""
+Per-call instrumentation of the Sheets HTTP transport.
+
+Every request sent through an instrumented transport is recorded with its
+API call, spreadsheet, range, status, latency, request/response bytes and
+retry count. googleapiclient services get it from instrument_http() around
+their httplib2 connection; sheets_client records the same fields from its
+own request loop. When the process exits, a summary table is printed and
+the full call log is saved as JSON in SHEETS_METRICS_DIR.
+
+SHEETS_METRICS=false turns the call log and the report off. Per-thread
+attempt and throttle counts are still kept, since adaptive pacing
+(calls_made, throttles_seen) depends on them.
+"""
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import hashlib
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs, unquote
+from sheets_plan import PLAN_MODE
+
+METRICS_ENABLED = os.getenv('SHEETS_METRICS', 'true').lower() != 'false'
+METRICS_DIR = os.getenv(
+    'SHEETS_METRICS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'sheets-metrics')
+)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Responses that mean "slow down" (quota exceeded / backend overloaded)
+THROTTLE_STATUSES = (429, 503)
+
+_SPREADSHEET_PATH = re.compile(r'/v4/spreadsheets/([^/:?]+)(.*)$')
+
+
+def describe(method, url):
+    """(API call name, spreadsheet ID, range) for a Sheets API URL"""
+    parts = urlsplit(url)
+    match = _SPREADSHEET_PATH.search(parts.path)
+    if not match:
+        return f"{method} {parts.path}", None, None
+
+    spreadsheet_id, rest = match.groups()
+    ranges = ','.join(parse_qs(parts.query).get('ranges', [])) or None
+
+    if rest.startswith('/values/'):
+        # The range is percent-encoded, so a ':' here always starts the verb
+        range_name, _, verb = rest[len('/values/'):].partition(':')
+        if verb:
+            name = f"values.{verb}"
+        else:
+            name = 'values.get' if method == 'GET' else 'values.update'
+        return name, spreadsheet_id, unquote(range_name)
+    if rest.startswith('/values:'):
+        return f"values.{rest[len('/values:'):]}", spreadsheet_id, ranges
+    if rest.startswith(':'):
+        return f"spreadsheets.{rest[1:]}", spreadsheet_id, None
+    return 'spreadsheets.get', spreadsheet_id, ranges
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class CallRecorder:
+    """Thread-safe log of API calls, with per-thread attempt counts and listeners"""
+
+    def __init__(self, keep_log=METRICS_ENABLED):
+        self.calls = []
+        self.keep_log = keep_log
+        self.started = time.time()
+        self._thread_attempts = {}
+        self._thread_throttles = {}
+        self._thread_retry_after = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """listener(record) runs after every HTTP attempt, in the thread that made it"""
+        self._listeners.append(listener)
+
+    def _note_throttles(self, thread_id, throttled, retry_after):
+        # Caller holds self._lock
+        if throttled:
+            self._thread_throttles[thread_id] = self._thread_throttles.get(thread_id, 0) + throttled
+            if retry_after is not None:
+                self._thread_retry_after[thread_id] = retry_after
+
+    def record(self, method, url, status, latency, request_bytes, response_bytes,
+               retries=0, thread_id=None, throttled=None, retry_after=None):
+        """`throttled`: attempts answered 429/503 (default: judged from `status`)"""
+        name, spreadsheet_id, range_name = describe(method, url)
+        if throttled is None:
+            throttled = 1 if status in THROTTLE_STATUSES else 0
+        record = {
+            'call': name,
+            'method': method,
+            'spreadsheet_id': spreadsheet_id,
+            'range': range_name,
+            'status': status,
+            'latency_ms': round(latency * 1000, 1),
+            'request_bytes': request_bytes,
+            'response_bytes': response_bytes,
+            'retries': retries,
+            'throttled': throttled,
+            'retry_after': retry_after,
+            'started_at': round(time.time() - latency - self.started, 3),
+        }
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            if self.keep_log:
+                self.calls.append(record)
+            self._thread_attempts[thread_id] = self._thread_attempts.get(thread_id, 0) + retries + 1
+            self._note_throttles(thread_id, throttled, retry_after)
+        for listener in self._listeners:
+            for _ in range(retries + 1):
+                listener(record)
+        return record
+
+    def add_retry(self, record, status, latency, request_bytes, response_bytes, retry_after=None):
+        """Fold one more attempt of the same request into its record"""
+        throttled = 1 if status in THROTTLE_STATUSES else 0
+        with self._lock:
+            record['retries'] += 1
+            record['status'] = status
+            record['latency_ms'] = round(record['latency_ms'] + latency * 1000, 1)
+            record['request_bytes'] += request_bytes
+            record['response_bytes'] = response_bytes
+            record['throttled'] += throttled
+            if retry_after is not None:
+                record['retry_after'] = retry_after
+            thread_id = threading.get_ident()
+            self._thread_attempts[thread_id] = self._thread_attempts.get(thread_id, 0) + 1
+            self._note_throttles(thread_id, throttled, retry_after)
+        for listener in self._listeners:
+            listener(record)
+
+    def attempts(self, thread_id=None):
+        """HTTP attempts made so far by a thread (default: the calling thread)"""
+        with self._lock:
+            return self._thread_attempts.get(thread_id or threading.get_ident(), 0)
+
+    def throttles(self, thread_id=None):
+        """(attempts answered 429/503 so far, last Retry-After seconds or None) for a thread"""
+        thread_id = thread_id or threading.get_ident()
+        with self._lock:
+            return self._thread_throttles.get(thread_id, 0), self._thread_retry_after.get(thread_id)
+
+    def total_attempts(self):
+        with self._lock:
+            return sum(self._thread_attempts.values())
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+
+        by_call = {}
+        for record in calls:
+            by_call.setdefault(record['call'], []).append(record)
+
+        rows = []
+        for name, records in sorted(by_call.items(), key=lambda item: -len(item[1])):
+            latencies = sorted(r['latency_ms'] for r in records)
+            rows.append({
+                'call': name,
+                'count': len(records),
+                'errors': sum(1 for r in records if not 200 <= r['status'] < 300),
+                'retries': sum(r['retries'] for r in records),
+                'p50_ms': _percentile(latencies, 0.5),
+                'p95_ms': _percentile(latencies, 0.95),
+                'max_ms': latencies[-1],
+                'total_ms': round(sum(latencies), 1),
+                'request_bytes': sum(r['request_bytes'] for r in records),
+                'response_bytes': sum(r['response_bytes'] for r in records),
+            })
+
+        by_spreadsheet = {}
+        for record in calls:
+            entry = by_spreadsheet.setdefault(record['spreadsheet_id'] or '?', {'count': 0, 'total_ms': 0})
+            entry['count'] += 1
+            entry['total_ms'] = round(entry['total_ms'] + record['latency_ms'], 1)
+
+        return {
+            'script': os.path.basename(sys.argv[0] or 'python'),
+            # A plan run sends only some of its reads, so it says little about a real run
+            'plan': PLAN_MODE,
+            'wall_seconds': round(time.time() - self.started, 1),
+            'calls': len(calls),
+            'attempts': sum(r['retries'] + 1 for r in calls),
+            'by_call': rows,
+            'by_spreadsheet': by_spreadsheet,
+            'log': calls,
+        }
+
+    def report(self):
+        summary = self.summary()
+        if not summary['calls']:
+            return
+
+        print("\n" + "=" * 100)
+        print(f"📡 SHEETS API REPORT — {summary['calls']} calls, {summary['attempts']} HTTP attempts "
+              f"in {summary['wall_seconds']}s")
+        print("=" * 100)
+        print(f"{'call':<28}{'count':>7}{'errors':>8}{'retries':>9}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'max ms':>9}{'sent KB':>10}{'recv KB':>10}")
+        for row in summary['by_call']:
+            print(f"{row['call']:<28}{row['count']:>7}{row['errors']:>8}{row['retries']:>9}"
+                  f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['max_ms']:>9.0f}"
+                  f"{row['request_bytes'] / 1024:>10.1f}{row['response_bytes'] / 1024:>10.1f}")
+        slowest = sorted(summary['by_spreadsheet'].items(), key=lambda item: -item[1]['total_ms'])
+        print("⏱️ Most time spent on:")
+        for spreadsheet_id, entry in slowest[:5]:
+            print(f"   {spreadsheet_id}: {entry['count']} calls, {entry['total_ms'] / 1000:.1f}s")
+
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            script = os.path.splitext(summary['script'])[0]
+            path = os.path.join(METRICS_DIR, f"{script}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+            with open(path, 'w') as f:
+                json.dump(summary, f, indent=1)
+            print(f"💾 Call log saved to {path}")
+        except OSError as e:
+            print(f"⚠️ Could not save the call log: {str(e)}")
+        print("=" * 100)
+
+
+recorder = CallRecorder()
+_report_registered = False
+_report_lock = threading.Lock()
+
+
+def _register_report():
+    global _report_registered
+    with _report_lock:
+        if not _report_registered:
+            _report_registered = True
+            atexit.register(recorder.report)
+
+
+def calls_made():
+    """HTTP attempts made by the calling thread so far (for per-batch counters)"""
+    return recorder.attempts()
+
+
+def throttles_seen():
+    """(429/503 answers seen by the calling thread so far, last Retry-After) for adaptive pacing"""
+    return recorder.throttles()
+
+
+def _retry_after(value):
+    """Retry-After header in seconds (the HTTP-date form is treated as absent)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class InstrumentedHttp:
+    """
+    httplib2-compatible wrapper that records every request it sends.
+
+    googleapiclient retries a 429/5xx by sending the same request again from
+    the same thread, so a repeat of the request that just failed is counted
+    as a retry of that call rather than as a new call.
+    """
+
+    def __init__(self, http):
+        self.http = http
+        self._local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        body_bytes = len(body) if body else 0
+        key = (method, uri, hashlib.sha1(body if isinstance(body, bytes) else (body or '').encode('utf-8')).digest())
+        started = time.time()
+        status = 0
+        response_bytes = 0
+        retry_after = None
+        try:
+            response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+            status = response.status
+            response_bytes = len(content or b'')
+            retry_after = _retry_after(response.get('retry-after'))
+            return response, content
+        finally:
+            latency = time.time() - started
+            pending = getattr(self._local, 'pending', None)
+            if pending and pending[0] == key:
+                record = pending[1]
+                recorder.add_retry(record, status, latency, body_bytes, response_bytes, retry_after)
+            else:
+                record = recorder.record(method, uri, status, latency, body_bytes, response_bytes,
+                                         retry_after=retry_after)
+            # Connection errors (status 0) and retryable statuses may be sent again
+            retryable = status == 0 or status in RETRY_STATUSES
+            self._local.pending = (key, record) if retryable else None
+
+
+def instrument_http(http):
+    """Wrap an httplib2-style connection so its calls are counted and show up in the report"""
+    if METRICS_ENABLED:
+        _register_report()
+    return InstrumentedHttp(http)
+
+
+def authorized_http(credentials):
+    """An instrumented, authorized httplib2 connection: build('sheets', 'v4', http=...)"""
+    import httplib2
+    import google_auth_httplib2
+    return instrument_http(google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http()))
+
+
+def record_call(method, url, status, latency, request_bytes, response_bytes, retries=0, thread_id=None,
+                throttled=None, retry_after=None):
+    """Record a call made outside an instrumented httplib2 connection (e.g. sheets_client)"""
+    if METRICS_ENABLED:
+        _register_report()
+    return recorder.record(method, url, status, latency, request_bytes, response_bytes, retries, thread_id,
+                           throttled, retry_after)
@@ -0,0 +1,256 @@
+"""
+Plan mode for the Sheets scripts: `--plan` on the command line or SHEETS_PLAN=true.
+
+plan_service() wraps a Sheets service (googleapiclient or sheets_client).
+Metadata and control reads (UTILS, field-masked tab lists, a tenant's own
+tabs) still go to the API, so tenants, tabs and ranges resolve exactly as
+in a real run. Writes are only recorded, with the size of the body they
+would send. The expensive reads are not sent either: source downloads
+(snapshot_cache) and document crawls (tab_census) call planner.estimate(),
+which counts them and takes their size from the last saved call logs
+(sheets_metrics) when there are any.
+
+When the process exits, a report lists the read and write calls, their
+payload bytes, and the minimum wall time those calls need under the
+per-minute read/write quotas. SHEETS_PLAN_REPORT=<path> also saves the
+report as JSON.
+"""
+import os
+import sys
+import json
+import time
+import glob
+import atexit
+import threading
+
+PLAN_MODE = '--plan' in sys.argv or os.getenv('SHEETS_PLAN', 'false').lower() == 'true'
+PLAN_REPORT_PATH = os.getenv('SHEETS_PLAN_REPORT')
+
+# Sheets API v4 quotas: per minute, per user per project
+READ_QUOTA_PER_MINUTE = int(os.getenv('SHEETS_READ_QUOTA_PER_MINUTE', 60))
+WRITE_QUOTA_PER_MINUTE = int(os.getenv('SHEETS_WRITE_QUOTA_PER_MINUTE', 60))
+
+# Calls that only read; everything else is recorded instead of sent
+READ_CALLS = {'get', 'batchGet', 'getByDataFilter', 'batchGetByDataFilter'}
+
+
+def _json_size(value):
+    return len(json.dumps(value, separators=(',', ':'), default=str).encode('utf-8'))
+
+
+class Planner:
+    """Collects every call made through planned services in this process"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = time.time()
+        self._past = None
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, kwargs, payload_bytes, estimated=False):
+        with self._lock:
+            self.calls.append({
+                'kind': kind,
+                'call': name,
+                'spreadsheet_id': kwargs.get('spreadsheetId'),
+                'range': kwargs.get('range') or kwargs.get('ranges'),
+                'bytes': payload_bytes,
+                'estimated': estimated,
+            })
+
+    def estimate(self, name, spreadsheet_id, range_name=None, payload_bytes=None):
+        """
+        Count a read that plan mode does not send. Without `payload_bytes`
+        its size comes from the last call logs; None if it was never logged.
+        """
+        if payload_bytes is None:
+            payload_bytes = self.past_bytes(name, spreadsheet_id, range_name)
+        self.record('read', name, {'spreadsheetId': spreadsheet_id, 'range': range_name},
+                    payload_bytes, estimated=True)
+
+    def _load_past(self):
+        # Newest real (not planned) run per script; older runs of the same script add nothing
+        from sheets_metrics import METRICS_DIR
+        logs = {}
+        for path in sorted(glob.glob(os.path.join(METRICS_DIR, '*.json')), reverse=True):
+            script = os.path.basename(path).rsplit('-', 2)[0]
+            if script in logs:
+                continue
+            try:
+                with open(path) as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not summary.get('plan'):
+                logs[script] = summary.get('log', [])
+
+        past = {}
+        for log in logs.values():
+            for call in log:
+                if 200 <= call.get('status', 0) < 300:
+                    key = (call['call'], call.get('spreadsheet_id'), call.get('range'))
+                    past[key] = call.get('response_bytes', 0)
+                    past.setdefault((call['call'], call.get('spreadsheet_id')), []).append(call.get('response_bytes', 0))
+        return past
+
+    def past_bytes(self, name, spreadsheet_id, range_name=None):
+        """Response size of this read in the last logged run (same range, else the spreadsheet's mean)"""
+        with self._lock:
+            if self._past is None:
+                self._past = self._load_past()
+            past = self._past
+        # The call log names calls as the API does (values.get, not spreadsheets.values.get)
+        name = name.replace('spreadsheets.values.', 'values.')
+        if (name, spreadsheet_id, range_name) in past:
+            return past[(name, spreadsheet_id, range_name)]
+        sizes = past.get((name, spreadsheet_id))
+        return round(sum(sizes) / len(sizes)) if sizes else None
+
+    def summary(self):
+        with self._lock:
+            calls = list(self.calls)
+
+        totals = {
+            kind: {
+                'calls': sum(1 for c in calls if c['kind'] == kind),
+                'bytes': sum(c['bytes'] or 0 for c in calls if c['kind'] == kind),
+                'estimated': sum(1 for c in calls if c['kind'] == kind and c['estimated']),
+                'unknown_size': sum(1 for c in calls if c['kind'] == kind and c['bytes'] is None),
+            }
+            for kind in ('read', 'write')
+        }
+        by_call = {}
+        by_spreadsheet = {}
+        for c in calls:
+            by_call[c['call']] = by_call.get(c['call'], 0) + 1
+            counts = by_spreadsheet.setdefault(c['spreadsheet_id'] or '?', {'read': 0, 'write': 0})
+            counts[c['kind']] += 1
+
+        # Reads and writes have separate quotas, so whichever needs more minutes bounds the run
+        quota_minutes = max(
+            totals['read']['calls'] / READ_QUOTA_PER_MINUTE,
+            totals['write']['calls'] / WRITE_QUOTA_PER_MINUTE
+        )
+        return {
+            'reads': totals['read'],
+            'writes': totals['write'],
+            'by_call': by_call,
+            'by_spreadsheet': by_spreadsheet,
+            'quota_per_minute': {'read': READ_QUOTA_PER_MINUTE, 'write': WRITE_QUOTA_PER_MINUTE},
+            'min_wall_seconds': round(quota_minutes * 60, 1),
+            'plan_seconds': round(time.time() - self.started, 1),
+            'calls': calls,
+        }
+
+    def report(self):
+        summary = self.summary()
+        print("\n" + "=" * 60)
+        print("📝 PLAN (no writes were sent)")
+        print("=" * 60)
+        print(f"📖 Read calls:  {summary['reads']['calls']} ({summary['reads']['bytes']:,} response bytes)")
+        if summary['reads']['estimated']:
+            print(f"   {summary['reads']['estimated']} of them not sent (source downloads and crawls); "
+                  f"{summary['reads']['unknown_size']} never logged, so their size is not included")
+        print(f"✏️ Write calls: {summary['writes']['calls']} ({summary['writes']['bytes']:,} payload bytes)")
+        for name, count in sorted(summary['by_call'].items(), key=lambda item: -item[1]):
+            print(f"   {name}: {count}")
+        print(f"📄 Spreadsheets touched: {len(summary['by_spreadsheet'])}")
+        busiest = sorted(summary['by_spreadsheet'].items(), key=lambda item: -(item[1]['read'] + item[1]['write']))
+        for spreadsheet_id, counts in busiest[:10]:
+            print(f"   {spreadsheet_id}: {counts['read']} reads, {counts['write']} writes")
+        minutes, seconds = divmod(int(summary['min_wall_seconds']), 60)
+        print(f"⏱️ Minimum wall time under {READ_QUOTA_PER_MINUTE} reads/min and "
+              f"{WRITE_QUOTA_PER_MINUTE} writes/min: {minutes}m {seconds}s")
+        print("=" * 60)
+
+        if PLAN_REPORT_PATH:
+            with open(PLAN_REPORT_PATH, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"💾 Plan saved to {PLAN_REPORT_PATH}")
+
+
+planner = Planner()
+_report_registered = False
+_report_lock = threading.Lock()
+
+
+def _planned_response(kwargs):
+    """Stand-in for a write response; carries the fields callers read from real ones"""
+    body = kwargs.get('body') or {}
+    return {
+        'spreadsheetId': kwargs.get('spreadsheetId'),
+        'replies': [{} for _ in body.get('requests', [])],
+        'responses': [],
+    }
+
+
+class PlannedRequest:
+    """Wraps one pending request: reads execute, writes are recorded"""
+
+    def __init__(self, request, name, kwargs):
+        self.request = request
+        self.name = name
+        self.kwargs = kwargs
+
+    @property
+    def _is_read(self):
+        return self.name.rsplit('.', 1)[-1] in READ_CALLS
+
+    def execute(self, *args, **kwargs):
+        if self._is_read:
+            result = self.request.execute(*args, **kwargs)
+            planner.record('read', self.name, self.kwargs, _json_size(result))
+            return result
+        planner.record('write', self.name, self.kwargs, _json_size(self.kwargs.get('body') or {}))
+        return _planned_response(self.kwargs)
+
+    async def execute_async(self):
+        if self._is_read:
+            result = await self.request.execute_async()
+            planner.record('read', self.name, self.kwargs, _json_size(result))
+            return result
+        planner.record('write', self.name, self.kwargs, _json_size(self.kwargs.get('body') or {}))
+        return _planned_response(self.kwargs)
+
+
+class PlannedResource:
+    """Mirrors a service/resource chain, wrapping whatever requests it builds"""
+
+    def __init__(self, resource, path=''):
+        self._resource = resource
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._resource, name)
+        if not callable(attr):
+            return attr
+
+        path = f"{self._path}.{name}" if self._path else name
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return PlannedRequest(result, path, kwargs)
+            return PlannedResource(result, path)
+
+        return call
+
+
+def plan_service(service):
+    """`service` itself normally; in plan mode, a wrapper that records writes instead of sending them"""
+    global _report_registered
+    if not PLAN_MODE:
+        return service
+
+    with _report_lock:
+        if not _report_registered:
+            _report_registered = True
+            atexit.register(planner.report)
+            print("📝 Plan mode: metadata reads go to the API; downloads, crawls and writes are only counted")
+    return PlannedResource(service)
+
+
+def pause(seconds):
+    """time.sleep for request pacing; skipped in plan mode, where the report does the timing"""
+    if not PLAN_MODE:
+        time.sleep(seconds)
@@ -0,0 +1,214 @@
+"""
+On-disk cache of large source ranges (e.g. SHEET_SYNC_SID's ALL ISSUES!C4:T).
+
+A cached range is reused only when a cheap probe reports that the source has
+not changed since it was saved, so an unchanged source costs one small
+request instead of a full download. Probes are pluggable:
+
+- drive:    Drive files.get(fields=modifiedTime) for the spreadsheet
+- checksum: a small values.get of a row-count/checksum cell kept in the
+            source sheet (SNAPSHOT_CHECKSUM_RANGES maps range -> cell range)
+- file:     a local JSON file {spreadsheet_id: version}, a stand-in for
+            the Drive check in local runs and tests (SNAPSHOT_PROBE_FILE)
+- none:     no probe; every read downloads (the default)
+
+Select one with SNAPSHOT_PROBE. Entries are gzip-compressed JSON files in
+SNAPSHOT_CACHE_DIR, which CI persists between runs with actions/cache.
+
+In plan mode the probe still runs, but a download is only counted; a stale
+entry, if any, stands in for the data.
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import tempfile
+import threading
+from sheets_plan import PLAN_MODE, planner
+
+SNAPSHOT_PROBE = os.getenv('SNAPSHOT_PROBE', 'none')
+SNAPSHOT_CACHE_DIR = os.getenv(
+    'SNAPSHOT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'sheet-snapshots')
+)
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.metadata.readonly']
+
+
+class SnapshotProbe:
+    """Reports a version token for a spreadsheet range; None means "unknown, download it" """
+
+    name = 'none'
+
+    def version(self, sheets, spreadsheet_id, range_name):
+        return None
+
+
+class DriveModifiedTimeProbe(SnapshotProbe):
+    """Version = the spreadsheet's Drive modifiedTime (changes on any edit to the file)"""
+
+    name = 'drive'
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._drive = None
+        self._lock = threading.Lock()
+
+    def _service(self):
+        if self._drive is None:
+            from googleapiclient.discovery import build
+            credentials = self.credentials
+            if hasattr(credentials, 'with_scopes'):
+                credentials = credentials.with_scopes(DRIVE_SCOPES)
+            self._drive = build('drive', 'v3', credentials=credentials, cache_discovery=False)
+        return self._drive
+
+    def version(self, sheets, spreadsheet_id, range_name):
+        # One httplib2 connection is not safe to share between threads, and
+        # probes are rare enough that serializing them costs nothing
+        with self._lock:
+            result = self._service().files().get(
+                fileId=spreadsheet_id,
+                fields='modifiedTime',
+                supportsAllDrives=True
+            ).execute()
+        return result.get('modifiedTime')
+
+
+class ChecksumCellProbe(SnapshotProbe):
+    """Version = the values of a small row-count/checksum range kept next to the data"""
+
+    name = 'checksum'
+
+    def __init__(self, checksum_ranges):
+        self.checksum_ranges = checksum_ranges
+
+    def version(self, sheets, spreadsheet_id, range_name):
+        checksum_range = self.checksum_ranges.get(range_name)
+        if not checksum_range:
+            return None
+        result = sheets.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=checksum_range
+        ).execute()
+        return json.dumps(result.get('values', []))
+
+
+class FileProbe(SnapshotProbe):
+    """Version = an entry of a local JSON file {spreadsheet_id: version}"""
+
+    name = 'file'
+
+    def __init__(self, path):
+        self.path = path
+
+    def version(self, sheets, spreadsheet_id, range_name):
+        with open(self.path) as f:
+            versions = json.load(f)
+        version = versions.get(spreadsheet_id)
+        return str(version) if version is not None else None
+
+
+_probe = SnapshotProbe()
+_probe_lock = threading.Lock()
+
+
+def configure_probe(credentials=None, probe_name=None):
+    """Install the probe named by SNAPSHOT_PROBE (or `probe_name`) for this process"""
+    global _probe
+    probe_name = probe_name or SNAPSHOT_PROBE
+
+    if probe_name == 'drive' and credentials is not None:
+        probe = DriveModifiedTimeProbe(credentials)
+    elif probe_name == 'checksum':
+        probe = ChecksumCellProbe(json.loads(os.getenv('SNAPSHOT_CHECKSUM_RANGES', '{}')))
+    elif probe_name == 'file':
+        probe = FileProbe(os.getenv('SNAPSHOT_PROBE_FILE', ''))
+    else:
+        probe = SnapshotProbe()
+
+    with _probe_lock:
+        _probe = probe
+    return probe
+
+
+def _cache_path(spreadsheet_id, range_name, value_render_option):
+    key = hashlib.sha1(f"{spreadsheet_id}|{range_name}|{value_render_option}".encode('utf-8')).hexdigest()
+    return os.path.join(SNAPSHOT_CACHE_DIR, f"{key}.json.gz")
+
+
+def _read_entry(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_entry(path, entry):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temp file and rename, so a concurrent reader never sees half a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with gzip.open(os.fdopen(fd, 'wb'), 'wt', encoding='utf-8') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_values(sheets, spreadsheet_id, range_name, value_render_option='FORMATTED_VALUE'):
+    """
+    The `values` of a range, from the on-disk cache when the probe says the
+    source is unchanged, otherwise downloaded (and cached for next time).
+    """
+    probe = _probe
+    try:
+        version = probe.version(sheets, spreadsheet_id, range_name)
+    except Exception as e:
+        print(f"⚠️ Snapshot probe '{probe.name}' failed for {range_name}, downloading: {str(e)}")
+        version = None
+
+    path = _cache_path(spreadsheet_id, range_name, value_render_option)
+    entry = _read_entry(path) if version is not None or PLAN_MODE else None
+    if version is not None and entry and entry.get('version') == version:
+        print(f"💾 Using cached {range_name} ({len(entry['values'])} rows, unchanged since {version})")
+        return entry['values']
+
+    if PLAN_MODE:
+        payload_bytes = None
+        if entry:
+            payload_bytes = len(json.dumps({'range': range_name, 'values': entry['values']},
+                                           separators=(',', ':')).encode('utf-8'))
+        planner.estimate('spreadsheets.values.get', spreadsheet_id, range_name, payload_bytes)
+        print(f"📝 Plan: {range_name} would be downloaded"
+              + (f"; planning with the stale snapshot ({len(entry['values'])} rows)" if entry
+                 else "; no local snapshot, so writes that depend on it are not planned"))
+        return entry['values'] if entry else []
+
+    result = sheets.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range=range_name,
+        valueRenderOption=value_render_option
+    ).execute()
+    values = result.get('values', [])
+
+    if version is not None:
+        # The version was read before the download, so an edit made meanwhile
+        # only leads to one extra download next time, never to stale data.
+        try:
+            _write_entry(path, {
+                'spreadsheet_id': spreadsheet_id,
+                'range': range_name,
+                'value_render_option': value_render_option,
+                'version': version,
+                'saved_at': time.time(),
+                'values': values,
+            })
+            print(f"💾 Cached {range_name} ({len(values)} rows) for version {version}")
+        except OSError as e:
+            print(f"⚠️ Could not write snapshot cache for {range_name}: {str(e)}")
+
+    return values
@@ -0,0 +1,137 @@
+"""
+Read the same cells from every tab of a spreadsheet (a "tab census"), e.g.
+the C5 category of every test-case tab.
+
+TAB_CENSUS_MODE picks how:
+
+- values: a spreadsheets.get of the tab titles, then one values.batchGet of
+          the cells (the default). Two requests, but the payload holds only
+          the titles and the wanted cells, however large the tabs are.
+- grid:   one spreadsheets.get with includeGridData and a field mask that
+          keeps only tab titles and effective cell values. One request per
+          spreadsheet, but the API cannot cut grid data down to one cell of
+          tabs whose names are not known yet, so the response carries every
+          cell of every tab. Only worth it for documents with small tabs.
+
+Values come back as values.get(valueRenderOption='UNFORMATTED_VALUE') would
+return them: numbers, booleans and strings as is, blanks as ''.
+
+In plan mode nothing is read: the census calls are only counted and the
+census comes back empty.
+"""
+import os
+import re
+from sheets_plan import PLAN_MODE, planner
+
+TAB_CENSUS_MODE = os.getenv('TAB_CENSUS_MODE', 'values')
+
+GRID_FIELDS = 'sheets(properties(title),data(startRow,startColumn,rowData(values(effectiveValue))))'
+
+# effectiveValue.errorValue.type -> the text the values API returns for it
+ERROR_TEXT = {
+    'NULL_VALUE': '#NULL!',
+    'DIVIDE_BY_ZERO': '#DIV/0!',
+    'VALUE': '#VALUE!',
+    'REF': '#REF!',
+    'NAME': '#NAME?',
+    'NUM': '#NUM!',
+    'N_A': '#N/A',
+    'LOADING': '#LOADING',
+    'ERROR': '#ERROR!',
+}
+
+
+def cell_position(cell):
+    """'C5' -> (row index, column index), both 0-based"""
+    match = re.match(r'^([A-Z]+)(\d+)$', cell.strip().upper())
+    if not match:
+        raise ValueError(f"Not a single-cell A1 reference: {cell}")
+    letters, row = match.groups()
+    column = 0
+    for letter in letters:
+        column = column * 26 + ord(letter) - ord('A') + 1
+    return int(row) - 1, column - 1
+
+
+def _effective(cell):
+    value = (cell or {}).get('effectiveValue')
+    if not value:
+        return ''
+    if 'errorValue' in value:
+        return ERROR_TEXT.get(value['errorValue'].get('type'), '#ERROR!')
+    return next(iter(value.values()))
+
+
+def _grid_value(data, row, column):
+    """The effective value at (row, column) of a sheet's grid data blocks"""
+    for block in data:
+        row_data = block.get('rowData', [])
+        values_row = row - block.get('startRow', 0)
+        values_col = column - block.get('startColumn', 0)
+        if 0 <= values_row < len(row_data) and values_col >= 0:
+            values = row_data[values_row].get('values', [])
+            if values_col < len(values):
+                return _effective(values[values_col])
+    return ''
+
+
+def _census_grid(sheets, spreadsheet_id, positions, skip):
+    spreadsheet = sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        includeGridData=True,
+        fields=GRID_FIELDS
+    ).execute()
+
+    census = []
+    for sheet in spreadsheet.get('sheets', []):
+        title = sheet['properties']['title']
+        if title in skip:
+            continue
+        data = sheet.get('data', [])
+        census.append((title, [_grid_value(data, row, column) for row, column in positions]))
+    return census
+
+
+def _census_values(sheets, spreadsheet_id, cells, skip):
+    spreadsheet = sheets.spreadsheets().get(
+        spreadsheetId=spreadsheet_id,
+        fields='sheets.properties.title'
+    ).execute()
+    titles = [
+        sheet['properties']['title'] for sheet in spreadsheet.get('sheets', [])
+        if sheet['properties']['title'] not in skip
+    ]
+    if not titles:
+        return []
+
+    ranges = [f"'{title}'!{cell}" for title in titles for cell in cells]
+    result = sheets.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id,
+        ranges=ranges,
+        valueRenderOption='UNFORMATTED_VALUE'
+    ).execute()
+    value_ranges = result.get('valueRanges', [])
+
+    census = []
+    for index, title in enumerate(titles):
+        row = []
+        for value_range in value_ranges[index * len(cells):(index + 1) * len(cells)]:
+            values = value_range.get('values', [])
+            row.append(values[0][0] if values and values[0] else '')
+        census.append((title, row))
+    return census
+
+
+def tab_census(sheets, spreadsheet_id, cells, skip=(), mode=None):
+    """[(tab title, [value of each of `cells`])] for every tab not in `skip`, in tab order"""
+    mode = mode or TAB_CENSUS_MODE
+    if mode not in ('grid', 'values'):
+        raise ValueError(f"Unknown TAB_CENSUS_MODE: {mode}")
+    if PLAN_MODE:
+        planner.estimate('spreadsheets.get', spreadsheet_id)
+        if mode == 'values':
+            planner.estimate('spreadsheets.values.batchGet', spreadsheet_id)
+        return []
+    if mode == 'values':
+        return _census_values(sheets, spreadsheet_id, list(cells), set(skip))
+    return _census_grid(sheets, spreadsheet_id, [cell_position(cell) for cell in cells], set(skip))
@@ -0,0 +1,177 @@
+from array import array
+
+
+class Column:
+    """
+    One dictionary-encoded column: a compact array of codes, one per row,
+    plus the list of distinct cell values the codes point into.
+
+    Code 0 is always the blank cell, so missing cells in ragged rows cost
+    nothing extra. Columns are read-only once built, which lets
+    ColumnarTable.project share them between tables.
+    """
+
+    def __init__(self, values=None, codes=None):
+        self.values = values if values is not None else ['']
+        self.codes = codes if codes is not None else array('I')
+
+    @classmethod
+    def from_cells(cls, cells):
+        column = cls()
+        lookup = {'': 0}
+        values = column.values
+        codes = column.codes
+        for cell in cells:
+            code = lookup.get(cell)
+            if code is None:
+                code = lookup[cell] = len(values)
+                values.append(cell)
+            codes.append(code)
+        return column
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row_id):
+        return self.values[self.codes[row_id]]
+
+    def decode(self, fn):
+        """fn(value) for every distinct value, indexed by code (fn runs once per value)"""
+        return [fn(value) for value in self.values]
+
+    def codes_where(self, predicate):
+        """Codes of the distinct values for which predicate(value) is true"""
+        return {code for code, value in enumerate(self.values) if predicate(value)}
+
+    def take(self, row_ids):
+        """A column of the given rows, re-encoded so it only keeps the values they use"""
+        remap = {0: 0}
+        values = ['']
+        codes = array('I')
+        for row_id in row_ids:
+            old_code = self.codes[row_id]
+            code = remap.get(old_code)
+            if code is None:
+                code = remap[old_code] = len(values)
+                values.append(self.values[old_code])
+            codes.append(code)
+        return Column(values, codes)
+
+
+class ColumnarTable:
+    """
+    A values response stored column by column.
+
+    Filters and sort keys are evaluated once per distinct value of a column
+    and then applied with a single pass over its code array, so their cost
+    grows with the number of rows only through that scan. Iterating the
+    table yields plain row lists (width columns, blanks as ''), so code that
+    writes rows back to a sheet can consume a table directly.
+    """
+
+    def __init__(self, columns, n_rows):
+        self.columns = columns
+        self.n_rows = n_rows
+
+    @classmethod
+    def from_rows(cls, rows, width=None):
+        if width is None:
+            width = max((len(row) for row in rows), default=0)
+        columns = [
+            Column.from_cells(row[index] if len(row) > index else '' for row in rows)
+            for index in range(width)
+        ]
+        return cls(columns, len(rows))
+
+    @property
+    def width(self):
+        return len(self.columns)
+
+    def __len__(self):
+        return self.n_rows
+
+    def __iter__(self):
+        for row_id in range(self.n_rows):
+            yield self.row(row_id)
+
+    def column(self, index):
+        """The column at `index`; columns past the table's width read as blank"""
+        if index < len(self.columns):
+            return self.columns[index]
+        return Column(codes=array('I', [0]) * self.n_rows)
+
+    def value(self, row_id, index):
+        return self.column(index)[row_id]
+
+    def row(self, row_id):
+        return [column[row_id] for column in self.columns]
+
+    def where(self, index, predicate, row_ids=None):
+        """Row IDs (ascending) whose cell in column `index` satisfies predicate"""
+        column = self.column(index)
+        codes = column.codes
+        if row_ids is None:
+            matching = column.codes_where(predicate)
+            return [row_id for row_id, code in enumerate(codes) if code in matching]
+
+        # For a subset, only the values those rows actually use are checked
+        verdicts = {}
+        matching_ids = []
+        for row_id in row_ids:
+            code = codes[row_id]
+            verdict = verdicts.get(code)
+            if verdict is None:
+                verdict = verdicts[code] = bool(predicate(column.values[code]))
+            if verdict:
+                matching_ids.append(row_id)
+        return matching_ids
+
+    def group_ids(self, index, normalize=str):
+        """{normalize(value): ascending row IDs} for the non-blank cells of a column"""
+        column = self.column(index)
+        keys = column.decode(lambda value: normalize(value) if value else '')
+        groups = {}
+        for row_id, code in enumerate(column.codes):
+            key = keys[code]
+            if key:
+                groups.setdefault(key, []).append(row_id)
+        return groups
+
+    def token_ids(self, index, tokenize):
+        """
+        {token: ascending row IDs} for a multi-valued column (e.g. a comma-
+        separated label list); tokenize runs once per distinct value and a
+        row is listed once under each distinct token of its cell.
+        """
+        column = self.column(index)
+        tokens = column.decode(lambda value: set(tokenize(value)) if value else ())
+        groups = {}
+        for row_id, code in enumerate(column.codes):
+            for token in tokens[code]:
+                groups.setdefault(token, []).append(row_id)
+        return groups
+
+    def sort_ids(self, index, key, reverse=False, row_ids=None):
+        """Row IDs ordered by key(cell) of column `index`; key runs once per distinct value"""
+        column = self.column(index)
+        keys = column.decode(key)
+        codes = column.codes
+        if row_ids is None:
+            row_ids = range(self.n_rows)
+        # sorted() is stable, so equal keys keep their source order
+        return sorted(row_ids, key=lambda row_id: keys[codes[row_id]], reverse=reverse)
+
+    def take(self, row_ids):
+        """A new table holding the given rows, in the given order"""
+        row_ids = list(row_ids)
+        return ColumnarTable([column.take(row_ids) for column in self.columns], len(row_ids))
+
+    def sort_by(self, index, key, reverse=False):
+        return self.take(self.sort_ids(index, key, reverse))
+
+    def project(self, width):
+        """The first `width` columns (e.g. C:N out of C:T), sharing this table's storage"""
+        return ColumnarTable(self.columns[:width], self.n_rows)
+
+    def to_rows(self):
+        return list(self)
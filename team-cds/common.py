@@ -1,32 +1,149 @@
 import os
 import json
+import threading
+import httplib2
+import google_auth_httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
-
-
-def authenticate():
-    credentials_info = json.loads(os.getenv('TEAM_CDS_SERVICE_ACCOUNT_JSON'))
-    credentials = service_account.Credentials.from_service_account_info(
+from googleapiclient.http import HttpRequest
+from registry import registry, TeamSheetRegistry
+from rate_limit import acquire_for, quota_pool
+from sheets_client import build_service as build_async_service
+from snapshot_cache import configure_probe
+from sheets_plan import plan_service
+from sheets_metrics import instrument_http
+
+
+def service_account_infos():
+    """
+    Every configured service account: TEAM_CDS_SERVICE_ACCOUNT_JSON holds one
+    account or a JSON list of them, and TEAM_CDS_SERVICE_ACCOUNT_JSON_2,
+    _3, ... add more (numbered secrets are easier to manage in CI).
+    """
+    infos = json.loads(os.getenv('TEAM_CDS_SERVICE_ACCOUNT_JSON'))
+    infos = infos if isinstance(infos, list) else [infos]
+    number = 2
+    while os.getenv(f'TEAM_CDS_SERVICE_ACCOUNT_JSON_{number}'):
+        infos.append(json.loads(os.getenv(f'TEAM_CDS_SERVICE_ACCOUNT_JSON_{number}')))
+        number += 1
+    return infos
+
+
+def _credentials(credentials_info):
+    return service_account.Credentials.from_service_account_info(
         credentials_info,
         scopes=['https://www.googleapis.com/auth/spreadsheets']
     )
+
+
+def authenticate():
+    credentials = _credentials(service_account_infos()[0])
+    # Lets cached source snapshots be checked for changes (SNAPSHOT_PROBE)
+    configure_probe(credentials)
     return credentials
 
 
+def authenticate_pool():
+    """
+    Credentials of every configured service account, for crawl-heavy jobs.
+
+    Pass the list to build_sheets_service: each account gets its own quota
+    buckets and connections, so read throughput grows with the number of
+    accounts. Every account needs access to every spreadsheet the job reads
+    or writes.
+    """
+    infos = service_account_infos()
+    pool = [authenticate()] + [_credentials(info) for info in infos[1:]]
+    if len(pool) > 1:
+        print(f"🔑 Credential pool: {len(pool)} service accounts")
+    return pool
+
+
+# httplib2 connections are not thread-safe, so every thread gets its own
+# authorized connection (reused across that thread's requests).
+_thread_local = threading.local()
+
+# Stages run concurrently in one process, so transient 429/5xx responses are
+# retried with googleapiclient's exponential backoff instead of failing a tenant.
+API_NUM_RETRIES = 5
+
+
+def _thread_http(credentials):
+    connections = getattr(_thread_local, 'connections', None)
+    if connections is None:
+        connections = _thread_local.connections = {}
+    http = connections.get(id(credentials))
+    if http is None:
+        http = instrument_http(google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http()))
+        connections[id(credentials)] = http
+    return http
+
+
+class RetryingHttpRequest(HttpRequest):
+    def execute(self, http=None, num_retries=API_NUM_RETRIES):
+        # Every request in the process draws from the same read/write quota
+        acquire_for(self.method)
+        return super().execute(http=http, num_retries=num_retries)
+
+
+class PooledHttpRequest(HttpRequest):
+    """A request sent as whichever pooled service account is least loaded"""
+
+    pool_credentials = ()
+
+    def execute(self, http=None, num_retries=API_NUM_RETRIES):
+        account = quota_pool.checkout(self.method)
+        try:
+            # Retries stay on the same account (and its connection)
+            return super().execute(http=_thread_http(self.pool_credentials[account]), num_retries=num_retries)
+        finally:
+            quota_pool.release(account)
+
+
+# SHEETS_CLIENT=async sends every request through the pooled asyncio client
+# in sheets_client.py instead of googleapiclient/httplib2.
+SHEETS_CLIENT = os.getenv('SHEETS_CLIENT', 'googleapiclient')
+
+
+def build_sheets_service(credentials):
+    """
+    Build a Sheets client that can be shared by several threads (write-recording in plan mode).
+
+    `credentials` may be a list from authenticate_pool(); requests are then
+    spread over the accounts, least-loaded first.
+    """
+    pool = list(credentials) if isinstance(credentials, (list, tuple)) else [credentials]
+    if len(pool) > 1 and SHEETS_CLIENT == 'async':
+        print("⚠️ SHEETS_CLIENT=async uses one connection pool; only the first service account is used")
+        pool = pool[:1]
+
+    if SHEETS_CLIENT == 'async':
+        return plan_service(build_async_service(pool[0], before_execute=acquire_for))
+
+    if len(pool) == 1:
+        def build_request(http, *args, **kwargs):
+            return RetryingHttpRequest(_thread_http(pool[0]), *args, **kwargs)
+    else:
+        quota_pool.resize(len(pool))
+
+        def build_request(http, *args, **kwargs):
+            request = PooledHttpRequest(http, *args, **kwargs)
+            request.pool_credentials = pool
+            return request
+
+    return plan_service(build('sheets', 'v4', credentials=pool[0], requestBuilder=build_request))
+
+
 def get_sheet_titles(sheets, spreadsheet_id):
-    res = sheets.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-    titles = [sheet['properties']['title'] for sheet in res.get('sheets', [])]
+    titles = list(registry.tabs(sheets, spreadsheet_id))
     print(f"📄 Sheets in {spreadsheet_id}:", titles)
     return titles
 
 
 def get_all_team_cds_sheet_ids(sheets, utils_sheet_id):
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=utils_sheet_id,
-        range='UTILS!B2:B100'  # <-- fixed range with explicit end row
-    ).execute()
-    values = result.get('values', [])
-    return [item for sublist in values for item in sublist if item]
+    if utils_sheet_id != registry.utils_sheet_id:
+        return TeamSheetRegistry(utils_sheet_id).sheet_ids(sheets)
+    return registry.sheet_ids(sheets)
 
 
 def get_selected_milestones(sheets, sheet_id, g_milestones):
@@ -42,8 +159,9 @@ def get_selected_milestones(sheets, sheet_id, g_milestones):
 # Task Reminders functions
 # =========================
 
-import datetime
 from constants import UTILS_SHEET_ID, CDS_MASTER_ROSTER
+# Re-exported for the reminder scripts; parsing lives in the shared date_utils
+from date_utils import days_since
 
 def get_sheet_ids(sheets):
     result = sheets.spreadsheets().values().get(
@@ -74,33 +192,3 @@ def get_assignee_email_map(sheets):
     except Exception as e:
         print(f"❌ Failed to load assignee-email mapping: {e}")
         return {}
-
-# def days_since(date_str):
-#     try:
-#         return (datetime.datetime.now() - datetime.datetime.strptime(date_str, "%m/%d/%Y")).days
-#     except ValueError:
-#         try:
-#             return (datetime.datetime.now() - datetime.datetime.strptime(date_str, "%a, %b %d, %Y")).days
-#         except Exception as e:
-#             print(f"⚠️ Could not parse date '{date_str}': {e}")
-#             return None
-
-def days_since(date_str):
-    try:
-        # Normalize unicode (replace narrow no-break space with normal space)
-        date_str = date_str.replace("\u202f", " ").strip()
-        
-        # Try format with full datetime and time
-        try:
-            parsed = datetime.datetime.strptime(date_str, "%a, %b %d, %Y, %I:%M:%S %p")
-        except ValueError:
-            try:
-                parsed = datetime.datetime.strptime(date_str, "%a, %b %d, %Y")
-            except ValueError:
-                parsed = datetime.datetime.strptime(date_str, "%m/%d/%Y")
-        
-        return (datetime.datetime.now() - parsed).days
-    except Exception as e:
-        print(f"⚠️ Could not parse date '{date_str}': {e}")
-        return None
-
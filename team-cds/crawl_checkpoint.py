@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from sheets_plan import PLAN_MODE
+
+CHECKPOINT_DIR = os.getenv(
+    'TEAM_CDS_CHECKPOINT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache', 'team-cds')
+)
+# A checkpoint older than this belongs to an earlier run, not one to resume
+CHECKPOINT_MAX_AGE_HOURS = float(os.getenv('TEAM_CDS_CHECKPOINT_MAX_AGE_HOURS', 12))
+# Per-document results are saved at most this often; batch and tenant ends always save
+CHECKPOINT_SAVE_INTERVAL = float(os.getenv('TEAM_CDS_CHECKPOINT_SAVE_INTERVAL', 30))
+CHECKPOINT_RESUME = os.getenv('TEAM_CDS_RESUME', 'true').lower() != 'false'
+
+
+class CrawlCheckpoint:
+    """
+    Progress of a long crawl, saved so a run that timed out or crashed can
+    be resumed by the next one.
+
+    Records per-document results, and per tenant the order its work was
+    batched in, which batches were written and whether the tenant finished. A resumed run skips finished tenants and
+    written batches, and fills rows from the saved document results instead
+    of crawling again; rows whose results were saved but not yet written
+    are written then. The checkpoint is removed once every tenant finished.
+    """
+
+    def __init__(self, name, directory=CHECKPOINT_DIR, max_age_hours=CHECKPOINT_MAX_AGE_HOURS,
+                 save_interval=CHECKPOINT_SAVE_INTERVAL, resume=CHECKPOINT_RESUME):
+        self.path = os.path.join(directory, f"{name}-checkpoint.json")
+        self.max_age = max_age_hours * 3600
+        self.save_interval = save_interval
+        self.resume = resume
+        # A plan run never writes, so there is nothing to resume
+        self.enabled = not PLAN_MODE
+        self._state = None
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """Load a checkpoint to resume, or start a fresh one; returns True when resuming"""
+        with self._lock:
+            state = None
+            if self.enabled and self.resume:
+                try:
+                    with open(self.path) as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = None
+            if state and time.time() - state.get('updated_at', 0) > self.max_age:
+                print(f"🗑️ Ignoring checkpoint from {time.ctime(state.get('updated_at', 0))} (too old)")
+                state = None
+
+            resumed = state is not None
+            self._state = state or {'started_at': time.time(), 'documents': {}, 'tenants': {}}
+            if resumed:
+                print(f"⏯️ Resuming from checkpoint {self.path}: "
+                      f"{len(self._state['documents'])} documents counted, "
+                      f"{sum(1 for t in self._state['tenants'].values() if t.get('finished'))} tenants finished")
+            return resumed
+
+    @property
+    def started_at(self):
+        """When the crawl being resumed (or this one) started, as time.time()"""
+        with self._lock:
+            return self._state['started_at']
+
+    def documents(self):
+        """{document ID: saved result} from the checkpoint"""
+        with self._lock:
+            return dict(self._state['documents'])
+
+    def record_document(self, document_id, result):
+        with self._lock:
+            self._state['documents'][document_id] = result
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def _tenant(self, tenant_id):
+        return self._state['tenants'].setdefault(tenant_id, {})
+
+    def tenant_finished(self, tenant_id):
+        with self._lock:
+            return bool(self._state['tenants'].get(tenant_id, {}).get('finished'))
+
+    def finish_tenant(self, tenant_id):
+        with self._lock:
+            self._tenant(tenant_id)['finished'] = True
+            self._save()
+
+    def work_order(self, tenant_id, units, order):
+        """
+        The order this tenant's work was started in, if its work list (`units`
+        digest) is unchanged; otherwise `order`, saved so a resumed run batches
+        the work exactly as the interrupted one did.
+        """
+        with self._lock:
+            tenant = self._tenant(tenant_id)
+            if tenant.get('units') == units and tenant.get('order'):
+                return list(tenant['order'])
+            tenant['units'] = units
+            tenant['order'] = list(order)
+            tenant['batches_written'] = []
+            self._save()
+            return list(order)
+
+    def batches_written(self, tenant_id, units):
+        """Numbers of this tenant's batches already written, if its work list (`units` digest) is unchanged"""
+        with self._lock:
+            tenant = self._state['tenants'].get(tenant_id, {})
+            return set(tenant.get('batches_written', [])) if tenant.get('units') == units else set()
+
+    def finish_batch(self, tenant_id, units, batch_num):
+        """Record one written batch; a batch that failed in between is not covered by it"""
+        with self._lock:
+            tenant = self._tenant(tenant_id)
+            if tenant.get('units') != units:
+                tenant['units'] = units
+                tenant['batches_written'] = []
+            if batch_num not in tenant['batches_written']:
+                tenant['batches_written'].append(batch_num)
+            self._save()
+
+    def complete(self, tenant_ids):
+        """Remove the checkpoint if every tenant finished; returns True if it was removed"""
+        with self._lock:
+            tenants = self._state['tenants']
+            if not all(tenants.get(tenant_id, {}).get('finished') for tenant_id in tenant_ids):
+                self._save()
+                return False
+            if self.enabled and os.path.exists(self.path):
+                os.remove(self.path)
+            return True
+
+    def _save(self):
+        if not self.enabled:
+            return
+        self._state['updated_at'] = time.time()
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._state, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            print(f"⚠️ Could not save checkpoint {self.path}: {str(e)}")
+        self._saved_at = time.monotonic()
@@ -0,0 +1,123 @@
+import os
+import json
+import math
+import time
+import tempfile
+import threading
+from sheets_plan import PLAN_MODE
+from sync_journal import digest
+from crawl_checkpoint import CHECKPOINT_SAVE_INTERVAL
+
+# What each crawled document looked like and when, kept between runs (CI keeps it with actions/cache)
+CRAWL_HISTORY_DIR = os.getenv(
+    'TEAM_CDS_CRAWL_HISTORY_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache', 'team-cds')
+)
+# A document that has been stable for S days is expected to change about
+# once every S + this many days
+STALENESS_PRIOR_DAYS = float(os.getenv('TEAM_CDS_STALENESS_PRIOR_DAYS', 3))
+# Documents that keep failing still get a share of the crawl
+MIN_RELIABILITY = 0.1
+
+DAY = 86400.0
+
+
+class CrawlHistory:
+    """
+    Per document: when it was last crawled, when its result last changed,
+    and how many crawls failed.
+
+    priority() is the chance the document changed since its last crawl:
+    1 - exp(-age / (stable time + prior)), where age is the time since the
+    last crawl and stable time is how long the last-known result has held.
+    So a document edited yesterday is refreshed before one untouched for
+    months, and a long-unvisited one rises until it is crawled again. The
+    chance is scaled down by the document's past error rate. Documents
+    never crawled come first.
+    """
+
+    def __init__(self, name, directory=CRAWL_HISTORY_DIR, prior_days=STALENESS_PRIOR_DAYS,
+                 save_interval=CHECKPOINT_SAVE_INTERVAL):
+        self.path = os.path.join(directory, f"{name}-history.json")
+        self.prior = prior_days * DAY
+        # Saved on the checkpoint's schedule, so a run that dies keeps what it learned
+        self.save_interval = save_interval
+        self._entries = None
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def priority(self, document_id, now):
+        """Chance (0-1) that the document changed since its last crawl, as of `now`"""
+        with self._lock:
+            entry = self._load().get(document_id)
+        if not entry or not entry.get('crawled_at'):
+            return 1.0
+
+        age = max(0.0, now - entry['crawled_at'])
+        stable = max(0.0, entry['crawled_at'] - entry.get('changed_at', entry['crawled_at']))
+        changed = 1 - math.exp(-age / (stable + self.prior))
+
+        attempts = entry.get('crawls', 0) + entry.get('errors', 0)
+        error_rate = entry.get('errors', 0) / attempts if attempts else 0.0
+        return changed * max(MIN_RELIABILITY, 1 - error_rate)
+
+    def order(self, items, document_id, now):
+        """`items` sorted most-likely-changed first; ties keep their order"""
+        scores = {}
+        for item in items:
+            key = document_id(item)
+            if key not in scores:
+                scores[key] = self.priority(key, now)
+        return sorted(items, key=lambda item: -scores[document_id(item)])
+
+    def record(self, document_id, result=None, error=False, now=None):
+        """Remember a crawl: its result (JSON-serializable) or that it failed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._load().setdefault(document_id, {})
+            if error:
+                entry['errors'] = entry.get('errors', 0) + 1
+            else:
+                result_digest = digest(result)
+                if entry.get('result') != result_digest:
+                    entry['result'] = result_digest
+                    entry['changed_at'] = now
+                entry['crawled_at'] = now
+                entry['crawls'] = entry.get('crawls', 0) + 1
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def save(self):
+        """Save now (callers also save at batch and tenant ends)"""
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        # A plan run crawls nothing for real
+        if PLAN_MODE:
+            return
+        entries = self._load()
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(entries, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        except OSError as e:
+            print(f"⚠️ Could not save crawl history {self.path}: {str(e)}")
+        self._saved_at = time.monotonic()
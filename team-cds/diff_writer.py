@@ -0,0 +1,90 @@
+def column_index(letter):
+    """0-based index of a column letter ('A' -> 0, 'T' -> 19)"""
+    index = 0
+    for char in letter:
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _normalize(row, width):
+    # values.get drops trailing blank cells, so compare rows the same way
+    cells = [str(cell) for cell in row[:width]]
+    while cells and cells[-1] == '':
+        cells.pop()
+    return cells
+
+
+def _pad(row, width):
+    cells = list(row[:width])
+    return cells + [''] * (width - len(cells))
+
+
+def _changed_runs(current, desired):
+    """(start, end) index pairs (end exclusive) of contiguous rows that differ"""
+    runs = []
+    start = None
+    for i, row in enumerate(desired):
+        same = i < len(current) and current[i] == row
+        if not same and start is None:
+            start = i
+        elif same and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(desired)))
+    return runs
+
+
+def sync_block(sheets, spreadsheet_id, tab, first_col, last_col, first_row, rows):
+    """
+    Make {tab}!{first_col}{first_row}:{last_col} hold exactly `rows`,
+    writing only what differs from what is already there.
+
+    Rows are compared by position: contiguous runs of changed or new rows go
+    out in one values.batchUpdate, and rows left over from a longer previous
+    table are cleared in one values.batchClear. Nothing is sent when the
+    block already matches. Returns the number of rows written or cleared.
+    """
+    width = column_index(last_col) - column_index(first_col) + 1
+    block = f"{tab}!{first_col}{first_row}:{last_col}"
+
+    result = sheets.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range=block
+    ).execute()
+    current = [_normalize(row, width) for row in result.get('values', [])]
+    while current and not current[-1]:
+        current.pop()
+
+    desired = [_normalize(row, width) for row in rows]
+    runs = _changed_runs(current, desired)
+    stale = max(len(current) - len(desired), 0)
+
+    if not runs and not stale:
+        print(f"⏸️ {block} unchanged ({len(desired)} rows), nothing to write")
+        return 0
+
+    if runs:
+        data = []
+        for start, end in runs:
+            data.append({
+                'range': f"{tab}!{first_col}{first_row + start}:{last_col}{first_row + end - 1}",
+                'values': [_pad(row, width) for row in rows[start:end]]
+            })
+        changed = sum(end - start for start, end in runs)
+        print(f"📤 Writing {changed} changed rows in {len(runs)} ranges to {block}")
+        sheets.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'RAW', 'data': data}
+        ).execute()
+    else:
+        changed = 0
+
+    if stale:
+        print(f"🧹 Clearing {stale} leftover rows below row {first_row + len(desired) - 1} in {tab}")
+        sheets.spreadsheets().values().batchClear(
+            spreadsheetId=spreadsheet_id,
+            body={'ranges': [f"{tab}!{first_col}{first_row + len(desired)}:{last_col}"]}
+        ).execute()
+
+    return changed + stale
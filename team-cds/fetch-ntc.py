@@ -1,40 +1,38 @@
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from googleapiclient.discovery import build
 from constants import (
-    UTILS_SHEET_ID,
     G_MILESTONES,
     NTC_SHEET,
     DASHBOARD_SHEET,
     SHEET_SYNC_SID,  # Updated to use SHEET_SYNC_SID
+    ALL_ISSUES,
     generate_timestamp_string,
 )
+from registry import registry
 from common import (
     authenticate,
-    get_sheet_titles,
-    get_all_team_cds_sheet_ids,
+    build_sheets_service,
     get_selected_milestones,
 )
+from tenant_pool import run_for_tenants
+from sync_journal import journal, sync_tab, digest, script_digest
+from diff_writer import sync_block
+from snapshot import get_snapshot, normalize_casefold, split_labels
+from row_filter import FilterSpec, ValueIn, TokensIntersect, Pipeline
 
-def get_all_ntc(sheets):
-    """Get all issues from ALL ISSUES sheet (SHEET_SYNC_SID) for NTC filtering"""
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=SHEET_SYNC_SID,
-        range="ALL ISSUES!C4:T"
-    ).execute()
+# Part of every inputs hash, so editing this script's filters forces a resync
+SCRIPT_DIGEST = script_digest(__file__)
 
-    values = result.get('values', [])
-    if not values:
-        raise Exception(f"No data found in range ALL ISSUES!C4:T")
-    return values
+# NTC = rows with a selected milestone (lowercased) and a required label, in source order
+NTC_PIPELINE = Pipeline(NTC_SHEET)
 
-def clear_ntc(sheets, sheet_id):
-    """Clear existing data in NTC sheet"""
-    sheets.spreadsheets().values().clear(
-        spreadsheetId=sheet_id,
-        range=f"{NTC_SHEET}!C4:N"
-    ).execute()
+def get_all_ntc(sheets):
+    """Get the ALL ISSUES snapshot (SHEET_SYNC_SID) for NTC filtering, downloaded once per run"""
+    snapshot = get_snapshot(sheets, ALL_ISSUES)
+    if not snapshot:
+        raise Exception(f"No data found in range {ALL_ISSUES}")
+    return snapshot
 
 def pad_row_to_n(row):
     """Pad row to 12 columns (C to N = 12 columns)"""
@@ -42,16 +40,9 @@ def pad_row_to_n(row):
     return row + [''] * (full_length - len(row))
 
 def insert_data_to_ntc(sheets, sheet_id, data):
-    """Insert processed data to NTC sheet"""
+    """Sync processed data into NTC sheet, writing only the rows that changed"""
     padded_data = [pad_row_to_n(row[:12]) for row in data]
-    print(f"📤 Inserting {len(padded_data)} rows to {NTC_SHEET}!C4")
-
-    sheets.spreadsheets().values().update(
-        spreadsheetId=sheet_id,
-        range=f"{NTC_SHEET}!C4",
-        valueInputOption='RAW',
-        body={'values': padded_data}
-    ).execute()
+    return sync_block(sheets, sheet_id, NTC_SHEET, 'C', 'N', 4, padded_data)
 
 def update_timestamp(sheets, sheet_id):
     """Update timestamp in Dashboard sheet"""
@@ -64,147 +55,143 @@ def update_timestamp(sheets, sheet_id):
         body={'values': [[formatted]]}
     ).execute()
 
-def debug_ntc_filtering(ntc_data, milestones):
+def write_ntc(sheets, sheet_id, rows):
+    """Sync NTC, moving the Dashboard timestamp only if something changed"""
+    if insert_data_to_ntc(sheets, sheet_id, rows):
+        update_timestamp(sheets, sheet_id)
+    else:
+        print("⏸️ Output unchanged, Dashboard timestamp left as is")
+
+def debug_ntc_filtering(ntc_snapshot, milestones):
     """Debug function to show NTC filtering details"""
     print("🔍 DEBUG: NTC Filtering Analysis...")
     print(f"🔍 Column mapping from ALL ISSUES C4:T:")
     print(f"   - Column H (index 5): Labels")
     print(f"   - Column I (index 6): Milestone")
     
-    if not ntc_data:
+    if not ntc_snapshot:
         print("🔍 No source data found!")
         return
     
     # Show first few rows
     print(f"\n🔍 First 3 rows sample:")
-    for i, row in enumerate(ntc_data[:3], 1):
-        labels = row[5] if len(row) > 5 else 'N/A'
-        milestone = row[6] if len(row) > 6 else 'N/A'
-        print(f"  Row {i}: Labels='{labels}' | Milestone='{milestone}'")
+    table = ntc_snapshot.table
+    for i in range(min(3, len(table))):
+        labels = table.value(i, 5) or 'N/A'
+        milestone = table.value(i, 6) or 'N/A'
+        print(f"  Row {i + 1}: Labels='{labels}' | Milestone='{milestone}'")
     
-    # Get unique milestones
-    source_milestones = set()
-    for row in ntc_data:
-        if len(row) > 6 and row[6] and str(row[6]).strip():
-            source_milestones.add(str(row[6]).strip().lower())
+    # Unique milestones come straight from the shared lowercased milestone partition
+    source_milestones = ntc_snapshot.partition(6, normalize_casefold).keys()
     
     print(f"\n🔍 Found {len(source_milestones)} unique milestones")
     print(f"🔍 First 10 source milestones: {list(source_milestones)[:10]}")
     
     # Check matches
     normalized_milestones = set(m.lower().strip() for m in milestones)
-    exact_matches = source_milestones.intersection(normalized_milestones)
+    exact_matches = source_milestones & normalized_milestones
     print(f"🔍 Milestone matches: {len(exact_matches)} - {list(exact_matches)[:5]}")
     print(f"🔍 Target milestones (first 5): {milestones[:5]}")
 
-def filter_ntc_data(ntc_data, milestones, required_labels):
-    """Filter NTC data by milestones and labels"""
-    if not ntc_data:
+def filter_ntc_data(ntc_snapshot, milestones, required_labels):
+    """Filter NTC data by milestones and labels
+    
+    Selection is a set intersection of the matching buckets of the shared
+    lowercased milestone partition and the shared label index, so no label
+    string is split per team sheet.
+    """
+    if not ntc_snapshot:
         return []
     
-    debug_ntc_filtering(ntc_data, milestones)
+    debug_ntc_filtering(ntc_snapshot, milestones)
     
-    filtered = []
-    normalized_milestones = [m.lower().strip() for m in milestones]
+    table = ntc_snapshot.table
+    normalized_milestones = set(m.lower().strip() for m in milestones)
+    spec = FilterSpec(
+        # Column I (index 6) = Milestone, Column H (index 5) = Labels from ALL ISSUES C4:T
+        ValueIn(6, normalized_milestones, normalize_casefold, name='milestone'),
+        TokensIntersect(5, required_labels, split_labels, name='labels'),
+    )
     
     print(f"\n📋 Required labels: {required_labels}")
-    print(f"📋 Filtering {len(ntc_data)} rows...\n")
-
-    for i, row in enumerate(ntc_data, 1):
-        # Column I (index 6) = Milestone from ALL ISSUES C4:T
-        milestone_raw = row[6] if len(row) > 6 else ''
-        milestone = milestone_raw.lower().strip()
-
-        # Column H (index 5) = Labels from ALL ISSUES C4:T
-        labels_raw = row[5] if len(row) > 5 else ''
-        labels = [label.strip().lower() for label in labels_raw.split(',')]
-
-        matches_milestone = milestone in normalized_milestones
-        has_relevant_label = any(label in required_labels for label in labels)
-
-        if matches_milestone and has_relevant_label:
-            print(f"✅ Row {i} MATCHES — Milestone: '{milestone_raw}', Labels: '{labels_raw}'")
-            filtered.append(row)
-        elif i <= 10:  # Show first 10 non-matches for debugging
-            reasons = []
-            if not matches_milestone:
-                reasons.append(f"milestone '{milestone_raw}' not matched")
-            if not has_relevant_label:
-                reasons.append(f"labels '{labels_raw}' missing relevant tags")
-            print(f"❌ Row {i} skipped — {', '.join(reasons)}")
-
-    print(f"\n📊 Filtered {len(filtered)} rows from {len(ntc_data)} total rows")
+    print(f"📋 Intersecting milestone matches with the label index of {len(ntc_snapshot)} rows...\n")
+
+    filtered, matched_ids = NTC_PIPELINE.build(ntc_snapshot, spec)
+    for row_id in matched_ids:
+        print(f"✅ Row {row_id + 1} MATCHES — Milestone: '{table.value(row_id, 6)}', Labels: '{table.value(row_id, 5)}'")
+
+    print(f"\n📊 Filtered {len(filtered)} rows from {len(ntc_snapshot)} total rows")
     return filtered
 
-def main():
+def process_sheet(sheets, sheet_id, required_labels):
+    """Sync NTC for one Team CDS sheet"""
     try:
-        auth = authenticate()
-        sheets = build('sheets', 'v4', credentials=auth)
+        print(f"🔄 Processing: {sheet_id}")
+
+        # Get milestones and NTC data
+        print(f"📋 Getting milestones from {sheet_id} - {G_MILESTONES}")
+        milestones = get_selected_milestones(sheets, sheet_id, G_MILESTONES)
+        print(f"📋 Found {len(milestones)} milestones")
+
+        if not milestones:
+            print(f"⚠️ No milestones found for {sheet_id}, skipping...")
+            return
 
-        get_sheet_titles(sheets, UTILS_SHEET_ID)
-        sheet_ids = get_all_team_cds_sheet_ids(sheets, UTILS_SHEET_ID)
+        # Get all issues from SHEET_SYNC_SID - ALL ISSUES sheet
+        print(f"📋 Getting issues from {SHEET_SYNC_SID} - ALL ISSUES!C4:T")
+        ntc_data = get_all_ntc(sheets)
+        print(f"📋 Found {len(ntc_data)} total rows")
 
-        if not sheet_ids:
-            print("❌ No Team CDS sheet IDs found in UTILS!B2:B")
+        # Same selection, same source and same script as the last sync: nothing to do
+        inputs = digest(SCRIPT_DIGEST, milestones, sorted(required_labels), ntc_data.fingerprint())
+        if journal.inputs_unchanged(sheet_id, NTC_SHEET, inputs):
+            print(f"⏭️ Inputs unchanged since the last sync, skipping {sheet_id}")
             return
 
-        required_labels = [
-            'needs test case',
-            'needs test scenario',
-            'test case needs update',
-        ]
-
-        for sheet_id in sheet_ids:
-            try:
-                print(f"🔄 Processing: {sheet_id}")
-                sheet_titles = get_sheet_titles(sheets, sheet_id)
-
-                if G_MILESTONES not in sheet_titles:
-                    print(f"⚠️ Skipping {sheet_id} — missing '{G_MILESTONES}' sheet")
-                    continue
-
-                if NTC_SHEET not in sheet_titles:
-                    print(f"⚠️ Skipping {sheet_id} — missing '{NTC_SHEET}' sheet")
-                    continue
-
-                # Get milestones and NTC data
-                print(f"📋 Getting milestones from {sheet_id} - {G_MILESTONES}")
-                milestones = get_selected_milestones(sheets, sheet_id, G_MILESTONES)
-                print(f"📋 Found {len(milestones)} milestones")
-                
-                if not milestones:
-                    print(f"⚠️ No milestones found for {sheet_id}, skipping...")
-                    continue
-                
-                # Get all issues from SHEET_SYNC_SID - ALL ISSUES sheet
-                print(f"📋 Getting issues from {SHEET_SYNC_SID} - ALL ISSUES!C4:T")
-                ntc_data = get_all_ntc(sheets)
-                print(f"📋 Found {len(ntc_data)} total rows")
-
-                # Filter by milestones and required labels
-                filtered = filter_ntc_data(ntc_data, milestones, required_labels)
-
-                if not filtered:
-                    print(f"⚠️ No matching NTC data found for {sheet_id}")
-                    # Still clear the sheet and update timestamp
-                    clear_ntc(sheets, sheet_id)
-                    update_timestamp(sheets, sheet_id)
-                    continue
-
-                print(f"📊 Processing {len(filtered)} filtered NTC rows")
-
-                # Clear existing data and insert new data
-                clear_ntc(sheets, sheet_id)
-                insert_data_to_ntc(sheets, sheet_id, filtered)
-                update_timestamp(sheets, sheet_id)
-
-                print(f"✅ Finished: {sheet_id}")
-
-            except Exception as e:
-                print(f"❌ Error processing {sheet_id}: {str(e)}")
-                import traceback
-                traceback.print_exc()
+        # Filter by milestones and required labels
+        filtered = filter_ntc_data(ntc_data, milestones, required_labels)
+
+        if not filtered:
+            print(f"⚠️ No matching NTC data found for {sheet_id}")
+            # Still empty the sheet; the timestamp only moves if rows were removed
+            sync_tab(sheet_id, NTC_SHEET, inputs, [], lambda rows: write_ntc(sheets, sheet_id, rows))
+            return
+
+        print(f"📊 Processing {len(filtered)} filtered NTC rows")
+
+        # Write only the rows that differ from what the sheet already holds
+        sync_tab(sheet_id, NTC_SHEET, inputs, filtered, lambda rows: write_ntc(sheets, sheet_id, rows))
+
+        print(f"✅ Finished: {sheet_id}")
+
+    except Exception as e:
+        print(f"❌ Error processing {sheet_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
 
+def run(sheets):
+    """Sync NTC for every Team CDS sheet using an already-built Sheets client"""
+    sheet_ids = registry.tenants_with(sheets, G_MILESTONES, NTC_SHEET)
+
+    if not sheet_ids:
+        print("❌ No Team CDS sheets with the required tabs found")
+        return
+
+    required_labels = [
+        'needs test case',
+        'needs test scenario',
+        'test case needs update',
+    ]
+
+    run_for_tenants(sheet_ids, lambda sheet_id: process_sheet(sheets, sheet_id, required_labels))
+
+
+def main():
+    try:
+        auth = authenticate()
+        sheets = build_sheets_service(auth)
+        run(sheets)
+        
     except Exception as e:
         print(f"❌ Main failure: {str(e)}")
         import traceback
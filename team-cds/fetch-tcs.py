@@ -3,19 +3,37 @@ import os
 from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from googleapiclient.discovery import build
+from registry import registry
 from common import (
     authenticate,
-    get_sheet_titles,
-    get_all_team_cds_sheet_ids
+    build_sheets_service
 )
 from constants import (
-    UTILS_SHEET_ID,
     G_TC_SHEET,
     DASHBOARD_SHEET,
     SHEET_SYNC_SID,
+    ALL_ISSUES,
     generate_timestamp_string
 )
+from tenant_pool import run_for_tenants
+from sync_journal import journal, sync_tab, digest, script_digest
+from diff_writer import sync_block
+from date_utils import parse_date
+from snapshot import get_snapshot
+from row_filter import FilterSpec, ValueIn, Pipeline, BucketIndex
+
+# Part of every inputs hash, so editing this script's filters forces a resync
+SCRIPT_DIGEST = script_digest(__file__)
+
+# G-TC = 'QA TEAM' test cases by team members, columns C:N, most recent first by
+# creation date (column K, index 8); unparseable dates sort to the bottom (epoch)
+EPOCH = datetime(1970, 1, 1)
+G_TC_PIPELINE = Pipeline(G_TC_SHEET, width=12, sort_column=8, sort_key=lambda value: parse_date(value) or EPOCH, reverse=True)
+
+# 'QA TEAM' rows grouped by author (column F, index 3), each group already in
+# G-TC order: built once per run, so a tenant's G-TC is a merge of its
+# team members' buckets
+QA_TEAM_BY_AUTHOR = BucketIndex(FilterSpec(ValueIn(6, ["QA TEAM"], name='milestone')), 3, G_TC_PIPELINE)
 
 def get_team_members(sheets, sheet_id):
     """Get team member names from Dashboard sheet Q34:Q49"""
@@ -38,106 +56,27 @@ def get_team_members(sheets, sheet_id):
         return []
 
 def get_all_test_cases(sheets):
-    """Get all test cases from ALL ISSUES sheet (SHEET_SYNC_SID)"""
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=SHEET_SYNC_SID,
-        range="ALL ISSUES!C4:N"
-    ).execute()
+    """Get the ALL ISSUES snapshot (SHEET_SYNC_SID) for test case filtering
     
-    values = result.get('values', [])
-    if not values:
-        raise Exception(f"No data found in range ALL ISSUES!C4:N")
+    G-TC only keeps columns C:N, which the pipeline projects from the shared
+    C4:T snapshot, so fetch-issues, fetch-ntc and fetch-tcs share one
+    download of ALL ISSUES per run.
+    """
+    snapshot = get_snapshot(sheets, ALL_ISSUES)
+    if not snapshot:
+        raise Exception(f"No data found in range {ALL_ISSUES}")
     
-    return values
-
-def clear_g_tc(sheets, sheet_id):
-    """Clear existing data in G-TC sheet"""
-    sheets.spreadsheets().values().clear(
-        spreadsheetId=sheet_id,
-        range=f'{G_TC_SHEET}!C4:N'
-    ).execute()
+    return snapshot
 
 def pad_row_to_n(row):
     """Pad row to 12 columns (C to N = 12 columns)"""
     full_length = 12
     return row + [''] * (full_length - len(row))
 
-def parse_date_safely(date_str):
-    """Safely parse date string and return datetime object or None"""
-    if not date_str or not isinstance(date_str, str):
-        return None
-    
-    date_str = date_str.strip()
-    if not date_str:
-        return None
-    
-    # Try common date formats
-    date_formats = [
-        '%Y-%m-%d %H:%M:%S',  # 2024-01-15 10:30:00
-        '%Y-%m-%d',           # 2024-01-15
-        '%m/%d/%Y %H:%M:%S',  # 01/15/2024 10:30:00
-        '%m/%d/%Y',           # 01/15/2024
-        '%d/%m/%Y %H:%M:%S',  # 15/01/2024 10:30:00
-        '%d/%m/%Y',           # 15/01/2024
-        '%Y-%m-%dT%H:%M:%S',  # ISO format without timezone
-        '%Y-%m-%dT%H:%M:%SZ', # ISO format with Z
-    ]
-    
-    for fmt in date_formats:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    
-    print(f"⚠️ Could not parse date: '{date_str}'")
-    return None
-
-def sort_test_cases_by_date(filtered_test_cases):
-    """Sort test cases by creation date (column K/index 8) - most recent first"""
-    print(f"📅 Sorting {len(filtered_test_cases)} test cases by creation date...")
-    
-    def get_sort_key(row):
-        # Column K is index 8 (C=0, D=1, E=2, F=3, G=4, H=5, I=6, J=7, K=8)
-        created_date_str = row[8] if len(row) > 8 else ''
-        parsed_date = parse_date_safely(created_date_str)
-        
-        # Return parsed date if available, otherwise use epoch (very old date)
-        # This ensures unparseable dates go to the bottom
-        if parsed_date:
-            return parsed_date
-        else:
-            return datetime(1970, 1, 1)  # Epoch time for unparseable dates
-    
-    try:
-        # Sort in descending order (most recent first)
-        sorted_test_cases = sorted(filtered_test_cases, key=get_sort_key, reverse=True)
-        
-        # Debug: show first few dates
-        print("📅 First 3 sorted dates:")
-        for i, row in enumerate(sorted_test_cases[:3]):
-            date_str = row[8] if len(row) > 8 else 'N/A'
-            parsed = parse_date_safely(date_str)
-            print(f"  {i+1}. {date_str} -> {parsed}")
-        
-        print(f"✅ Successfully sorted {len(sorted_test_cases)} test cases by date")
-        return sorted_test_cases
-        
-    except Exception as e:
-        print(f"❌ Error sorting test cases by date: {str(e)}")
-        print("📄 Returning unsorted list...")
-        return filtered_test_cases
-
 def insert_data_to_g_tc(sheets, sheet_id, data):
-    """Insert processed data to G-TC sheet"""
+    """Sync processed data into G-TC sheet, writing only the rows that changed"""
     padded_data = [pad_row_to_n(row) for row in data]
-    print(f"📤 Inserting {len(padded_data)} rows to {G_TC_SHEET}!C4")
-    
-    sheets.spreadsheets().values().update(
-        spreadsheetId=sheet_id,
-        range=f'{G_TC_SHEET}!C4',
-        valueInputOption='RAW',
-        body={'values': padded_data}
-    ).execute()
+    return sync_block(sheets, sheet_id, G_TC_SHEET, 'C', 'N', 4, padded_data)
 
 def update_timestamp(sheets, sheet_id):
     """Update timestamp in Dashboard sheet"""
@@ -149,165 +88,143 @@ def update_timestamp(sheets, sheet_id):
         body={'values': [[timestamp]]}
     ).execute()
 
-def debug_qa_team_filtering(test_cases_data, team_members):
+def write_g_tc(sheets, sheet_id, rows):
+    """Sync G-TC, moving the Dashboard timestamp only if something changed"""
+    if insert_data_to_g_tc(sheets, sheet_id, rows):
+        update_timestamp(sheets, sheet_id)
+    else:
+        print("⏸️ Output unchanged, Dashboard timestamp left as is")
+
+def qa_team_spec(team_members):
+    """'QA TEAM' milestone (column I, index 6) AND a team member as author (column F, index 3)"""
+    return FilterSpec(
+        ValueIn(6, ["QA TEAM"], name='milestone'),
+        ValueIn(3, team_members, name='author'),
+    )
+
+def debug_qa_team_filtering(test_cases_snapshot, spec):
     """Debug function to show QA TEAM filtering details"""
     print("🔍 DEBUG: Analyzing filtering criteria...")
     print(f"🔍 Column F (index 3): Issue Author")
     print(f"🔍 Column I (index 6): Milestone")
     
-    if not test_cases_data:
+    if not test_cases_snapshot:
         print("🔍 No source data found!")
         return
     
-    # Get unique milestones and authors
-    source_milestones = set()
-    source_authors = set()
-    qa_team_count = 0
-    team_member_count = 0
-    both_conditions_count = 0
-    
-    for row in test_cases_data:
-        milestone = str(row[6]).strip() if len(row) > 6 and row[6] else ""
-        author = str(row[3]).strip() if len(row) > 3 and row[3] else ""
-        
-        if milestone:
-            source_milestones.add(milestone)
-            if milestone == "QA TEAM":
-                qa_team_count += 1
-        
-        if author:
-            source_authors.add(author)
-            if author in team_members:
-                team_member_count += 1
-        
-        if milestone == "QA TEAM" and author in team_members:
-            both_conditions_count += 1
+    # Unique milestones and authors come from the shared partitions
+    milestone_filter, author_filter = spec.predicates
+    source_milestones = test_cases_snapshot.partition(6).keys()
+    source_authors = test_cases_snapshot.partition(3).keys()
     
     print(f"🔍 Found {len(source_milestones)} unique milestones in column I")
     print(f"🔍 Found {len(source_authors)} unique authors in column F")
-    print(f"🔍 Rows with 'QA TEAM' milestone: {qa_team_count}")
-    print(f"🔍 Rows with team member authors: {team_member_count}")
-    print(f"🔍 Rows matching BOTH conditions: {both_conditions_count}")
+    print(f"🔍 Rows with 'QA TEAM' milestone: {len(milestone_filter.row_ids(test_cases_snapshot))}")
+    print(f"🔍 Rows with team member authors: {len(author_filter.row_ids(test_cases_snapshot))}")
     print(f"🔍 First 10 source milestones: {list(source_milestones)[:10]}")
     print(f"🔍 First 10 source authors: {list(source_authors)[:10]}")
 
-def filter_test_cases_by_qa_team_and_author(test_cases_data, team_members):
-    """Filter test cases by 'QA TEAM' milestone (column I) AND team member author (column F)"""
-    if not test_cases_data:
+def filter_test_cases_by_qa_team_and_author(test_cases_snapshot, team_members):
+    """Filter test cases by 'QA TEAM' milestone (column I) AND team member author (column F), newest first"""
+    if not test_cases_snapshot:
         return []
     
     if not team_members:
         print("⚠️ No team members found, cannot filter by author")
         return []
     
-    # Debug filtering
-    debug_qa_team_filtering(test_cases_data, team_members)
-    
-    filtered = []
-    milestone_col_idx = 6  # Column I is index 6 (C=0, D=1, E=2, F=3, G=4, H=5, I=6)
-    author_col_idx = 3     # Column F is index 3 (C=0, D=1, E=2, F=3)
+    spec = qa_team_spec(team_members)
     
-    team_members_set = set(team_members)
+    # Debug filtering
+    debug_qa_team_filtering(test_cases_snapshot, spec)
     
     print(f"\n📋 Filtering with criteria:")
     print(f"   - Milestone (Column I) = 'QA TEAM'")
     print(f"   - Author (Column F) in team members list\n")
     
-    # Process data rows (no header in C4:N range)
-    for i, row in enumerate(test_cases_data, 1):
-        if len(row) <= milestone_col_idx or len(row) <= author_col_idx:
-            continue
-        
-        milestone = str(row[milestone_col_idx]).strip() if row[milestone_col_idx] else ""
-        author = str(row[author_col_idx]).strip() if row[author_col_idx] else ""
-        
-        milestone_match = milestone == "QA TEAM"
-        author_match = author in team_members_set
-        
-        if milestone_match and author_match:
-            filtered.append(row)
-            if len(filtered) <= 5:  # Show first 5 matches for debugging
-                print(f"✅ Match found at row {i}: milestone='{milestone}', author='{author}'")
-        elif i <= 10:  # Show first 10 non-matches for debugging
-            reasons = []
-            if not milestone_match:
-                reasons.append(f"milestone '{milestone}' != 'QA TEAM'")
-            if not author_match:
-                reasons.append(f"author '{author}' not in team")
-            print(f"❌ Row {i} skipped — {', '.join(reasons)}")
+    # Merge of the team members' pre-sorted buckets of the shared author index (no header in C4:T range)
+    filtered, matched_ids = QA_TEAM_BY_AUTHOR.select(test_cases_snapshot, team_members)
     
-    print(f"\n📊 Filtered {len(filtered)} test cases from {len(test_cases_data)} total rows")
+    for row_id in matched_ids[:5]:  # Show first 5 matches for debugging
+        milestone = str(test_cases_snapshot.table.value(row_id, 6)).strip()
+        author = str(test_cases_snapshot.table.value(row_id, 3)).strip()
+        print(f"✅ Match found at row {row_id + 1}: milestone='{milestone}', author='{author}'")
+    
+    for row_id in range(min(10, len(test_cases_snapshot))):  # Show first 10 non-matches for debugging
+        reasons = spec.explain(test_cases_snapshot, row_id)
+        if reasons:
+            print(f"❌ Row {row_id + 1} skipped — {', '.join(reasons)}")
+    
+    print(f"\n📊 Filtered {len(filtered)} test cases from {len(test_cases_snapshot)} total rows, sorted by date")
     print(f"   ✅ Milestone = 'QA TEAM' AND Author in team members")
     return filtered
 
+def load_rosters(sheets, sheet_ids):
+    """Every tenant's Dashboard Q34:Q49 roster, read in one pass before any filtering"""
+    print(f"📋 Loading team members of {len(sheet_ids)} sheets from {DASHBOARD_SHEET}!Q34:Q49")
+    return run_for_tenants(sheet_ids, lambda sheet_id: get_team_members(sheets, sheet_id))
+
+def process_sheet(sheets, sheet_id, team_members):
+    """Sync G-TC for one Team CDS sheet, given its team members from load_rosters"""
+    try:
+        print(f"🔄 Processing: {sheet_id}")
+
+        if not team_members:
+            print(f"⚠️ No team members found for {sheet_id}, skipping...")
+            return
+
+        # Get all test cases from SHEET_SYNC_SID - ALL ISSUES sheet
+        print(f"📋 Getting test cases from {SHEET_SYNC_SID} - ALL ISSUES!C4:N")
+        test_cases_data = get_all_test_cases(sheets)
+        print(f"📋 Found {len(test_cases_data)} total rows")
+
+        # Same selection, same source and same script as the last sync: nothing to do
+        inputs = digest(SCRIPT_DIGEST, team_members, test_cases_data.fingerprint())
+        if journal.inputs_unchanged(sheet_id, G_TC_SHEET, inputs):
+            print(f"⏭️ Inputs unchanged since the last sync, skipping {sheet_id}")
+            return
+
+        # Filter by 'QA TEAM' milestone AND team member author
+        filtered = filter_test_cases_by_qa_team_and_author(test_cases_data, team_members)
+
+        if not filtered:
+            print(f"⚠️ No test cases matching criteria found for {sheet_id}")
+            # Still empty the sheet; the timestamp only moves if rows were removed
+            sync_tab(sheet_id, G_TC_SHEET, inputs, [], lambda rows: write_g_tc(sheets, sheet_id, rows))
+            return
+
+        print(f"📊 Processing {len(filtered)} filtered and sorted test cases")
+
+        # Write only the rows that differ from what the sheet already holds
+        sync_tab(sheet_id, G_TC_SHEET, inputs, filtered, lambda rows: write_g_tc(sheets, sheet_id, rows))
+
+        print(f"✅ Finished: {sheet_id}")
+
+    except Exception as e:
+        print(f"❌ Error processing {sheet_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def run(sheets):
+    """Sync G-TC for every Team CDS sheet using an already-built Sheets client"""
+    sheet_ids = registry.tenants_with(sheets, G_TC_SHEET, DASHBOARD_SHEET)
+    
+    if not sheet_ids:
+        print("❌ No Team CDS sheets with the required tabs found")
+        return
+    
+    # Rosters are small reads; doing them all first leaves the per-tenant pass
+    # with nothing but index lookups and the G-TC write
+    rosters = load_rosters(sheets, sheet_ids)
+    run_for_tenants(sheet_ids, lambda sheet_id: process_sheet(sheets, sheet_id, rosters[sheet_id]))
+
+
 def main():
     try:
         credentials = authenticate()
-        sheets = build('sheets', 'v4', credentials=credentials)
-        
-        # Get sheet titles for validation
-        get_sheet_titles(sheets, UTILS_SHEET_ID)
-        sheet_ids = get_all_team_cds_sheet_ids(sheets, UTILS_SHEET_ID)
-        
-        if not sheet_ids:
-            print("❌ No Team CDS sheet IDs found in UTILS!B2:B")
-            return
+        sheets = build_sheets_service(credentials)
+        run(sheets)
         
-        for sheet_id in sheet_ids:
-            try:
-                print(f"🔄 Processing: {sheet_id}")
-                
-                # Check if required sheets exist
-                titles = get_sheet_titles(sheets, sheet_id)
-                
-                if G_TC_SHEET not in titles:
-                    print(f"⚠️ Skipping {sheet_id} — missing '{G_TC_SHEET}' sheet")
-                    continue
-                
-                if DASHBOARD_SHEET not in titles:
-                    print(f"⚠️ Skipping {sheet_id} — missing '{DASHBOARD_SHEET}' sheet")
-                    continue
-                
-                # Get team members from Dashboard Q34:Q49
-                print(f"📋 Getting team members from {sheet_id} - {DASHBOARD_SHEET}!Q34:Q49")
-                team_members = get_team_members(sheets, sheet_id)
-                
-                if not team_members:
-                    print(f"⚠️ No team members found for {sheet_id}, skipping...")
-                    continue
-                
-                # Get all test cases from SHEET_SYNC_SID - ALL ISSUES sheet
-                print(f"📋 Getting test cases from {SHEET_SYNC_SID} - ALL ISSUES!C4:N")
-                test_cases_data = get_all_test_cases(sheets)
-                print(f"📋 Found {len(test_cases_data)} total rows")
-                
-                # Filter by 'QA TEAM' milestone AND team member author
-                filtered = filter_test_cases_by_qa_team_and_author(test_cases_data, team_members)
-                
-                if not filtered:
-                    print(f"⚠️ No test cases matching criteria found for {sheet_id}")
-                    # Still clear the sheet and update timestamp
-                    clear_g_tc(sheets, sheet_id)
-                    update_timestamp(sheets, sheet_id)
-                    continue
-                
-                # Sort by creation date (most recent first)
-                sorted_filtered = sort_test_cases_by_date(filtered)
-                
-                print(f"📊 Processing {len(sorted_filtered)} filtered and sorted test cases")
-                
-                # Clear existing data and insert new data
-                clear_g_tc(sheets, sheet_id)
-                insert_data_to_g_tc(sheets, sheet_id, sorted_filtered)
-                update_timestamp(sheets, sheet_id)
-                
-                print(f"✅ Finished: {sheet_id}")
-                
-            except Exception as e:
-                print(f"❌ Error processing {sheet_id}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                
     except Exception as e:
         print(f"❌ Main failure: {str(e)}")
         import traceback
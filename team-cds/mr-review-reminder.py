@@ -6,6 +6,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from googleapiclient.discovery import build
 from common import authenticate, get_sheet_ids, get_assignee_email_map, days_since
 from constants import UTILS_SHEET_ID, CDS_MASTER_ROSTER
+from sheets_plan import PLAN_MODE, plan_service
+from sheets_metrics import authorized_http
 
 # Validate env vars
 missing_vars = {"UTILS_SHEET_ID": UTILS_SHEET_ID, "CDS_MASTER_ROSTER": CDS_MASTER_ROSTER}
@@ -129,6 +131,10 @@ def send_mr_email(assignee, tasks, recipient):
     msg["Subject"] = f"🔔 MR Review Reminder: {len(tasks)} Task(s) for {assignee}"
     msg.attach(MIMEText(generate_mr_email_html(assignee, tasks), "html"))
 
+    if PLAN_MODE:
+        print(f"📝 Plan mode: would send a reminder to {recipient}")
+        return
+
     try:
         with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
             server.login(sender, app_password)
@@ -157,7 +163,7 @@ def process_mr_sheet(sheet_service, sheet_id, assignee_email_map):
 
 def main():
     credentials = authenticate()
-    sheets = build("sheets", "v4", credentials=credentials)
+    sheets = plan_service(build("sheets", "v4", http=authorized_http(credentials)))
 
     assignee_email_map = get_assignee_email_map(sheets)
     sheet_ids = get_sheet_ids(sheets)
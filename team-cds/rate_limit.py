@@ -0,0 +1,235 @@
+import os
+import time
+import threading
+from sheets_plan import PLAN_MODE
+
+# Sheets allows 60 read and 60 write requests per minute per user. Each kind
+# gets its own bucket, refilled a little under the quota so a full burst on
+# top of the steady rate still fits in any 60-second window.
+READ_REQUESTS_PER_MINUTE = float(os.getenv('TEAM_CDS_READS_PER_MINUTE', 55))
+WRITE_REQUESTS_PER_MINUTE = float(os.getenv('TEAM_CDS_WRITES_PER_MINUTE', 55))
+RATE_LIMIT_BURST = int(os.getenv('TEAM_CDS_RATE_BURST', 5))
+
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker in the process"""
+
+    def __init__(self, per_minute, burst=RATE_LIMIT_BURST):
+        self.rate = per_minute / 60.0
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait_time = (1 - self.tokens) / self.rate
+            # Sleep outside the lock so other threads can refill/check meanwhile
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def available(self):
+        """Tokens available right now (may be fractional); nothing is taken"""
+        with self.lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+
+read_bucket = TokenBucket(READ_REQUESTS_PER_MINUTE)
+write_bucket = TokenBucket(WRITE_REQUESTS_PER_MINUTE)
+
+
+def acquire_for(method):
+    """Take a token from the read bucket for GET requests, the write bucket otherwise"""
+    bucket = read_bucket if method == 'GET' else write_bucket
+    return bucket.acquire()
+
+
+class QuotaPool:
+    """
+    Per-minute quota of several service accounts, each with its own read and
+    write buckets (account 0 uses the shared buckets above).
+
+    checkout(method) sends a request through the least-loaded account: the
+    one whose queue (requests checked out but not released, minus tokens in
+    hand) drains soonest at its bucket's rate. With one account this is
+    exactly acquire_for().
+    """
+
+    def __init__(self):
+        self.buckets = [(read_bucket, write_bucket)]
+        self.pending = [0]
+        self.sent = [0]
+        self.lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.buckets)
+
+    def resize(self, accounts):
+        """Make room for `accounts` accounts (never shrinks)"""
+        with self.lock:
+            while len(self.buckets) < accounts:
+                self.buckets.append((TokenBucket(READ_REQUESTS_PER_MINUTE), TokenBucket(WRITE_REQUESTS_PER_MINUTE)))
+                self.pending.append(0)
+                self.sent.append(0)
+
+    def checkout(self, method):
+        """Pick an account for a request and wait for its token; returns the account index"""
+        kind = 0 if method == 'GET' else 1
+        with self.lock:
+            if len(self.buckets) == 1:
+                account = 0
+            else:
+                account = min(
+                    range(len(self.buckets)),
+                    key=lambda index: (self.pending[index] - self.buckets[index][kind].available())
+                                      / self.buckets[index][kind].rate
+                )
+            self.pending[account] += 1
+            self.sent[account] += 1
+        try:
+            self.buckets[account][kind].acquire()
+        except BaseException:
+            self.release(account)
+            raise
+        return account
+
+    def release(self, account):
+        with self.lock:
+            self.pending[account] -= 1
+
+    def report(self):
+        if self.size > 1:
+            print(f"🔑 Requests per account: {', '.join(str(count) for count in self.sent)}")
+
+
+# Shared by every service built in this process; grown by the credential pool
+quota_pool = QuotaPool()
+
+
+# Adaptive (AIMD) pacing for crawls like update_tc_counts: start at a modest
+# rate, add a little after every unthrottled work item, and halve on a 429/503.
+ADAPTIVE_START_PER_MINUTE = float(os.getenv('TEAM_CDS_ADAPTIVE_START_PER_MINUTE', 30))
+ADAPTIVE_MIN_PER_MINUTE = float(os.getenv('TEAM_CDS_ADAPTIVE_MIN_PER_MINUTE', 6))
+ADAPTIVE_MAX_PER_MINUTE = float(os.getenv('TEAM_CDS_ADAPTIVE_MAX_PER_MINUTE', 120))
+ADAPTIVE_INCREASE = float(os.getenv('TEAM_CDS_ADAPTIVE_INCREASE', 2))
+ADAPTIVE_DECREASE = float(os.getenv('TEAM_CDS_ADAPTIVE_DECREASE', 0.5))
+ADAPTIVE_MAX_CONCURRENCY = int(os.getenv('TEAM_CDS_ADAPTIVE_MAX_CONCURRENCY', 6))
+# Pause after a throttle that came without a Retry-After header
+ADAPTIVE_BACKOFF_SECONDS = float(os.getenv('TEAM_CDS_ADAPTIVE_BACKOFF_SECONDS', 10))
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase / multiplicative-decrease pacing of work items.
+
+    acquire(cost) blocks until the item may start: sends are spaced so that
+    `rate` requests per minute go out, and at most `concurrency` items run
+    at once, where concurrency follows rate x observed latency. release()
+    reports how the item went: a clean item raises the rate by `increase`,
+    a throttled one cuts it by `decrease` (once per throttle episode) and
+    pauses everyone for Retry-After, or `backoff` seconds without one.
+    The shared token buckets above still apply to every request.
+    """
+
+    def __init__(self, start_per_minute=ADAPTIVE_START_PER_MINUTE, min_per_minute=ADAPTIVE_MIN_PER_MINUTE,
+                 max_per_minute=ADAPTIVE_MAX_PER_MINUTE, increase=ADAPTIVE_INCREASE, decrease=ADAPTIVE_DECREASE,
+                 max_concurrency=ADAPTIVE_MAX_CONCURRENCY, backoff=ADAPTIVE_BACKOFF_SECONDS):
+        self.rate = start_per_minute
+        self.min_rate = min_per_minute
+        self.max_rate = max_per_minute
+        self.increase = increase
+        self.decrease = decrease
+        self.max_concurrency = max(1, max_concurrency)
+        self.backoff = backoff
+        self.in_flight = 0
+        self.latency = None  # seconds per item, smoothed
+        self.next_send = time.monotonic()
+        self.paused_until = 0.0
+        self.started = None
+        self.items = 0
+        self.requests = 0
+        self.throttled = 0
+        self.peak_rate = start_per_minute
+        self.base_max_rate = max_per_minute
+        self.base_max_concurrency = self.max_concurrency
+        self.lock = threading.Lock()
+
+    def scale(self, accounts):
+        """Allow `accounts` times the maximum rate and concurrency (one quota per service account)"""
+        with self.lock:
+            accounts = max(1, accounts)
+            self.max_rate = self.base_max_rate * accounts
+            self.max_concurrency = self.base_max_concurrency * accounts
+
+    @property
+    def concurrency(self):
+        """Items allowed in flight: enough to keep `rate` going at the observed latency"""
+        if self.latency is None:
+            return 1
+        needed = int(self.rate / 60.0 * self.latency) + 1
+        return max(1, min(self.max_concurrency, needed))
+
+    def acquire(self, cost=1):
+        """Block until an item costing `cost` requests may start; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.started is None:
+                    self.started = now
+                wait_time = max(self.paused_until - now, self.next_send - now)
+                # Plan mode only counts the items' requests, so nothing needs pacing
+                if PLAN_MODE or (wait_time <= 0 and self.in_flight < self.concurrency):
+                    self.in_flight += 1
+                    self.next_send = max(now, self.next_send) + 60.0 * cost / self.rate
+                    return waited
+                if wait_time <= 0:
+                    # Waiting for a slot; in-flight items finish within about one latency
+                    wait_time = min(0.25, self.latency or 0.25)
+            # Sleep outside the lock so finishing items can release meanwhile
+            time.sleep(wait_time)
+            waited += wait_time
+
+    def release(self, seconds, requests=1, throttled=0, retry_after=None):
+        """Report a finished item: its duration, requests made and 429/503 answers seen"""
+        with self.lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            self.items += 1
+            self.requests += requests
+            self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+            if throttled:
+                self.throttled += throttled
+                # Items already in flight report the same episode; only cut once per pause
+                if now >= self.paused_until:
+                    self.rate = max(self.min_rate, self.rate * self.decrease)
+                    pause = retry_after if retry_after is not None else self.backoff
+                    self.paused_until = now + pause
+                    self.next_send = max(self.next_send, self.paused_until)
+                    print(f"🐢 Throttled: pausing {pause:.0f}s, rate now {self.rate:.0f} req/min")
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                self.peak_rate = max(self.peak_rate, self.rate)
+
+    def achieved_per_minute(self):
+        with self.lock:
+            if self.started is None:
+                return 0.0
+            minutes = max(time.monotonic() - self.started, 1e-6) / 60.0
+            return self.requests / minutes
+
+    def report(self, label='Adaptive pacing'):
+        print(f"📈 {label}: {self.requests} requests for {self.items} items at "
+              f"{self.achieved_per_minute():.1f} req/min achieved "
+              f"(rate now {self.rate:.0f}, peak {self.peak_rate:.0f}, {self.throttled} throttled)")
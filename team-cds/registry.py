@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+from constants import UTILS_SHEET_ID
+
+# UTILS!B is read in pages of this many rows until an empty page comes back,
+# so the number of team sheets is no longer capped by a fixed end row.
+UTILS_PAGE_SIZE = 200
+UTILS_COLUMN = 'B'
+UTILS_FIRST_ROW = 2
+
+# Only tab titles and gids are needed to route tenants, so spreadsheets.get
+# is field-masked instead of returning the full spreadsheet metadata.
+TAB_FIELDS = 'sheets.properties(title,sheetId)'
+
+# Tab metadata is reused by every stage of a run until it is this old
+METADATA_TTL_SECONDS = int(os.getenv('TEAM_CDS_METADATA_TTL', 900))
+
+
+class TeamSheetRegistry:
+    """Team CDS sheet IDs from UTILS plus a TTL cache of each sheet's tabs"""
+
+    def __init__(self, utils_sheet_id=UTILS_SHEET_ID, ttl=METADATA_TTL_SECONDS):
+        self.utils_sheet_id = utils_sheet_id
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self._sheet_ids = None
+        self._tabs = {}  # spreadsheet ID -> (fetched_at, {title: sheetId})
+
+    def _fetch_lock(self, key):
+        # Concurrent stages asking for the same entry wait for one fetch
+        with self._lock:
+            return self._fetch_locks.setdefault(key, threading.Lock())
+
+    def sheet_ids(self, sheets):
+        """All Team CDS sheet IDs listed in UTILS!B2:B, read page by page"""
+        with self._fetch_lock(self.utils_sheet_id):
+            if self._sheet_ids is None:
+                self._sheet_ids = self._read_sheet_ids(sheets)
+        return list(self._sheet_ids)
+
+    def _read_sheet_ids(self, sheets):
+        sheet_ids = []
+        start_row = UTILS_FIRST_ROW
+        while True:
+            end_row = start_row + UTILS_PAGE_SIZE - 1
+            result = sheets.spreadsheets().values().get(
+                spreadsheetId=self.utils_sheet_id,
+                range=f'UTILS!{UTILS_COLUMN}{start_row}:{UTILS_COLUMN}{end_row}'
+            ).execute()
+            values = result.get('values', [])
+            if not values:
+                break
+            sheet_ids.extend(row[0].strip() for row in values if row and row[0].strip())
+            start_row = end_row + 1
+
+        print(f"🔗 Found {len(sheet_ids)} Team CDS sheet IDs in UTILS!{UTILS_COLUMN}{UTILS_FIRST_ROW}:{UTILS_COLUMN}")
+        return sheet_ids
+
+    def tabs(self, sheets, spreadsheet_id, refresh=False):
+        """{tab title: sheetId} for a spreadsheet, cached for `ttl` seconds"""
+        with self._fetch_lock(spreadsheet_id):
+            cached = self._tabs.get(spreadsheet_id)
+            if cached and not refresh and time.time() - cached[0] < self.ttl:
+                return cached[1]
+
+            res = sheets.spreadsheets().get(
+                spreadsheetId=spreadsheet_id,
+                fields=TAB_FIELDS
+            ).execute()
+            tabs = {
+                sheet['properties']['title']: sheet['properties']['sheetId']
+                for sheet in res.get('sheets', [])
+            }
+            self._tabs[spreadsheet_id] = (time.time(), tabs)
+            return tabs
+
+    def sheet_gid(self, sheets, spreadsheet_id, title):
+        """The numeric sheetId of a tab, or None when the tab does not exist"""
+        return self.tabs(sheets, spreadsheet_id).get(title)
+
+    def tenants_with(self, sheets, *titles):
+        """
+        Team CDS sheet IDs that have every one of the given tabs.
+
+        Scripts take their tenant list from here, so tenants missing a tab
+        the script needs are skipped up front instead of failing mid-run.
+        """
+        matching = []
+        for sheet_id in self.sheet_ids(sheets):
+            try:
+                tabs = self.tabs(sheets, sheet_id)
+            except Exception as e:
+                print(f"⚠️ Skipping {sheet_id} — could not read tab metadata: {str(e)}")
+                continue
+
+            missing = [title for title in titles if title not in tabs]
+            if missing:
+                print(f"⚠️ Skipping {sheet_id} — missing '{missing[0]}' sheet")
+                continue
+            matching.append(sheet_id)
+
+        print(f"📋 {len(matching)} Team CDS sheets have {', '.join(titles)}")
+        return matching
+
+
+# Shared by every stage running in this process
+registry = TeamSheetRegistry()
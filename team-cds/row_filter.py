@@ -0,0 +1,161 @@
+import heapq
+from snapshot import normalize_exact, split_labels
+
+
+class ValueIn:
+    """Rows whose `column`, normalized, is one of the already-normalized `keys`"""
+
+    def __init__(self, column, keys, normalize=normalize_exact, name=None):
+        self.column = column
+        self.keys = set(keys)
+        self.normalize = normalize
+        self.name = name or f"column {column}"
+
+    def row_ids(self, snapshot):
+        # Buckets of the snapshot's shared partition; normalize ran once per distinct value
+        return snapshot.select_ids(self.column, self.keys, self.normalize)
+
+    def matches(self, snapshot, row_id):
+        value = snapshot.table.value(row_id, self.column)
+        return bool(value) and self.normalize(value) in self.keys
+
+    def explain(self, snapshot, row_id):
+        value = snapshot.table.value(row_id, self.column)
+        return f"{self.name} '{str(value).strip()}' not in {sorted(self.keys)[:5]}"
+
+
+class TokensIntersect:
+    """Rows whose multi-valued `column` holds at least one of the already-normalized `tokens`"""
+
+    def __init__(self, column, tokens, tokenize=split_labels, name=None):
+        self.column = column
+        self.tokens = set(tokens)
+        self.tokenize = tokenize
+        self.name = name or f"column {column}"
+
+    def row_ids(self, snapshot):
+        return snapshot.select_token_ids(self.column, self.tokens, self.tokenize)
+
+    def matches(self, snapshot, row_id):
+        value = snapshot.table.value(row_id, self.column)
+        return bool(value) and not self.tokens.isdisjoint(self.tokenize(value))
+
+    def explain(self, snapshot, row_id):
+        value = snapshot.table.value(row_id, self.column)
+        return f"{self.name} '{value}' has none of {sorted(self.tokens)}"
+
+
+class FilterSpec:
+    """
+    A row filter: every predicate must match.
+
+    Predicates resolve against the snapshot's shared indexes (one lookup
+    per key or token), so selecting a tenant's rows is an intersection of
+    row ID buckets, smallest first, with no per-row work.
+    """
+
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def select_ids(self, snapshot):
+        """Matching row IDs in source order"""
+        buckets = sorted((predicate.row_ids(snapshot) for predicate in self.predicates), key=len)
+        if not buckets:
+            return list(range(len(snapshot)))
+        row_ids = set(buckets[0])
+        for bucket in buckets[1:]:
+            if not row_ids:
+                break
+            row_ids.intersection_update(bucket)
+        return sorted(row_ids)
+
+    def explain(self, snapshot, row_id):
+        """Why a row was left out (for debug output); empty if it matches"""
+        return [
+            predicate.explain(snapshot, row_id)
+            for predicate in self.predicates
+            if not predicate.matches(snapshot, row_id)
+        ]
+
+
+class Pipeline:
+    """
+    How one tenant tab is built from a source snapshot: filter spec, then
+    an optional sort, then the target tab's columns.
+
+    Sorting runs on the selected row IDs (sort key once per distinct value),
+    and the output table is materialized once, already in order.
+    """
+
+    def __init__(self, target_tab, width=None, sort_column=None, sort_key=None, reverse=False):
+        self.target_tab = target_tab
+        self.width = width
+        self.sort_column = sort_column
+        self.sort_key = sort_key
+        self.reverse = reverse
+
+    def build(self, snapshot, spec):
+        """(table of the tab's rows, their source row IDs in output order)"""
+        table = snapshot.table if self.width is None else snapshot.project(self.width)
+        row_ids = spec.select_ids(snapshot)
+        if self.sort_column is not None and row_ids:
+            row_ids = table.sort_ids(self.sort_column, self.sort_key, self.reverse, row_ids=row_ids)
+        return table.take(row_ids), row_ids
+
+
+class BucketIndex:
+    """
+    Rows matching a base spec, grouped by the value of one column, each group
+    already in `pipeline` order.
+
+    The index is built in one pass per snapshot and shared by every tenant;
+    a tenant's rows are then its keys' buckets merged, not a scan or a sort.
+    The merge gives the same order as filtering and then sorting would.
+    """
+
+    def __init__(self, base_spec, column, pipeline, normalize=normalize_exact):
+        self.base_spec = base_spec
+        self.column = column
+        self.pipeline = pipeline
+        self.normalize = normalize
+
+    def _build(self, snapshot):
+        table = snapshot.table
+        column = table.column(self.column)
+        keys = column.decode(lambda value: self.normalize(value) if value else '')
+        buckets = {}
+        for row_id in self.base_spec.select_ids(snapshot):
+            key = keys[column.codes[row_id]]
+            if key:
+                buckets.setdefault(key, []).append(row_id)
+
+        pipeline = self.pipeline
+        if pipeline.sort_column is None:
+            return buckets, None
+        for key, row_ids in buckets.items():
+            buckets[key] = table.sort_ids(pipeline.sort_column, pipeline.sort_key, pipeline.reverse, row_ids=row_ids)
+        sort_column = table.column(pipeline.sort_column)
+        return buckets, (sort_column.decode(pipeline.sort_key), sort_column.codes)
+
+    def buckets(self, snapshot):
+        """{normalized key: row IDs in pipeline order}"""
+        return snapshot.derived(self, self._build)[0]
+
+    def select(self, snapshot, keys):
+        """(table of the rows for `keys` in pipeline order, their source row IDs)"""
+        buckets, sort_keys = snapshot.derived(self, self._build)
+        selected = [buckets[key] for key in set(keys) if key in buckets]
+
+        if sort_keys is None:
+            row_ids = sorted(row_id for bucket in selected for row_id in bucket)
+        else:
+            values, codes = sort_keys
+            # Ties keep source order, exactly like the stable sort of the pipeline
+            if self.pipeline.reverse:
+                merged = heapq.merge(*selected, key=lambda row_id: (values[codes[row_id]], -row_id), reverse=True)
+            else:
+                merged = heapq.merge(*selected, key=lambda row_id: (values[codes[row_id]], row_id))
+            row_ids = list(merged)
+
+        table = snapshot.table if self.pipeline.width is None else snapshot.project(self.pipeline.width)
+        return table.take(row_ids), row_ids
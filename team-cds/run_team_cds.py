@@ -0,0 +1,134 @@
+import sys
+import os
+import time
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common import authenticate_pool, build_sheets_service
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Stage name -> (script in team-cds/, stages that must finish first).
+# The fetch stages write separate tabs (G-Issues, G-MR, NTC, G-TC) and only
+# share read-only inputs, so they run alongside each other. update_tc_counts
+# writes the same TC Review rows as update_tc_review, so it waits for it.
+STAGES = {
+    'update_tc_review': ('update_tc_review.py', []),
+    'fetch-issues': ('fetch-issues.py', []),
+    'fetch-mr': ('fetch-mr.py', []),
+    'fetch-ntc': ('fetch-ntc.py', []),
+    'fetch-tcs': ('fetch-tcs.py', []),
+    'update_tc_counts': ('update_tc_counts.py', ['update_tc_review']),
+}
+
+MAX_PARALLEL_STAGES = int(os.getenv('TEAM_CDS_PARALLEL_STAGES', len(STAGES)))
+
+
+def load_stage(script):
+    """Import a team-cds script by file name (several contain hyphens)"""
+    module_name = os.path.splitext(script)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPT_DIR, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_stage(name, sheets):
+    script, _ = STAGES[name]
+    print(f"\n▶️ Stage '{name}' started ({script})")
+    started = time.time()
+    load_stage(script).run(sheets)
+    duration = time.time() - started
+    print(f"\n⏹️ Stage '{name}' finished in {duration:.1f}s")
+    return duration
+
+
+def run_stages(sheets, stage_names):
+    """
+    Run the selected stages as a dependency graph in this process.
+
+    A stage starts as soon as every selected dependency has succeeded; a stage
+    whose dependency failed is skipped. Returns {stage: (status, seconds)}.
+    """
+    selected = set(stage_names)
+    pending = [name for name in STAGES if name in selected]
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_STAGES) as executor:
+        while pending or running:
+            for name in list(pending):
+                deps = [dep for dep in STAGES[name][1] if dep in selected]
+
+                if any(results.get(dep, ('',))[0] in ('failed', 'skipped') for dep in deps):
+                    print(f"⏭️ Skipping stage '{name}' — a dependency did not succeed")
+                    results[name] = ('skipped', 0.0)
+                    pending.remove(name)
+                elif all(results.get(dep, ('',))[0] == 'ok' for dep in deps):
+                    running[executor.submit(run_stage, name, sheets)] = name
+                    pending.remove(name)
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = ('ok', future.result())
+                except Exception as e:
+                    print(f"❌ Stage '{name}' failed: {str(e)}")
+                    import traceback
+                    traceback.print_exception(type(e), e, e.__traceback__)
+                    results[name] = ('failed', 0.0)
+
+    return results
+
+
+def main():
+    # Flags such as --plan are read by the modules that use them
+    stage_names = [arg for arg in sys.argv[1:] if not arg.startswith('--')] or list(STAGES)
+    unknown = [name for name in stage_names if name not in STAGES]
+    if unknown:
+        print(f"❌ Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(STAGES)}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("🚀 Team CDS Runner")
+    print(f"⏰ Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"📋 Stages: {', '.join(stage_names)}")
+    print("=" * 60)
+
+    try:
+        # Every configured service account; requests go to the least-loaded one
+        credentials = authenticate_pool()
+        sheets = build_sheets_service(credentials)
+    except Exception as e:
+        print(f"❌ Fatal error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+    started = time.time()
+    results = run_stages(sheets, stage_names)
+
+    print("\n" + "=" * 60)
+    print("📊 STAGE SUMMARY")
+    print("=" * 60)
+    for name in STAGES:
+        if name in results:
+            status, duration = results[name]
+            icon = {'ok': '✅', 'failed': '❌', 'skipped': '⏭️'}[status]
+            print(f"{icon} {name}: {status} ({duration:.1f}s)")
+    print(f"⏱️ Total wall time: {time.time() - started:.1f}s")
+    print(f"⏰ End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 60)
+
+    if any(status != 'ok' for status, _ in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+import json
+import hashlib
+import threading
+from constants import SHEET_SYNC_SID
+from columnar import ColumnarTable
+from snapshot_cache import load_values
+
+# Per-run cache of source tables, keyed by (spreadsheet ID, A1 range).
+# Every fetch script reads the same SHEET_SYNC_SID ranges for every team
+# sheet, so the first caller downloads the range and everyone else reuses it.
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+_range_locks = {}
+
+
+def normalize_exact(value):
+    """Milestone matching used by fetch-issues / fetch-mr (whitespace-trimmed, case-sensitive)"""
+    return str(value).strip()
+
+
+def normalize_casefold(value):
+    """Milestone matching used by fetch-ntc (whitespace-trimmed, lowercased)"""
+    return str(value).lower().strip()
+
+
+def split_labels(value):
+    """Labels of a comma-separated label cell, trimmed and lowercased (blanks dropped)"""
+    return [label for label in (part.strip().lower() for part in str(value).split(',')) if label]
+
+
+class SourceSnapshot:
+    """In-memory copy of one source range, shared by every tenant in a run"""
+
+    def __init__(self, spreadsheet_id, range_name, rows):
+        self.spreadsheet_id = spreadsheet_id
+        self.range_name = range_name
+        # Stored column by column; the ragged row lists are not kept
+        self.table = ColumnarTable.from_rows(rows)
+        self._partitions = {}
+        self._token_indexes = {}
+        self._partitions_lock = threading.Lock()
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.table)
+
+    def fingerprint(self):
+        """Hash of the range's contents, computed once per run (used by the sync journal)"""
+        with self._partitions_lock:
+            if self._fingerprint is None:
+                sha = hashlib.sha1(str(len(self.table)).encode('utf-8'))
+                for column in self.table.columns:
+                    sha.update(json.dumps(column.values, separators=(',', ':')).encode('utf-8'))
+                    sha.update(column.codes.tobytes())
+                self._fingerprint = sha.hexdigest()
+        return self._fingerprint
+
+    def project(self, width):
+        """Return the table cut down to the first `width` columns (e.g. C:N out of C:T)"""
+        return self.table.project(width)
+
+    def partition(self, column, normalize=normalize_exact):
+        """
+        Map each normalized value of `column` to the row IDs holding it.
+
+        Built the first time a (column, normalize) pair is asked for, then
+        reused by every tenant; normalize runs once per distinct value. Row
+        IDs in a bucket are ascending, i.e. in source-sheet order. Blank
+        cells are not indexed.
+        """
+        key = (column, normalize)
+
+        with self._partitions_lock:
+            index = self._partitions.get(key)
+            if index is None:
+                index = self.table.group_ids(column, normalize)
+                self._partitions[key] = index
+                print(f"🗂️ Indexed {self.range_name} column {column}: {len(index)} distinct values")
+
+        return index
+
+    def select_ids(self, column, keys, normalize=normalize_exact):
+        """Row IDs (source order) whose `column` is one of the already-normalized `keys`"""
+        index = self.partition(column, normalize)
+        row_ids = []
+        for key in set(keys):
+            row_ids.extend(index.get(key, ()))
+        row_ids.sort()
+        return row_ids
+
+    def token_index(self, column, tokenize=split_labels):
+        """
+        Inverted index of a multi-valued column: token -> ascending row IDs.
+
+        Like partition(), built once per (column, tokenize) pair and shared
+        by every tenant, so each distinct cell is tokenized once per run.
+        """
+        key = (column, tokenize)
+
+        with self._partitions_lock:
+            index = self._token_indexes.get(key)
+            if index is None:
+                index = self.table.token_ids(column, tokenize)
+                self._token_indexes[key] = index
+                print(f"🗂️ Indexed {self.range_name} column {column} tokens: {len(index)} distinct tokens")
+
+        return index
+
+    def select_token_ids(self, column, tokens, tokenize=split_labels):
+        """Row IDs (source order) whose `column` holds at least one of the already-normalized `tokens`"""
+        index = self.token_index(column, tokenize)
+        row_ids = set()
+        for token in set(tokens):
+            row_ids.update(index.get(token, ()))
+        return sorted(row_ids)
+
+    def derived(self, key, build):
+        """
+        build(self), computed once per snapshot and `key`, then shared by every
+        tenant (for indexes that combine several columns, e.g. fetch-tcs'
+        author buckets). build may use partition() and token_index().
+        """
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self)
+            return self._derived[key]
+
+    def select(self, column, keys, normalize=normalize_exact):
+        """Table of the rows (source order) whose `column` is one of the already-normalized `keys`"""
+        return self.table.take(self.select_ids(column, keys, normalize))
+
+
+def get_snapshot(sheets, range_name, spreadsheet_id=SHEET_SYNC_SID):
+    """Get a source range, downloading it only on the first call of the run"""
+    key = (spreadsheet_id, range_name)
+
+    with _snapshots_lock:
+        range_lock = _range_locks.setdefault(key, threading.Lock())
+
+    # Held across the download so concurrent stages wait for one fetch
+    # instead of each downloading the same range.
+    with range_lock:
+        snapshot = _snapshots.get(key)
+
+        if snapshot is None:
+            print(f"📥 Loading snapshot {spreadsheet_id} - {range_name}")
+            # Comes from the on-disk cache when the source is unchanged since the last run
+            values = load_values(sheets, spreadsheet_id, range_name)
+            snapshot = SourceSnapshot(spreadsheet_id, range_name, values)
+            with _snapshots_lock:
+                _snapshots[key] = snapshot
+            print(f"📥 Cached {len(snapshot)} rows from {range_name}")
+        else:
+            print(f"♻️ Reusing cached snapshot of {range_name} ({len(snapshot)} rows)")
+
+    return snapshot
+
+
+def clear_snapshots():
+    """Drop every cached source range (next access downloads again)"""
+    with _snapshots_lock:
+        _snapshots.clear()
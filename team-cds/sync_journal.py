@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from sheets_plan import PLAN_MODE
+
+# Where the journal lives between runs (CI keeps it with actions/cache)
+SYNC_JOURNAL_PATH = os.getenv(
+    'TEAM_CDS_SYNC_JOURNAL',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.cache', 'team-cds', 'sync-journal.json')
+)
+# Entries older than this are not trusted, so a tab edited by hand is
+# rewritten at least this often even when its inputs never change
+SYNC_JOURNAL_MAX_AGE_HOURS = float(os.getenv('TEAM_CDS_SYNC_JOURNAL_MAX_AGE_HOURS', 168))
+SYNC_JOURNAL_ENABLED = os.getenv('TEAM_CDS_SYNC_JOURNAL_ENABLED', 'true').lower() != 'false'
+
+
+def digest(*parts):
+    """Stable hash of JSON-serializable parts (lists, strings, numbers)"""
+    return hashlib.sha1(json.dumps(parts, separators=(',', ':'), default=str).encode('utf-8')).hexdigest()
+
+
+def rows_digest(rows):
+    """Hash of the rows a script is about to write"""
+    sha = hashlib.sha1()
+    for row in rows:
+        sha.update(json.dumps(list(row), separators=(',', ':')).encode('utf-8'))
+        sha.update(b'\n')
+    return sha.hexdigest()
+
+
+def script_digest(path):
+    """Hash of a script's source, so a changed filter invalidates its entries"""
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class SyncJournal:
+    """
+    Per tenant and output tab: a hash of what the output was computed from
+    and a hash of the rows last written.
+
+    A tenant whose inputs hash matches the journal needs no reads or writes
+    at all; one whose output hash matches needs no verification read of
+    the tab. Entries are only recorded after a successful sync.
+    """
+
+    def __init__(self, path=SYNC_JOURNAL_PATH, max_age_hours=SYNC_JOURNAL_MAX_AGE_HOURS,
+                 enabled=SYNC_JOURNAL_ENABLED):
+        self.path = path
+        self.max_age = max_age_hours * 3600
+        self.enabled = enabled
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _entry(self, sheet_id, tab):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._load().get(f"{sheet_id}|{tab}")
+        if entry and time.time() - entry.get('synced_at', 0) <= self.max_age:
+            return entry
+        return None
+
+    def inputs_unchanged(self, sheet_id, tab, inputs):
+        entry = self._entry(sheet_id, tab)
+        return entry is not None and entry.get('inputs') == inputs
+
+    def output_unchanged(self, sheet_id, tab, output):
+        entry = self._entry(sheet_id, tab)
+        return entry is not None and entry.get('output') == output
+
+    def record(self, sheet_id, tab, inputs, output, verified=True):
+        """Remember a sync; `verified` is False when the tab itself was not checked"""
+        # A plan run never writes, so there is nothing to remember
+        if not self.enabled or PLAN_MODE:
+            return
+        with self._lock:
+            key = f"{sheet_id}|{tab}"
+            previous = self._load().get(key) or {}
+            self._entries[key] = {
+                'inputs': inputs,
+                'output': output,
+                # Only a real sync extends how long the entry is trusted
+                'synced_at': time.time() if verified else previous.get('synced_at', 0),
+            }
+            try:
+                self._save()
+            except OSError as e:
+                print(f"⚠️ Could not save sync journal {self.path}: {str(e)}")
+
+
+journal = SyncJournal()
+
+
+def sync_tab(sheet_id, tab, inputs, rows, write):
+    """
+    Call write(rows) unless `rows` are exactly what the last sync wrote to
+    this tab, then record the sync. `write` does the sheet I/O (diff write,
+    Dashboard timestamp) and should raise on failure.
+    """
+    output = rows_digest(rows)
+    if journal.output_unchanged(sheet_id, tab, output):
+        print(f"⏭️ {tab} output identical to the last sync, no reads or writes needed")
+        journal.record(sheet_id, tab, inputs, output, verified=False)
+        return
+    write(rows)
+    journal.record(sheet_id, tab, inputs, output)
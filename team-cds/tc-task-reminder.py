@@ -6,6 +6,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from googleapiclient.discovery import build
 from common import authenticate, get_sheet_ids, get_assignee_email_map, days_since
 from constants import UTILS_SHEET_ID, CDS_MASTER_ROSTER
+from sheets_plan import PLAN_MODE, plan_service
+from sheets_metrics import authorized_http
 
 # Validate env vars
 missing_vars = {"UTILS_SHEET_ID": UTILS_SHEET_ID, "CDS_MASTER_ROSTER": CDS_MASTER_ROSTER}
@@ -96,6 +98,10 @@ def send_email_combined(assignee, tasks, recipient):
     msg["From"], msg["To"], msg["Subject"] = sender, recipient, f"📜 TC Task Reminder: {len(tasks)} Pending Task(s)"
     msg.attach(MIMEText(generate_email_html(assignee, tasks), "html"))
 
+    if PLAN_MODE:
+        print(f"📝 Plan mode: would email {recipient} for '{assignee}' with {len(tasks)} tasks")
+        return
+
     print(f"Sending email to {recipient} for '{assignee}' with {len(tasks)} tasks...")
     try:
         with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
@@ -125,7 +131,7 @@ def process_sheet(sheet_service, sheet_id, assignee_email_map):
 
 def main():
     credentials = authenticate()
-    sheets = build("sheets", "v4", credentials=credentials)
+    sheets = plan_service(build("sheets", "v4", http=authorized_http(credentials)))
 
     # Get assignee-to-email mapping once
     assignee_email_map = get_assignee_email_map(sheets)
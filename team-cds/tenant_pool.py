@@ -0,0 +1,44 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# How many Team CDS sheets a script works on at once. Requests are paced by
+# the shared token buckets in rate_limit, so more workers only help until
+# the quota is the bottleneck.
+TENANT_WORKERS = int(os.getenv('TEAM_CDS_TENANT_WORKERS', 4))
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def spreadsheet_lock(spreadsheet_id):
+    """Lock held while one script works on a spreadsheet, keeping its writes in order"""
+    with _locks_lock:
+        return _locks.setdefault(spreadsheet_id, threading.Lock())
+
+
+def _process_locked(process, sheet_id):
+    with spreadsheet_lock(sheet_id):
+        return process(sheet_id)
+
+
+def run_for_tenants(sheet_ids, process, workers=TENANT_WORKERS):
+    """
+    Call process(sheet_id) for every Team CDS sheet on a bounded thread pool.
+
+    Each call holds that spreadsheet's lock, so stages running side by side
+    never interleave their reads and writes on the same sheet, while
+    different sheets proceed in parallel. Returns {sheet_id: result}.
+    """
+    if not sheet_ids:
+        return {}
+
+    workers = max(1, min(workers, len(sheet_ids)))
+    print(f"🧵 Processing {len(sheet_ids)} sheets with {workers} workers")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            sheet_id: executor.submit(_process_locked, process, sheet_id)
+            for sheet_id in sheet_ids
+        }
+        return {sheet_id: future.result() for sheet_id, future in futures.items()}
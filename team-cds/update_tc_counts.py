@@ -2,14 +2,23 @@ import sys
 import os
 import re
 import time
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from googleapiclient.discovery import build
+from registry import registry
+from rate_limit import AdaptiveLimiter, quota_pool
+from sheets_metrics import calls_made, throttles_seen
+from tenant_pool import run_for_tenants
+from tab_census import tab_census, TAB_CENSUS_MODE
+from diff_writer import column_index
+from crawl_checkpoint import CrawlCheckpoint
+from crawl_priority import CrawlHistory
+from sync_journal import digest
 from common import (
-    authenticate,
-    get_sheet_titles,
-    get_all_team_cds_sheet_ids
+    authenticate_pool,
+    build_sheets_service
 )
 from constants import (
     UTILS_SHEET_ID,
@@ -25,10 +34,38 @@ TOTAL_CASES_COLUMN = 'K'  # Column K will contain the total test case count
 # Sheets to skip when counting test cases
 SHEETS_TO_SKIP = ["HELP", "ToC", "Issues", "Roster"]
 
-# Rate limiting - Stay well under 60 requests/minute
-BATCH_SIZE = 25  # Process 25 spreadsheets per batch
-REQUEST_DELAY = 1.2  # 1.2 seconds between requests
-BATCH_COOLDOWN = 65  # Wait 65 seconds between batches to reset quota
+# Counts and notes are written after every batch of this many spreadsheets
+BATCH_SIZE = 25
+# Each spreadsheet costs one census read in grid mode, a metadata read and a
+# C5 batchGet in values mode
+REQUESTS_PER_URL = 1 if TAB_CENSUS_MODE == 'grid' else 2
+
+# Paces the crawl for every tenant in the process: speeds up while the API
+# keeps answering, backs off on 429/503 (honouring Retry-After)
+limiter = AdaptiveLimiter()
+
+# Run-wide memo of crawled spreadsheets: spreadsheet ID -> (total sheets, counts).
+# The same test-case document is often linked from several TC Review rows and
+# several team sheets; the first row crawls it and every other row (any tenant)
+# reuses the result. A row that finds a crawl in flight waits for it.
+_counts = {}
+_counts_lock = threading.Lock()
+_count_locks = {}
+_memo_hits = 0
+_resumed_documents = 0
+
+# Finished tenants, written batches and document results, so a run that timed
+# out or crashed can be resumed by the next one (TEAM_CDS_RESUME=false starts over)
+checkpoint = CrawlCheckpoint('tc-counts')
+
+# Rows are crawled most-likely-changed first (see CrawlHistory.priority); with
+# a time budget, the rows left when it runs out wait for the next run
+history = CrawlHistory('tc-counts')
+CRAWL_BUDGET_MINUTES = float(os.getenv('TEAM_CDS_TC_COUNTS_BUDGET_MINUTES', 0))
+_deadline = None
+_deferred = 0
+# get_counts/count_url result for a row the time budget left for the next run
+DEFERRED = 'deferred'
 
 def is_valid_google_sheets_url(url):
     """Validate if the URL is a valid Google Sheets URL"""
@@ -86,56 +123,26 @@ def get_tc_review_urls(sheets, sheet_id):
 
 def count_test_cases_in_sheet_optimized(sheets, spreadsheet_id):
     """
-    OPTIMIZED: Count test cases with a single batch request
+    OPTIMIZED: Count test cases from a census of every tab's C5 (two calls, one in grid mode)
     Returns: (total_sheets_processed, test_case_counts_dict)
     """
-    try:
-        # Get spreadsheet metadata (1 API call)
-        spreadsheet = sheets.spreadsheets().get(
-            spreadsheetId=spreadsheet_id,
-            includeGridData=False
-        ).execute()
-        
-        all_sheets = spreadsheet.get('sheets', [])
-        
-        # Filter out sheets to skip
-        sheets_to_process = [
-            sheet_info for sheet_info in all_sheets
-            if sheet_info['properties']['title'] not in SHEETS_TO_SKIP
-        ]
-        
-        if not sheets_to_process:
-            return 0, {}
-        
-        total_sheets_processed = len(sheets_to_process)
-        
-        # Build batch ranges for all C5 cells
-        ranges = [f"'{sheet_info['properties']['title']}'!C5" for sheet_info in sheets_to_process]
-        
-        # Single batchGet request for all C5 values (1 API call)
-        result = sheets.spreadsheets().values().batchGet(
-            spreadsheetId=spreadsheet_id,
-            ranges=ranges,
-            valueRenderOption='UNFORMATTED_VALUE'
-        ).execute()
-        
-        value_ranges = result.get('valueRanges', [])
-        
-        # Count test case categories
-        test_case_counts = {}
-        
-        for value_range in value_ranges:
-            values = value_range.get('values', [])
-            c5_value = str(values[0][0]).strip() if values and values[0] and len(values[0]) > 0 and values[0][0] else ''
-            
-            if c5_value:
-                test_case_counts[c5_value] = test_case_counts.get(c5_value, 0) + 1
-        
-        return total_sheets_processed, test_case_counts
-        
-    except Exception as e:
-        print(f"❌ Error accessing spreadsheet {spreadsheet_id}: {e}")
+    census = tab_census(sheets, spreadsheet_id, ['C5'], skip=SHEETS_TO_SKIP)
+    
+    if not census:
         return 0, {}
+    
+    total_sheets_processed = len(census)
+    
+    # Count test case categories
+    test_case_counts = {}
+    
+    for _, (c5,) in census:
+        c5_value = str(c5).strip() if c5 else ''
+        
+        if c5_value:
+            test_case_counts[c5_value] = test_case_counts.get(c5_value, 0) + 1
+    
+    return total_sheets_processed, test_case_counts
 
 def create_note_text(test_case_counts):
     """Create note text based on test case counts"""
@@ -148,201 +155,219 @@ def create_note_text(test_case_counts):
     
     return '\n'.join(note_lines)
 
-def add_note_to_cell(sheets, sheet_id, cell_range, note_text):
-    """Add a note/comment to a specific cell using batchUpdate"""
-    try:
-        # Parse the cell range to get row and column indices
-        # Format: 'TC Review'!K2 -> sheet_name='TC Review', column='K', row=2
-        match = re.match(r"'([^']+)'!([A-Z]+)(\d+)", cell_range)
-        if not match:
-            print(f"⚠️ Could not parse cell range: {cell_range}")
-            return False
-        
-        sheet_name = match.group(1)
-        column_letter = match.group(2)
-        row_number = int(match.group(3))
-        
-        # Convert column letter to index (A=0, B=1, ... K=10)
-        column_index = sum((ord(c) - ord('A') + 1) * (26 ** i) for i, c in enumerate(reversed(column_letter))) - 1
-        row_index = row_number - 1  # 0-indexed
-        
-        # Get the sheet ID (gid) for the specific sheet
-        spreadsheet = sheets.spreadsheets().get(spreadsheetId=sheet_id).execute()
-        sheet_gid = None
-        for sheet in spreadsheet.get('sheets', []):
-            if sheet['properties']['title'] == sheet_name:
-                sheet_gid = sheet['properties']['sheetId']
-                break
-        
-        if sheet_gid is None:
-            print(f"⚠️ Could not find sheet: {sheet_name}")
-            return False
-        
-        # Create the request to update cell note
-        requests = [{
-            'updateCells': {
-                'range': {
-                    'sheetId': sheet_gid,
-                    'startRowIndex': row_index,
-                    'endRowIndex': row_index + 1,
-                    'startColumnIndex': column_index,
-                    'endColumnIndex': column_index + 1
-                },
-                'rows': [{
-                    'values': [{
-                        'note': note_text
-                    }]
-                }],
-                'fields': 'note'
-            }
-        }]
-        
-        body = {'requests': requests}
-        sheets.spreadsheets().batchUpdate(
-            spreadsheetId=sheet_id,
-            body=body
-        ).execute()
-        
-        return True
-        
-    except Exception as e:
-        print(f"⚠️ Error adding note to {cell_range}: {e}")
-        return False
+def count_cell_requests(gid, counted):
+    """updateCells requests putting each row's count and note in column K, one per run of consecutive rows"""
+    column = column_index(TOTAL_CASES_COLUMN)
+    requests = []
+    run = []
+    for result in sorted(counted, key=lambda result: result['row']):
+        if run and result['row'] != run[-1]['row'] + 1:
+            requests.append(_count_cells(gid, column, run))
+            run = []
+        run.append(result)
+    if run:
+        requests.append(_count_cells(gid, column, run))
+    return requests
+
+def _count_cells(gid, column, run):
+    first_row = run[0]['row'] - 1  # 0-indexed
+    return {
+        'updateCells': {
+            'range': {
+                'sheetId': gid,
+                'startRowIndex': first_row,
+                'endRowIndex': first_row + len(run),
+                'startColumnIndex': column,
+                'endColumnIndex': column + 1
+            },
+            'rows': [
+                {'values': [{
+                    'userEnteredValue': {'numberValue': result['count']},
+                    'note': result['note']
+                }]}
+                for result in run
+            ],
+            'fields': 'userEnteredValue,note'
+        }
+    }
+
+def write_counts(sheets, sheet_id, counted):
+    """Write a batch's counts and notes to TC Review in one batchUpdate; returns the rows written"""
+    # Tab gids come from the shared registry, already loaded by tenants_with()
+    gid = registry.sheet_gid(sheets, sheet_id, TC_REVIEW_SHEET)
+    if gid is None:
+        print(f"⚠️ Could not find sheet: {TC_REVIEW_SHEET}")
+        return 0
+    
+    sheets.spreadsheets().batchUpdate(
+        spreadsheetId=sheet_id,
+        body={'requests': count_cell_requests(gid, counted)}
+    ).execute()
+    return len(counted)
+
+def crawl_counts(sheets, spreadsheet_id, row_num):
+    """Count one spreadsheet under the adaptive limiter; None if it failed"""
+    # A throttled attempt (even one the client retried) slows everyone down;
+    # a throttled failure is retried once, after the limiter's pause
+    for attempt in range(2):
+        limiter.acquire(REQUESTS_PER_URL)
+        calls_before = calls_made()
+        throttles_before, _ = throttles_seen()
+        started = time.monotonic()
+        error = None
+        try:
+            total_sheets, test_case_counts = count_test_cases_in_sheet_optimized(sheets, spreadsheet_id)
+        except Exception as e:
+            error = e
+        finally:
+            throttles, retry_after = throttles_seen()
+            limiter.release(
+                time.monotonic() - started,
+                requests=calls_made() - calls_before,
+                throttled=throttles - throttles_before,
+                retry_after=retry_after
+            )
+        
+        if error is None:
+            break
+        rate_limited = '429' in str(error) or 'Quota exceeded' in str(error)
+        if attempt == 0 and rate_limited:
+            print(f"Row {row_num}: ⚠️ Rate limit hit - retrying after the limiter's backoff...")
+            continue
+        if rate_limited:
+            print(f"Row {row_num}: ❌ Error - {error}")
+            return None
+        # An unreadable document is reported like one without test cases
+        print(f"❌ Error accessing spreadsheet {spreadsheet_id}: {error}")
+        history.record(spreadsheet_id, error=True)
+        return 0, {}
+    
+    history.record(spreadsheet_id, [total_sheets, test_case_counts])
+    return total_sheets, test_case_counts
+
+def get_counts(sheets, spreadsheet_id, row_num):
+    """(total sheets, counts) of a spreadsheet, crawled at most once per run; None if it failed, DEFERRED past the budget"""
+    global _memo_hits, _deferred
+    
+    with _counts_lock:
+        id_lock = _count_locks.setdefault(spreadsheet_id, threading.Lock())
+    
+    # Held across the crawl so a duplicate link waits for it instead of crawling again
+    with id_lock:
+        counts = _counts.get(spreadsheet_id)
+        if counts is not None:
+            with _counts_lock:
+                _memo_hits += 1
+            print(f"Row {row_num}: ♻️ Already counted - reusing result")
+            return counts
+        
+        if _deadline is not None and time.monotonic() >= _deadline:
+            with _counts_lock:
+                _deferred += 1
+            print(f"Row {row_num}: ⌛ Time budget spent - left for the next run")
+            return DEFERRED
+        
+        counts = crawl_counts(sheets, spreadsheet_id, row_num)
+        # A crawl that raised is not remembered, so a later row may try again
+        if counts is not None:
+            with _counts_lock:
+                _counts[spreadsheet_id] = counts
+            # Empty results are cheap to recount and may hide an access error
+            if counts[0]:
+                checkpoint.record_document(spreadsheet_id, counts)
+        return counts
+
+def memo_report():
+    """Print how many linked spreadsheets were crawled and how many rows reused a crawl"""
+    print(f"♻️ Linked spreadsheets: {len(_counts) - _resumed_documents} crawled, "
+          f"{_resumed_documents} from the checkpoint, {_memo_hits} rows filled from the run memo")
+
+def count_url(sheets, url_info, idx, batch_len):
+    """Count one TC Review row's spreadsheet (from the run memo if already crawled); None if skipped, DEFERRED if left for the next run"""
+    row_num = url_info['row']
+    url = url_info['url']
+    
+    print(f"\n[{idx}/{batch_len}] Row {row_num}: Processing...")
+    
+    # Skip invalid URLs
+    if not is_valid_google_sheets_url(url):
+        print(f"Row {row_num}: Invalid URL - skipping")
+        return None
+    
+    # Extract spreadsheet ID
+    spreadsheet_id = extract_spreadsheet_id(url)
+    if not spreadsheet_id:
+        print(f"Row {row_num}: Could not extract spreadsheet ID")
+        return None
+    
+    print(f"Row {row_num}: Spreadsheet ID = {spreadsheet_id}")
+    
+    counts = get_counts(sheets, spreadsheet_id, row_num)
+    if counts is None or counts == DEFERRED:
+        return counts
+    total_sheets, test_case_counts = counts
+    
+    print(f"Row {row_num}: Found {total_sheets} test case sheets")
+    if test_case_counts:
+        counts_str = ', '.join([f"{count} {cat}" for cat, count in test_case_counts.items()])
+        print(f"Row {row_num}: {counts_str}")
+    print(f"Row {row_num}: ✅ Count = {total_sheets}")
+    
+    return {
+        'row': row_num,
+        'count': total_sheets,
+        'note': create_note_text(test_case_counts),
+    }
 
 def process_batch(sheets, sheet_id, batch_urls, batch_num, total_batches):
-    """Process a batch of URLs with rate limiting"""
+    """Process a batch of URLs concurrently, paced by the adaptive limiter; returns (processed, skipped, deferred, written)"""
     print(f"\n{'='*60}")
     print(f"📦 Processing Batch {batch_num}/{total_batches}")
     print(f"{'='*60}")
     
-    updates = []
-    notes = []  # Store notes to be added
-    processed = 0
-    skipped = 0
-    api_calls = 0
+    def count_in_worker(item):
+        # calls_made() is per thread, so each worker counts its own calls
+        calls_before = calls_made()
+        result = count_url(sheets, item[1], item[0], len(batch_urls))
+        return result, calls_made() - calls_before
     
-    for idx, url_info in enumerate(batch_urls, start=1):
-        row_num = url_info['row']
-        url = url_info['url']
-        
-        print(f"\n[{idx}/{len(batch_urls)}] Row {row_num}: Processing...")
-        
-        # Skip invalid URLs
-        if not is_valid_google_sheets_url(url):
-            print(f"Row {row_num}: Invalid URL - skipping")
-            skipped += 1
-            continue
-        
-        # Extract spreadsheet ID
-        spreadsheet_id = extract_spreadsheet_id(url)
-        if not spreadsheet_id:
-            print(f"Row {row_num}: Could not extract spreadsheet ID")
-            skipped += 1
-            continue
-        
-        print(f"Row {row_num}: Spreadsheet ID = {spreadsheet_id}")
-        
-        # Add delay before processing (except for first item)
-        if processed > 0:
-            print(f"⏳ Waiting {REQUEST_DELAY}s...")
-            time.sleep(REQUEST_DELAY)
-        
-        # Count test cases
-        try:
-            total_sheets, test_case_counts = count_test_cases_in_sheet_optimized(sheets, spreadsheet_id)
-            api_calls += 2  # 2 API calls per spreadsheet
-            
-            print(f"Row {row_num}: Found {total_sheets} test case sheets")
-            if test_case_counts:
-                counts_str = ', '.join([f"{count} {cat}" for cat, count in test_case_counts.items()])
-                print(f"Row {row_num}: {counts_str}")
-            
-            # Create note text
-            note_text = create_note_text(test_case_counts)
-            
-            # Queue update for count
-            updates.append({
-                'range': f"'{TC_REVIEW_SHEET}'!K{row_num}",
-                'values': [[total_sheets]]
-            })
-            
-            # Queue note to be added
-            notes.append({
-                'range': f"'{TC_REVIEW_SHEET}'!K{row_num}",
-                'note': note_text
-            })
-            
-            print(f"Row {row_num}: ✅ Count = {total_sheets}")
-            print(f"📊 Progress: {api_calls} API calls in this batch")
-            processed += 1
-            
-        except Exception as e:
-            error_msg = str(e)
-            if '429' in error_msg or 'Quota exceeded' in error_msg:
-                print(f"Row {row_num}: ⚠️ Rate limit hit - waiting and retrying...")
-                print(f"⏸️ Sleeping 70 seconds to reset quota...")
-                time.sleep(70)
-                
-                # Retry the same URL
-                try:
-                    total_sheets, test_case_counts = count_test_cases_in_sheet_optimized(sheets, spreadsheet_id)
-                    api_calls += 2
-                    
-                    note_text = create_note_text(test_case_counts)
-                    
-                    updates.append({
-                        'range': f"'{TC_REVIEW_SHEET}'!K{row_num}",
-                        'values': [[total_sheets]]
-                    })
-                    
-                    notes.append({
-                        'range': f"'{TC_REVIEW_SHEET}'!K{row_num}",
-                        'note': note_text
-                    })
-                    
-                    print(f"Row {row_num}: ✅ Retry successful - Count = {total_sheets}")
-                    processed += 1
-                except Exception as retry_error:
-                    print(f"Row {row_num}: ❌ Retry failed - {retry_error}")
-                    skipped += 1
-            else:
-                print(f"Row {row_num}: ❌ Error - {e}")
-                skipped += 1
-    
-    # Apply all updates for this batch
-    if updates:
-        print(f"\n📤 Applying {len(updates)} count updates from batch {batch_num}...")
+    # The limiter decides how many of these actually run at once
+    with ThreadPoolExecutor(max_workers=limiter.max_concurrency) as executor:
+        outcomes = list(executor.map(count_in_worker, enumerate(batch_urls, start=1)))
+    results = [result for result, _ in outcomes]
+    crawl_calls = sum(calls for _, calls in outcomes)
+    
+    deferred = sum(1 for result in results if result == DEFERRED)
+    counted = [result for result in results if result and result != DEFERRED]
+    processed = len(counted)
+    skipped = len(results) - processed - deferred
+    calls_at_start = calls_made()
+    
+    # Counts and notes for the whole batch go out in one batchUpdate
+    written = True
+    if counted:
+        print(f"\n📤 Writing {len(counted)} counts and notes from batch {batch_num}...")
         try:
-            batch_update_body = {
-                'valueInputOption': 'RAW',
-                'data': updates
-            }
-            sheets.spreadsheets().values().batchUpdate(
-                spreadsheetId=sheet_id,
-                body=batch_update_body
-            ).execute()
-            print(f"✅ Batch {batch_num} count updates applied successfully")
+            rows_written = write_counts(sheets, sheet_id, counted)
+            written = rows_written == len(counted)
+            print(f"✅ Batch {batch_num}: wrote {rows_written}/{len(counted)} counts and notes")
         except Exception as e:
-            print(f"❌ Error applying batch {batch_num} count updates: {e}")
-    
-    # Add notes to cells
-    if notes:
-        print(f"\n📝 Adding {len(notes)} notes to cells...")
-        notes_added = 0
-        for note_info in notes:
-            if add_note_to_cell(sheets, sheet_id, note_info['range'], note_info['note']):
-                notes_added += 1
-        print(f"✅ Added {notes_added}/{len(notes)} notes successfully")
+            written = False
+            print(f"❌ Error writing batch {batch_num} counts and notes: {e}")
     
     print(f"\n📊 Batch {batch_num} Summary:")
     print(f"   ✅ Processed: {processed}")
     print(f"   ⏭️  Skipped: {skipped}")
-    print(f"   📈 API calls: {api_calls}")
+    if deferred:
+        print(f"   ⌛ Deferred: {deferred}")
+    # Counted by the transport, so retries are included
+    print(f"   📈 API calls: {crawl_calls} crawl, {calls_made() - calls_at_start} write")
+    limiter.report()
     
-    return processed, skipped
+    return processed, skipped, deferred, written
 
 def update_tc_review_counts(sheets, sheet_id):
-    """Update test case counts in TC Review sheet - Process ALL rows"""
+    """Update test case counts in TC Review sheet - Process ALL rows; returns True if every row was counted and written"""
     print(f"\n📊 Starting test case count updates...")
     
     # Get all URLs
@@ -350,17 +375,28 @@ def update_tc_review_counts(sheets, sheet_id):
     
     if not url_data:
         print("⚠️ No URLs to process")
-        return
+        return True
     
     # Filter to only valid URLs
     valid_urls = [u for u in url_data if is_valid_google_sheets_url(u['url'])]
     
     if not valid_urls:
         print("⚠️ No valid URLs found to process")
-        return
+        return True
     
     print(f"📊 Processing {len(valid_urls)} valid URLs out of {len(url_data)} total rows")
     
+    # The work list is identified in sheet order, before any reordering
+    units = digest(BATCH_SIZE, [(u['row'], u['url']) for u in valid_urls])
+    
+    # Most likely changed first. A resumed run takes the order saved by the
+    # interrupted one: its crawls have since moved every score, so reordering
+    # would regroup the batches it already wrote.
+    ordered = history.order(valid_urls, lambda u: extract_spreadsheet_id(u['url']), checkpoint.started_at)
+    by_row = {u['row']: u for u in valid_urls}
+    valid_urls = [by_row[row] for row in checkpoint.work_order(sheet_id, units, [u['row'] for u in ordered])]
+    print(f"🎯 Ordered {len(valid_urls)} URLs most-likely-changed first")
+    
     # Split into batches
     batches = []
     for i in range(0, len(valid_urls), BATCH_SIZE):
@@ -368,28 +404,36 @@ def update_tc_review_counts(sheets, sheet_id):
     
     total_batches = len(batches)
     print(f"📦 Split into {total_batches} batches of up to {BATCH_SIZE} URLs each")
-    print(f"⏱️  Estimated time: ~{(total_batches * BATCH_SIZE * REQUEST_DELAY + (total_batches - 1) * BATCH_COOLDOWN) / 60:.1f} minutes")
+    print(f"⏱️  Adaptive pacing: starting at {limiter.rate:.0f} req/min, up to {limiter.max_rate:.0f} req/min")
     print("")
     
     total_processed = 0
     total_skipped = 0
     
+    # Batches a previous, interrupted run already wrote are skipped if the URL list is unchanged
+    batches_written = checkpoint.batches_written(sheet_id, units)
+    if batches_written:
+        print(f"⏯️ Resuming: {len(batches_written)}/{total_batches} batches already written by the interrupted run")
+    
     # Process each batch
+    all_written = True
+    total_deferred = 0
     for batch_num, batch_urls in enumerate(batches, start=1):
-        processed, skipped = process_batch(sheets, sheet_id, batch_urls, batch_num, total_batches)
+        if batch_num in batches_written:
+            total_processed += len(batch_urls)
+            continue
+        processed, skipped, deferred, written = process_batch(sheets, sheet_id, batch_urls, batch_num, total_batches)
         total_processed += processed
         total_skipped += skipped
-        
-        # Wait between batches (except after the last batch)
-        if batch_num < total_batches:
-            print(f"\n⏸️  Batch {batch_num}/{total_batches} complete. Cooling down for {BATCH_COOLDOWN}s to reset API quota...")
-            print(f"📊 Overall progress: {batch_num}/{total_batches} batches, {total_processed + total_skipped}/{len(valid_urls)} URLs processed")
-            
-            # Countdown timer for cooldown
-            for remaining in range(BATCH_COOLDOWN, 0, -10):
-                print(f"   ⏳ {remaining}s remaining...", flush=True)
-                time.sleep(10)
-            print("   ✅ Cooldown complete, resuming...")
+        total_deferred += deferred
+        # A batch with deferred rows is not done; the next run counts and writes them
+        if written and not deferred:
+            checkpoint.finish_batch(sheet_id, units, batch_num)
+        else:
+            all_written = False
+        history.save()
+        
+        print(f"📊 Overall progress: {batch_num}/{total_batches} batches, {total_processed + total_skipped + total_deferred}/{len(valid_urls)} URLs processed")
     
     print(f"\n{'='*60}")
     print(f"🎉 ALL PROCESSING COMPLETE FOR THIS SHEET")
@@ -397,6 +441,11 @@ def update_tc_review_counts(sheets, sheet_id):
     print(f"✅ Successfully processed: {total_processed}/{len(valid_urls)}")
     print(f"⏭️  Skipped (errors): {total_skipped}/{len(valid_urls)}")
     print(f"📊 Total rows checked: {len(url_data)}")
+    if total_deferred:
+        print(f"⌛ Left for the next run (time budget): {total_deferred}/{len(valid_urls)}")
+    if not all_written:
+        print("⚠️ Some batches were not written in full; the next run writes them")
+    return all_written
 
 def update_timestamp(sheets, sheet_id):
     """Update timestamp in Dashboard sheet"""
@@ -409,66 +458,100 @@ def update_timestamp(sheets, sheet_id):
     ).execute()
     print(f"🕐 Updated timestamp in Dashboard: {timestamp}")
 
+def process_sheet(sheets, sheet_id, idx, total):
+    """Update TC Review test case counts for one Team CDS sheet"""
+    try:
+        print(f"\n{'#'*60}")
+        print(f"# Sheet {idx}/{total}: {sheet_id}")
+        print(f"{'#'*60}")
+        
+        if checkpoint.tenant_finished(sheet_id):
+            print(f"⏭️ Already finished by the interrupted run, skipping {sheet_id}")
+            return
+        
+        # Update TC Review test case counts (processes ALL rows)
+        if not update_tc_review_counts(sheets, sheet_id):
+            # Left unfinished in the checkpoint, so the next run writes what is missing
+            print(f"\n⚠️ Sheet {idx}/{total} not finished, Dashboard timestamp left as is: {sheet_id}")
+            return
+        
+        # Update timestamp in Dashboard
+        print("\n🕐 Updating timestamp...")
+        update_timestamp(sheets, sheet_id)
+        checkpoint.finish_tenant(sheet_id)
+        
+        print(f"\n✅ Finished sheet {idx}/{total}: {sheet_id}")
+        
+    except Exception as e:
+        print(f"❌ Error processing sheet {idx}/{total} ({sheet_id}): {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def run(sheets):
+    """Update TC Review test case counts for every Team CDS sheet using an already-built Sheets client"""
+    global _resumed_documents, _deadline
+    
+    # Get all Team CDS sheet IDs from UTILS
+    print(f"\n📋 Fetching Team CDS sheet IDs from UTILS: {UTILS_SHEET_ID}")
+    sheet_ids = registry.tenants_with(sheets, TC_REVIEW_SHEET)
+    
+    if not sheet_ids:
+        print("❌ No Team CDS sheets with the required tabs found")
+        return
+    
+    print(f"✅ Found {len(sheet_ids)} Team CDS sheets to process")
+    
+    # Each pooled service account brings its own per-minute quota
+    limiter.scale(quota_pool.size)
+    
+    # Counts saved by an interrupted run are reused (and written) instead of recrawled
+    if checkpoint.begin():
+        with _counts_lock:
+            for spreadsheet_id, counts in checkpoint.documents().items():
+                _counts.setdefault(spreadsheet_id, tuple(counts))
+            _resumed_documents = len(_counts)
+    if CRAWL_BUDGET_MINUTES > 0:
+        _deadline = time.monotonic() + CRAWL_BUDGET_MINUTES * 60
+        print(f"⌛ Crawl time budget: {CRAWL_BUDGET_MINUTES:g} min, most likely changed documents first")
+    
+    # Process sheets in parallel; idx keeps the "Sheet i/N" log labels
+    positions = {sheet_id: idx for idx, sheet_id in enumerate(sheet_ids, start=1)}
+    run_for_tenants(
+        sheet_ids,
+        lambda sheet_id: process_sheet(sheets, sheet_id, positions[sheet_id], len(sheet_ids))
+    )
+    
+    limiter.report('Crawl')
+    quota_pool.report()
+    memo_report()
+    history.save()
+    if _deferred:
+        print(f"⌛ {_deferred} rows left for the next run (time budget of {CRAWL_BUDGET_MINUTES:g} min spent)")
+    if checkpoint.complete(sheet_ids):
+        print("🏁 Every sheet finished, checkpoint cleared")
+    else:
+        print(f"💾 Some sheets did not finish; the next run resumes from {checkpoint.path}")
+    print("\n" + "="*60)
+    print("✅ Script completed successfully - All sheets processed")
+    print(f"⏰ End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("="*60)
+
+
 def main():
     print("🚀 Starting TC Review Counts Update Script")
     print(f"⏰ Start time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
         print("\n🔐 Authenticating...")
-        credentials = authenticate()
+        # Crawl reads are spread over every configured service account
+        credentials = authenticate_pool()
         print("✅ Authentication successful")
         
         print("🔗 Building Sheets API client...")
-        sheets = build('sheets', 'v4', credentials=credentials)
+        sheets = build_sheets_service(credentials)
         print("✅ Sheets API client ready")
         
-        # Get all Team CDS sheet IDs from UTILS
-        print(f"\n📋 Fetching Team CDS sheet IDs from UTILS: {UTILS_SHEET_ID}")
-        sheet_ids = get_all_team_cds_sheet_ids(sheets, UTILS_SHEET_ID)
-        
-        if not sheet_ids:
-            print("❌ No Team CDS sheet IDs found in UTILS!B2:B")
-            return
-        
-        print(f"✅ Found {len(sheet_ids)} Team CDS sheets to process")
-        
-        # Process each sheet
-        for idx, sheet_id in enumerate(sheet_ids, start=1):
-            try:
-                print(f"\n{'#'*60}")
-                print(f"# Sheet {idx}/{len(sheet_ids)}: {sheet_id}")
-                print(f"{'#'*60}")
-                
-                # Verify TC Review sheet exists
-                print(f"🔍 Checking for '{TC_REVIEW_SHEET}' sheet...")
-                titles = get_sheet_titles(sheets, sheet_id)
-                print(f"📄 Found sheets: {', '.join(titles[:5])}{'...' if len(titles) > 5 else ''}")
-                
-                if TC_REVIEW_SHEET not in titles:
-                    print(f"⚠️ Skipping {sheet_id} — missing '{TC_REVIEW_SHEET}' sheet")
-                    continue
-                
-                print(f"✅ '{TC_REVIEW_SHEET}' sheet found")
-                
-                # Update TC Review test case counts (processes ALL rows)
-                update_tc_review_counts(sheets, sheet_id)
-                
-                # Update timestamp in Dashboard
-                print("\n🕐 Updating timestamp...")
-                update_timestamp(sheets, sheet_id)
-                
-                print(f"\n✅ Finished sheet {idx}/{len(sheet_ids)}: {sheet_id}")
-                
-            except Exception as e:
-                print(f"❌ Error processing sheet {idx}/{len(sheet_ids)} ({sheet_id}): {str(e)}")
-                import traceback
-                traceback.print_exc()
-                print("⏭️  Continuing to next sheet...")
-        
-        print("\n" + "="*60)
-        print("✅ Script completed successfully - All sheets processed")
-        print(f"⏰ End time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("="*60)
+        run(sheets)
         
     except Exception as e:
         print(f"❌ Fatal error: {str(e)}")
@@ -4,18 +4,19 @@ import re
 from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from googleapiclient.discovery import build
+from registry import registry
+from tenant_pool import run_for_tenants
 from common import (
     authenticate,
-    get_sheet_titles,
-    get_all_team_cds_sheet_ids
+    build_sheets_service
 )
 from constants import (
-    UTILS_SHEET_ID,
     SHEET_SYNC_SID,
     DASHBOARD_SHEET,
+    ALL_ISSUES,
     generate_timestamp_string
 )
+from snapshot import get_snapshot
 
 # Configuration
 TC_REVIEW_SHEET = 'TC Review'
@@ -46,15 +47,10 @@ PROJECT_MAPPING = {
 }
 
 def get_source_issues(sheets):
-    """Get all issues from the source sheet (ALL ISSUES)"""
-    print(f"📋 Fetching data from {SHEET_SYNC_SID} - ALL ISSUES!C4:T")
+    """Get all issues from the source sheet (ALL ISSUES), shared with the fetch scripts"""
+    print(f"📋 Fetching data from {SHEET_SYNC_SID} - {ALL_ISSUES}")
     
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=SHEET_SYNC_SID,
-        range="ALL ISSUES!C4:T"
-    ).execute()
-    
-    values = result.get('values', [])
+    values = get_snapshot(sheets, ALL_ISSUES).table
     if not values:
         print("⚠️ No data found in ALL ISSUES sheet")
         return []
@@ -75,13 +71,16 @@ def build_source_lookup(source_data):
     """
     lookup = {}
     
-    for idx, row in enumerate(source_data, start=4):
-        # Ensure row has enough columns
-        if len(row) < 12:  # Need at least up to column N (index 11)
-            continue
-        
-        iid = str(row[1]).strip() if len(row) > 1 and row[1] else None  # Column D
-        project = str(row[11]).strip().upper() if len(row) > 11 and row[11] else None  # Column N
+    # IID (column D) and project (column N) are normalized once per distinct
+    # value; rows missing either are skipped
+    iids = source_data.column(1)
+    projects = source_data.column(11)
+    iid_keys = iids.decode(lambda value: str(value).strip() if value else None)
+    project_keys = projects.decode(lambda value: str(value).strip().upper() if value else None)
+    
+    for row_id in range(len(source_data)):
+        iid = iid_keys[iids.codes[row_id]]
+        project = project_keys[projects.codes[row_id]]
         
         if not iid or not project:
             continue
@@ -91,14 +90,14 @@ def build_source_lookup(source_data):
         
         lookup[key] = {
             'iid': iid,
-            'title': row[2] if len(row) > 2 else 'No Title',  # Column E
-            'author': row[3] if len(row) > 3 else 'Unknown',  # Column F
-            'assignee': row[4] if len(row) > 4 else 'Unassigned',  # Column G
-            'labels': row[5] if len(row) > 5 else 'None',  # Column H
-            'status': row[8] if len(row) > 8 else 'Unknown',  # Column K
-            'created_at': row[9] if len(row) > 9 else '',  # Column L
+            'title': source_data.value(row_id, 2),  # Column E
+            'author': source_data.value(row_id, 3),  # Column F
+            'assignee': source_data.value(row_id, 4),  # Column G
+            'labels': source_data.value(row_id, 5),  # Column H
+            'status': source_data.value(row_id, 8),  # Column K
+            'created_at': source_data.value(row_id, 9),  # Column L
             'project': project,
-            'row_index': idx
+            'row_index': row_id + 4
         }
     
     print(f"📊 Built lookup dictionary with {len(lookup)} issues")
@@ -173,25 +172,6 @@ def parse_gitlab_url(url):
     
     return issue_iid, mapped_project
 
-def get_tc_review_data(sheets, sheet_id):
-    """Get all data from TC Review sheet starting from row 2"""
-    print(f"📋 Fetching TC Review data from {sheet_id}")
-    
-    # Get the last row with data
-    result = sheets.spreadsheets().values().get(
-        spreadsheetId=sheet_id,
-        range=f"'{TC_REVIEW_SHEET}'!H2:H"
-    ).execute()
-    
-    values = result.get('values', [])
-    if not values:
-        print("⚠️ No data found in TC Review sheet")
-        return 0
-    
-    last_row = len(values) + 1  # +1 because we start from row 2
-    print(f"✅ Found data up to row {last_row + 1}")
-    return last_row + 1
-
 def find_relevant_label(labels_str):
     """Find the first relevant label from the labels string"""
     if not labels_str:
@@ -205,44 +185,70 @@ def find_relevant_label(labels_str):
     
     return None
 
+def hyperlink_parts(cell_value):
+    """(url, link text or None) of a HYPERLINK formula, or None for anything else"""
+    match = re.search(r'HYPERLINK\s*\(\s*"([^"]+)"(?:\s*[,;]\s*"([^"]*)")?', str(cell_value), re.IGNORECASE)
+    return (match.group(1), match.group(2)) if match else None
+
+def column_runs(column, changes):
+    """Group {row: value} into one column-vector write per run of consecutive rows"""
+    data = []
+    run = []
+    for row in sorted(changes):
+        if run and row != run[-1] + 1:
+            data.append(_column_range(column, run, changes))
+            run = []
+        run.append(row)
+    if run:
+        data.append(_column_range(column, run, changes))
+    return data
+
+def _column_range(column, rows, changes):
+    return {
+        'range': f"'{TC_REVIEW_SHEET}'!{column}{rows[0]}:{column}{rows[-1]}",
+        'values': [[changes[row]] for row in rows]
+    }
+
 def update_tc_review_labels(sheets, sheet_id, source_lookup):
-    """Update labels in TC Review sheet based on source data"""
+    """
+    Update labels in TC Review sheet based on source data.
+
+    H (link) and J (label) are read together and only rows whose link text
+    or label differ from the computed ones are written, as one column-vector
+    range per run of consecutive rows. Returns the number of rows written.
+    """
     print(f"🔄 Processing TC Review sheet in {sheet_id}")
     
-    last_row = get_tc_review_data(sheets, sheet_id)
-    
-    if last_row < 2:
-        print("⚠️ No data to process in TC Review")
-        return
-    
-    processed_count = 0
-    updated_count = 0
-    updates = []  # Collect all updates for batch processing
-    
-    # Get all URLs at once for efficiency
-    url_range = f"'{TC_REVIEW_SHEET}'!H2:H{last_row}"
+    # Current links (as formulas), I and labels in one read
     result = sheets.spreadsheets().values().get(
         spreadsheetId=sheet_id,
-        range=url_range,
+        range=f"'{TC_REVIEW_SHEET}'!H2:J",
         valueRenderOption='FORMULA'
     ).execute()
     
-    url_values = result.get('values', [])
+    rows = result.get('values', [])
+    if not rows:
+        print("⚠️ No data to process in TC Review")
+        return 0
+    
+    print(f"✅ Found data up to row {len(rows) + 1}")
+    
+    processed_count = 0
+    unchanged_count = 0
+    link_changes = {}  # row -> HYPERLINK formula for column H
+    label_changes = {}  # row -> label for column J
     
-    for row_idx, row_data in enumerate(url_values, start=2):
+    for row_idx, row_data in enumerate(rows, start=2):
         url = ''
+        cell_value = row_data[0] if row_data else ''
+        current_label = str(row_data[2]).strip() if len(row_data) > 2 else ''
         
         # Extract URL from formula or plain value
-        if row_data and row_data[0]:
-            cell_value = row_data[0]
-            
-            # Check if it's a HYPERLINK formula
-            if 'HYPERLINK' in str(cell_value).upper():
-                match = re.search(r'HYPERLINK\s*\(\s*"([^"]+)"', cell_value, re.IGNORECASE)
-                if match:
-                    url = match.group(1)
-            else:
-                url = str(cell_value).strip()
+        link = hyperlink_parts(cell_value) if 'HYPERLINK' in str(cell_value).upper() else None
+        if link:
+            url = link[0]
+        elif cell_value and 'HYPERLINK' not in str(cell_value).upper():
+            url = str(cell_value).strip()
         
         if not url:
             print(f"Row {row_idx}: Empty URL, skipping...")
@@ -273,27 +279,23 @@ def update_tc_review_labels(sheets, sheet_id, source_lookup):
         relevant_label = find_relevant_label(issue_data['labels'])
         
         if relevant_label:
-            # Prepare update for column J (label column)
-            updates.append({
-                'range': f"'{TC_REVIEW_SHEET}'!J{row_idx}",
-                'values': [[relevant_label]]
-            })
+            # Column J (label column) and the #<issueIID> link text in column H
+            if current_label != relevant_label:
+                label_changes[row_idx] = relevant_label
+            if link != (url, f"#{issue_iid}"):
+                link_changes[row_idx] = f'=HYPERLINK("{url}", "#{issue_iid}")'
             
-            # Update hyperlink format in column H to show #<issueIID>
-            hyperlink_formula = f'=HYPERLINK("{url}", "#{issue_iid}")'
-            updates.append({
-                'range': f"'{TC_REVIEW_SHEET}'!H{row_idx}",
-                'values': [[hyperlink_formula]]
-            })
-            
-            print(f"Row {row_idx}: Will update with label '{relevant_label}'")
-            updated_count += 1
+            if row_idx in label_changes or row_idx in link_changes:
+                print(f"Row {row_idx}: Will update with label '{relevant_label}'")
+            else:
+                unchanged_count += 1
         
         processed_count += 1
     
-    # Batch update all changes
+    # Batch update only what changed
+    updates = column_runs('H', link_changes) + column_runs('J', label_changes)
     if updates:
-        print(f"📤 Applying {len(updates)} updates...")
+        print(f"📤 Applying {len(link_changes)} link and {len(label_changes)} label changes in {len(updates)} ranges...")
         batch_update_body = {
             'valueInputOption': 'USER_ENTERED',
             'data': updates
@@ -306,7 +308,9 @@ def update_tc_review_labels(sheets, sheet_id, source_lookup):
         
         print(f"✅ Successfully applied all updates")
     
-    print(f"📊 Processing complete: {processed_count} rows processed, {updated_count} labels updated")
+    updated_count = len(set(link_changes) | set(label_changes))
+    print(f"📊 Processing complete: {processed_count} rows processed, {updated_count} rows updated, {unchanged_count} already up to date")
+    return updated_count
 
 def update_timestamp(sheets, sheet_id):
     """Update timestamp in Dashboard sheet"""
@@ -319,59 +323,58 @@ def update_timestamp(sheets, sheet_id):
     ).execute()
     print(f"🕐 Updated timestamp in Dashboard: {timestamp}")
 
+def process_sheet(sheets, sheet_id, source_lookup):
+    """Sync TC Review labels for one Team CDS sheet"""
+    try:
+        print(f"\n🔄 Processing: {sheet_id}")
+
+        # Update TC Review labels
+        update_tc_review_labels(sheets, sheet_id, source_lookup)
+
+        # Update timestamp in Dashboard
+        update_timestamp(sheets, sheet_id)
+
+        print(f"✅ Finished: {sheet_id}")
+
+    except Exception as e:
+        print(f"❌ Error processing {sheet_id}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+def run(sheets):
+    """Sync TC Review labels for every Team CDS sheet using an already-built Sheets client"""
+    # Get source issues and build lookup from SHEET_SYNC_SID
+    print(f"📋 Source: {SHEET_SYNC_SID} - ALL ISSUES")
+    source_data = get_source_issues(sheets)
+    
+    if not source_data:
+        print("❌ No source data available")
+        return
+    
+    source_lookup = build_source_lookup(source_data)
+    
+    if not source_lookup:
+        print("❌ Failed to build source lookup")
+        return
+    
+    # Get all Team CDS sheet IDs from UTILS
+    sheet_ids = registry.tenants_with(sheets, TC_REVIEW_SHEET)
+    
+    if not sheet_ids:
+        print("❌ No Team CDS sheets with the required tabs found")
+        return
+    
+    # Process each sheet
+    run_for_tenants(sheet_ids, lambda sheet_id: process_sheet(sheets, sheet_id, source_lookup))
+    
+    print("\n✅ Script completed successfully")
+
+
 def main():
     try:
         credentials = authenticate()
-        sheets = build('sheets', 'v4', credentials=credentials)
-        
-        # Get source issues and build lookup from SHEET_SYNC_SID
-        print(f"📋 Source: {SHEET_SYNC_SID} - ALL ISSUES")
-        source_data = get_source_issues(sheets)
-        
-        if not source_data:
-            print("❌ No source data available")
-            return
-        
-        source_lookup = build_source_lookup(source_data)
-        
-        if not source_lookup:
-            print("❌ Failed to build source lookup")
-            return
-        
-        # Get all Team CDS sheet IDs from UTILS
-        from common import get_all_team_cds_sheet_ids
-        sheet_ids = get_all_team_cds_sheet_ids(sheets, UTILS_SHEET_ID)
-        
-        if not sheet_ids:
-            print("❌ No Team CDS sheet IDs found in UTILS!B2:B")
-            return
-        
-        # Process each sheet
-        for sheet_id in sheet_ids:
-            try:
-                print(f"\n🔄 Processing: {sheet_id}")
-                
-                # Verify TC Review sheet exists
-                titles = get_sheet_titles(sheets, sheet_id)
-                
-                if TC_REVIEW_SHEET not in titles:
-                    print(f"⚠️ Skipping {sheet_id} — missing '{TC_REVIEW_SHEET}' sheet")
-                    continue
-                
-                # Update TC Review labels
-                update_tc_review_labels(sheets, sheet_id, source_lookup)
-                
-                # Update timestamp in Dashboard
-                update_timestamp(sheets, sheet_id)
-                
-                print(f"✅ Finished: {sheet_id}")
-                
-            except Exception as e:
-                print(f"❌ Error processing {sheet_id}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-        
-        print("\n✅ Script completed successfully")
+        sheets = build_sheets_service(credentials)
+        run(sheets)
         
     except Exception as e:
         print(f"❌ Error: {str(e)}")